@@ -0,0 +1,249 @@
+# admission.py
+# ==========================================================================
+# CONTROL DE ADMISIÓN Y COALESCING DE LLAMADAS AL LLM
+# ==========================================================================
+import asyncio
+import hashlib
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from metrics import Histogram
+from prompt_builder import compact_json
+
+WAIT_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5)
+DEPTH_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64)
+
+
+class Overloaded(Exception):
+    """No hay hueco para otra llamada al LLM: el cliente debe reintentar tras retry_after."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """Plaza concedida por el controlador. release() es idempotente."""
+
+    def __init__(self, controller, game_id):
+        self._controller = controller
+        self._game_id = game_id
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._controller._release(self._game_id)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class AdmissionController:
+    """
+    Limita las llamadas al LLM en vuelo:
+      - global: semáforo de max_concurrent plazas;
+      - cola corta: como mucho max_queue esperando y cada uno max_wait segundos;
+      - por juego: per_game llamadas simultáneas sobre el mismo game_id.
+    Lo que no cabe se rechaza al momento con Overloaded (-> 429 + Retry-After).
+    """
+
+    def __init__(self, max_concurrent=8, max_queue=16, max_wait=2.0, per_game=1, retry_after=2):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.per_game = per_game
+        self.retry_after = retry_after
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._in_flight = 0
+        self._per_game = {}
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "timeout": 0, "game_busy": 0}
+        self.wait_seconds = Histogram(WAIT_BUCKETS)
+        self.queue_depth = Histogram(DEPTH_BUCKETS)
+
+    def acquire(self, game_id=None):
+        """Bloquea como mucho max_wait. Devuelve un Ticket o lanza Overloaded."""
+        started = self._enter(game_id)
+        if not self._semaphore.acquire(blocking=False):
+            self._queue(game_id)
+            acquired = self._semaphore.acquire(timeout=self.max_wait)
+            self._dequeue(game_id, acquired)
+        return self._admit(game_id, started)
+
+    async def acquire_async(self, game_id=None):
+        """Igual que acquire() pero la espera no bloquea el event loop."""
+        started = self._enter(game_id)
+        if not self._semaphore.acquire(blocking=False):
+            self._queue(game_id)
+            waiter = asyncio.ensure_future(asyncio.to_thread(self._semaphore.acquire, True, self.max_wait))
+            try:
+                acquired = await asyncio.shield(waiter)
+            except asyncio.CancelledError:
+                # El cliente se fue: si la plaza llega después, se devuelve
+                waiter.add_done_callback(lambda w: w.result() and self._semaphore.release())
+                self._dequeue(game_id, True)
+                self._leave(game_id)
+                raise
+            self._dequeue(game_id, acquired)
+        return self._admit(game_id, started)
+
+    def _enter(self, game_id):
+        with self._lock:
+            if game_id and self._per_game.get(game_id, 0) >= self.per_game:
+                self.rejected["game_busy"] += 1
+                raise Overloaded("game_busy", self.retry_after)
+            if game_id:
+                self._per_game[game_id] = self._per_game.get(game_id, 0) + 1
+        return time.perf_counter()
+
+    def _queue(self, game_id):
+        with self._lock:
+            if self._waiting >= self.max_queue:
+                self.rejected["queue_full"] += 1
+                self._leave_game(game_id)
+                raise Overloaded("queue_full", self.retry_after)
+            self._waiting += 1
+            self.queue_depth.observe(self._waiting)
+
+    def _dequeue(self, game_id, acquired):
+        with self._lock:
+            self._waiting -= 1
+            if not acquired:
+                self.rejected["timeout"] += 1
+                self._leave_game(game_id)
+                raise Overloaded("timeout", self.retry_after)
+
+    def _admit(self, game_id, started):
+        self.wait_seconds.observe(time.perf_counter() - started)
+        with self._lock:
+            self._in_flight += 1
+            self.admitted += 1
+        return Ticket(self, game_id)
+
+    def _release(self, game_id):
+        with self._lock:
+            self._in_flight -= 1
+            self._leave_game(game_id)
+        self._semaphore.release()
+
+    def _leave(self, game_id):
+        with self._lock:
+            self._leave_game(game_id)
+
+    def _leave_game(self, game_id):
+        if not game_id:
+            return
+        remaining = self._per_game.get(game_id, 0) - 1
+        if remaining > 0:
+            self._per_game[game_id] = remaining
+        else:
+            self._per_game.pop(game_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "in_flight": self._in_flight,
+                "waiting": self._waiting,
+                "admitted": self.admitted,
+                "rejected": dict(self.rejected),
+                "wait_p95_s": self.wait_seconds.quantile(0.95),
+                "wait_seconds": self.wait_seconds.snapshot(),
+                "queue_depth": self.queue_depth.snapshot(),
+            }
+
+
+def flight_key(game_id, *parts):
+    """Dos peticiones son 'la misma' si coinciden juego, mensaje, modo y JSON de partida."""
+    if not game_id:
+        return None
+    raw = f"{game_id}|{compact_json(list(parts))}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    Coalescing de peticiones idénticas en vuelo: la primera (líder) hace la
+    llamada real y las demás (seguidoras) esperan su resultado, como mucho
+    follower_timeout segundos (después, Overloaded: el cliente reintenta).
+    finish() es idempotente: se puede llamar también al cerrar la respuesta.
+    """
+
+    def __init__(self, follower_timeout=120, retry_after=2):
+        self.follower_timeout = follower_timeout
+        self.retry_after = retry_after
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+        self.follower_timeouts = 0
+
+    def begin(self, key):
+        """Devuelve (future, es_lider). Con key=None no hay coalescing."""
+        if key is None:
+            return None, True
+        with self._lock:
+            future = self._flights.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = self._flights[key] = Future()
+            return future, True
+
+    def finish(self, key, future, result=None, error=None):
+        if future is None:
+            return
+        with self._lock:
+            if self._flights.get(key) is future:
+                del self._flights[key]
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _timed_out(self):
+        with self._lock:
+            self.follower_timeouts += 1
+        return Overloaded("flight_timeout", self.retry_after)
+
+    def wait(self, future, timeout=None):
+        """Resultado del líder para una seguidora (Overloaded si tarda más de la cuenta)."""
+        try:
+            return future.result(self.follower_timeout if timeout is None else timeout)
+        except FutureTimeout:
+            raise self._timed_out() from None
+
+    async def wait_async(self, future, timeout=None):
+        """Igual que wait() sin bloquear el event loop."""
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)),
+                                          self.follower_timeout if timeout is None else timeout)
+        except asyncio.TimeoutError:
+            raise self._timed_out() from None
+
+    def run(self, key, fn, timeout=None):
+        """Versión síncrona completa: ejecuta fn() como líder o espera al líder."""
+        future, leader = self.begin(key)
+        if not leader:
+            return self.wait(future, timeout)
+        try:
+            result = fn()
+        except Exception as e:
+            self.finish(key, future, error=e)
+            raise
+        self.finish(key, future, result=result)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {"in_flight": len(self._flights), "coalesced": self.coalesced,
+                    "follower_timeouts": self.follower_timeouts}
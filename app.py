@@ -2,45 +2,79 @@
 # SECCIÓN 1: IMPORTACIONES Y CONFIGURACIÓN INICIAL
 # ==========================================================================
 import os
-import json
 import re
+import atexit
+import json
 import uuid
+import time
+import hashlib
+import mimetypes
+import threading
+from functools import partial
 import base64
-from io import BytesIO
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, render_template_string
+from flask import Flask, Response, render_template, request, jsonify, session, redirect, url_for, render_template_string, stream_with_context, send_file, abort, g
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
 from dotenv import load_dotenv
-from google import genai
-from google.genai import types
-import stripe
-
-# Librerías para QR y Email (SendGrid)
-import qrcode
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail, Attachment, FileContent, FileName, FileType, Disposition
+# google.genai, stripe y sendgrid NO se importan aquí: pesan cientos de ms en el
+# arranque en frío y la landing no los necesita. Ver lazy.py y create_app()
 
 # Importación de prompts externos
-from prompts import PRODUCT_PROMPTS
+from prompts import PRODUCT_PROMPTS, PATCH_RESPONSE_SCHEMA, PROMPT_VERSION
+from streaming import JSON_DELIMITER, ReplyStreamParser, sse, strip_fences
+from conversation_store import DBConversationStore, MemoryConversationStore
+from prompt_builder import PromptAssembler
+from game_schema import is_valid_game, normalize_game, validate_game
+from game_patch import PatchError, apply_patch, decode_operations
+from generation_cache import DBCacheBackend, GenerationCache, generation_key
+from warm_pool import THEMES, WarmPool, match_theme
+from variants import TooManyVariants, VariantRunner
+from admission import AdmissionController, Overloaded, SingleFlight, flight_key
+from jobs import JobQueue
+from qr import FORMATS, SIZES, QRStore
+from notify import MemoryBroker, PostgresBroker
+from page_cache import DiskPageBackend, PageCache
+from static_export import export_experience, find_export, remove_export
+from migrations import upgrade_schema
+from db_config import engine_options, normalize_url, pool_status
+from metrics import Registry, instrument_sqlalchemy, timed
+from maintenance import purge_old_events, purge_stale_drafts, register_commands
+from lazy import LazyClient
+from checkout import CheckoutSessions
+from assets import AssetManifest
+from plantillas import TemplateRegistry
+from telemetry import TelemetryBuffer, difficulty_report, level_report, normalize_event
 
 # Inicialización de entorno y aplicación
 load_dotenv()
 app = Flask(__name__)
 app.secret_key = os.getenv("FLASK_KEY", "dw_genz_fast_2025")
 
-# Configuración de servicios de terceros
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
+# Configuración de servicios de terceros (el SDK se importa en el primer pago)
+def load_stripe():
+    import stripe as stripe_sdk
+
+    stripe_sdk.api_key = os.getenv("STRIPE_SECRET_KEY")
+    # STRIPE_API_BASE permite apuntar a un doble local (fakes.FakeStripeServer)
+    if os.getenv("STRIPE_API_BASE"):
+        stripe_sdk.api_base = os.getenv("STRIPE_API_BASE")
+    return stripe_sdk
+
+stripe = LazyClient(load_stripe, "stripe")
 
 # ==========================================================================
 # SECCIÓN 2: CONFIGURACIÓN DE BASE DE DATOS Y MODELOS
 # ==========================================================================
 # Asegúrate de que DATABASE_URL empieza por postgresql:// y no postgres:// (fix para Render)
-db_url = os.getenv('DATABASE_URL')
-if db_url and db_url.startswith("postgres://"):
-    db_url = db_url.replace("postgres://", "postgresql://", 1)
+db_url = normalize_url(os.getenv('DATABASE_URL'))
 
 app.config['SQLALCHEMY_DATABASE_URI'] = db_url
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Pool, pre-ping y timeouts desde el entorno (DB_POOL_SIZE, DB_POOL_RECYCLE...). Ver db_config.py
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(db_url)
 
 db = SQLAlchemy(app)
 
@@ -61,29 +95,318 @@ class Experience(db.Model):
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     finalized_at = db.Column(db.DateTime, nullable=True)
+    # Última escritura (autosave, generación, pago): la purga mira la inactividad, no la edad
+    updated_at = db.Column(db.DateTime, nullable=True)
+
+    # Concurrencia optimista: cada UPDATE exige la versión leída y la sube en uno
+    version = db.Column(db.Integer, nullable=False, default=1)
+    # Hash del game_data guardado: el autosave no reescribe contenido idéntico
+    content_hash = db.Column(db.String(64), nullable=True)
+
+    # Sesión de Stripe Checkout abierta (se reutiliza hasta que caduca). Ver checkout.py
+    checkout_session_id = db.Column(db.String(255), nullable=True)
+    checkout_url = db.Column(db.Text, nullable=True)
+    checkout_expires_at = db.Column(db.DateTime, nullable=True)
+    checkout_key = db.Column(db.String(64), nullable=True)
+
+    __mapper_args__ = {"version_id_col": version}
+    # La purga de borradores filtra por (is_paid, updated_at) y, en filas antiguas, created_at
+    __table_args__ = (db.Index("ix_experiences_is_paid_created_at", "is_paid", "created_at"),
+                      db.Index("ix_experiences_is_paid_updated_at", "is_paid", "updated_at"))
+
+def game_data_hash(game_data):
+    """Hash canónico (claves ordenadas) del JSON de una experiencia."""
+    raw = json.dumps(game_data, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+@event.listens_for(Experience, "before_insert")
+@event.listens_for(Experience, "before_update")
+def refresh_content_hash(mapper, connection, exp):
+    exp.content_hash = game_data_hash(exp.game_data)
+    exp.updated_at = datetime.utcnow()
+
+class ArchivedExperience(db.Model):
+    """
+    Borradores sin pagar retirados de 'experiences' por la purga (--archive).
+    """
+    __tablename__ = 'experiences_archive'
+
+    id = db.Column(db.String(8), primary_key=True)
+    game_data = db.Column(db.JSON, nullable=True)
+    real_gift = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class Conversation(db.Model):
+    """
+    Historial del chat con la IA para cada experiencia (fuera de la cookie de sesión).
+    """
+    __tablename__ = 'conversations'
+
+    game_id = db.Column(db.String(8), primary_key=True)
+    history = db.Column(db.JSON, nullable=False, default=list)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Dos turnos simultáneos del mismo juego no se pisan el historial (ver append())
+    version = db.Column(db.Integer, nullable=False, default=1)
+
+    __mapper_args__ = {"version_id_col": version}
+
+# Almacén del historial: la sesión solo guarda el puntero (current_game_id)
+history_limits = {
+    "max_turns": int(os.getenv("CHAT_HISTORY_MAX_TURNS", "20")),
+    "max_bytes": int(os.getenv("CHAT_HISTORY_MAX_BYTES", "16384")),
+}
+if os.getenv("CONVERSATION_STORE", "db") == "memory":
+    conversations = MemoryConversationStore(**history_limits)
+else:
+    conversations = DBConversationStore(db, Conversation, **history_limits)
+
+class GenerationCacheEntry(db.Model):
+    """
+    Backend persistente (opcional) de la caché de generaciones de la IA.
+    """
+    __tablename__ = 'generation_cache'
+
+    key = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.JSON, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+class Job(db.Model):
+    """
+    Trabajo en segundo plano (p.ej. entrega tras el pago). Ver jobs.JobQueue.
+    """
+    __tablename__ = 'jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.JSON, nullable=False, default=dict)
+    # Id del evento de Stripe: un reintento del webhook no duplica la entrega
+    idempotency_key = db.Column(db.String(120), unique=True, nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='pending', index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    locked_by = db.Column(db.String(120), nullable=True)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+class QRCodeImage(db.Model):
+    """
+    QR ya renderizado (PNG/SVG por tamaño), direccionado por contenido. Ver qr.QRStore.
+    """
+    __tablename__ = 'qr_codes'
+
+    key = db.Column(db.String(64), primary_key=True)
+    game_id = db.Column(db.String(8), nullable=False, index=True)
+    fmt = db.Column(db.String(4), nullable=False)
+    size = db.Column(db.String(4), nullable=False)
+    content = db.Column(db.LargeBinary, nullable=False)
+    etag = db.Column(db.String(32), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+qr_store = QRStore(db, QRCodeImage)
+
+class PlayerEvent(db.Model):
+    """
+    Evento de progreso del player (inicio, nivel visto, intento, final). Ver telemetry.py.
+    """
+    __tablename__ = 'player_events'
+
+    id = db.Column(db.Integer, primary_key=True)
+    game_id = db.Column(db.String(8), nullable=False)
+    session_id = db.Column(db.String(36), nullable=False)
+    kind = db.Column(db.String(10), nullable=False)
+    level = db.Column(db.SmallInteger, nullable=False, default=0)
+    ok = db.Column(db.Boolean, nullable=True)
+    ms = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (db.Index("ix_player_events_game_id_level", "game_id", "level"),
+                      db.Index("ix_player_events_created_at", "created_at"))
+
+class PlayerLevelStats(db.Model):
+    """
+    Resumen por experiencia y nivel, sumado en cada volcado: los informes no leen player_events.
+    """
+    __tablename__ = 'player_level_stats'
+
+    game_id = db.Column(db.String(8), primary_key=True)
+    level = db.Column(db.SmallInteger, primary_key=True)
+    views = db.Column(db.Integer, nullable=False, default=0)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    failures = db.Column(db.Integer, nullable=False, default=0)
+    completions = db.Column(db.Integer, nullable=False, default=0)
+    total_ms = db.Column(db.BigInteger, nullable=False, default=0)
+
+# Telemetría del player: buffer acotado en memoria (TELEMETRY_BUFFER eventos) que
+# un hilo vuelca por lotes (TELEMETRY_BATCH) cada TELEMETRY_FLUSH_INTERVAL s
+telemetry = TelemetryBuffer(
+    db, PlayerEvent, PlayerLevelStats,
+    max_events=int(os.getenv("TELEMETRY_BUFFER", "50000")),
+    batch_size=int(os.getenv("TELEMETRY_BATCH", "500")),
+    flush_interval=float(os.getenv("TELEMETRY_FLUSH_INTERVAL", "2")),
+)
+
+# Páginas de experiencias pagadas ya renderizadas (PAGE_CACHE_DIR comparte entre workers del nodo)
+page_cache = PageCache(
+    max_entries=int(os.getenv("PAGE_CACHE_SIZE", "1000")),
+    ttl=int(os.getenv("PAGE_CACHE_TTL", "300")),
+    backend=DiskPageBackend(os.getenv("PAGE_CACHE_DIR")) if os.getenv("PAGE_CACHE_DIR") else None,
+)
+# Exportación estática de experiencias pagadas (vacío = desactivada). Ver static_export.py
+STATIC_EXPORT_DIR = os.getenv("STATIC_EXPORT_DIR")
+
+# Assets compilados ('python assets.py'): Tailwind purgado, Font Awesome recortado y
+# css/js con hash, servidos en /assets/ con caché inmutable. ASSETS_BASE_URL permite un CDN
+asset_manifest = AssetManifest(app.static_folder, os.getenv("ASSETS_BASE_URL", "/assets"))
+
+@app.template_global()
+def asset_url(name):
+    """URL con hash si está compilado; si no, /static. None si solo existe tras el build (tailwind.css...)."""
+    url = asset_manifest.url(name)
+    if url:
+        return url
+    if os.path.exists(os.path.join(app.static_folder, name)):
+        return url_for('static', filename=name)
+    return None
+
+@app.template_global()
+def font_preload(stem):
+    """{'url', 'type'} de la fuente compilada (woff2 o woff, la que generó el build), o None."""
+    found = asset_manifest.font(stem)
+    return {"url": found[0], "type": f"font/{found[1]}"} if found else None
+
+@app.route("/assets/<path:filename>")
+def hashed_asset(filename):
+    """Ficheros de static/dist: el nombre lleva el hash, así que caché de un año. Sirve .br/.gz."""
+    found = asset_manifest.find(filename, request.headers.get("Accept-Encoding"))
+    if not found:
+        abort(404)
+    path, encoding, immutable = found
+    response = send_file(path, mimetype=mimetypes.guess_type(filename)[0], conditional=True)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Access-Control-Allow-Origin"] = "*" # Fuentes con 'preload crossorigin'
+    # Un hash antiguo recibe el contenido actual: ese no se puede fijar para siempre
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable" if immutable else "public, max-age=300"
+    return response
+
+# Plantillas del creador (static/plantillas) validadas y en memoria; se releen al
+# cambiar su mtime (comprobación cada PLANTILLAS_CHECK_INTERVAL s). Ver plantillas.py
+plantillas = TemplateRegistry(os.path.join(app.static_folder, 'plantillas'),
+                              check_interval=float(os.getenv("PLANTILLAS_CHECK_INTERVAL", "2")))
+
+# Cola durable de trabajos. Por defecto el propio proceso web arranca un worker;
+# con JOB_INLINE_WORKER=0 la entrega queda solo para 'python worker.py'.
+job_queue = JobQueue(db, Job, max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "8")))
+
+# Métricas en formato Prometheus (/metrics). METRICS_TOKEN protege el endpoint;
+# SLOW_REQUEST_MS > 0 deja en el log las peticiones más lentas que ese umbral
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+metrics_registry = Registry()
+http_seconds = metrics_registry.histogram(
+    "dw_http_request_seconds", "Latencia por endpoint (en SSE, hasta enviar la cabecera)",
+    labels=("endpoint", "method", "status"))
+dependency_seconds = metrics_registry.histogram(
+    "dw_dependency_seconds", "Latencia de servicios externos (gemini, stripe, sendgrid, db)",
+    labels=("dependency", "operation"))
+dependency_errors = metrics_registry.counter(
+    "dw_dependency_errors_total", "Llamadas a servicios externos que fallaron", labels=("dependency", "operation"))
+gemini_tokens = metrics_registry.counter(
+    "dw_gemini_tokens_total", "Tokens de Gemini según usage_metadata", labels=("route", "kind"))
+chat_json_results = metrics_registry.counter(
+    "dw_chat_json_total", "JSON devuelto por la IA: ok o motivo del fallo", labels=("mode", "result"))
+
+with app.app_context():
+    instrument_sqlalchemy(db.engine, dependency_seconds, dependency_errors)
+
+def dependency(name, operation):
+    """Cronometra una llamada a un servicio externo: with dependency("stripe", "checkout.create"): ..."""
+    return timed(dependency_seconds, dependency_errors, dependency=name, operation=operation)
+
+def observe_request(endpoint, method, status, seconds, path=None):
+    http_seconds.observe(seconds, endpoint=endpoint, method=method, status=status)
+    if SLOW_REQUEST_MS and seconds * 1000 >= SLOW_REQUEST_MS:
+        print(f"🐢 Petición lenta: {method} {path or endpoint} -> {status} en {seconds * 1000:.0f} ms")
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else "<sin ruta>"
+        observe_request(endpoint, request.method, response.status_code, time.perf_counter() - started, request.path)
+    return response
 
 # ==========================================================================
 # SECCIÓN 3: HELPERS (IA, QR Y EMAIL)
 # ==========================================================================
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+def load_gemini_client():
+    if os.getenv("GEMINI_FAKE"):
+        # Cliente local sin red (desarrollo y benchmarks)
+        from fakes import FakeGeminiClient
+        return FakeGeminiClient(latency=float(os.getenv("GEMINI_FAKE_LATENCY", "0")))
+    from google import genai
+    from google.genai import types
+
+    # GEMINI_BASE_URL permite apuntar a un servidor compatible (p.ej. fakes.FakeGeminiServer)
+    http_options = types.HttpOptions(base_url=os.getenv("GEMINI_BASE_URL")) if os.getenv("GEMINI_BASE_URL") else None
+    return genai.Client(api_key=os.getenv("GEMINI_API_KEY"), http_options=http_options)
+
+# Se construye en la primera llamada (o en el precalentamiento de create_app)
+client = LazyClient(load_gemini_client, "gemini")
 MODEL_NAME = "gemini-2.5-flash" 
 
-def generate_qr_base64(url):
-    """Genera un código QR y lo devuelve como string base64 para embeber en HTML/Email."""
-    qr = qrcode.QRCode(version=1, box_size=10, border=4)
-    qr.add_data(url)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
-    
-    buffered = BytesIO()
-    img.save(buffered, format="PNG")
-    return base64.b64encode(buffered.getvalue()).decode("utf-8")
+# Prompt de sistema cacheado en Gemini + historial dentro de presupuesto
+assembler_options = {
+    "token_budget": int(os.getenv("PROMPT_TOKEN_BUDGET", "4000")),
+    "use_cache": os.getenv("GEMINI_CONTEXT_CACHE", "1") == "1",
+}
+prompt_assembler = PromptAssembler(client, MODEL_NAME, PRODUCT_PROMPTS["mini_escape"], **assembler_options)
+# Modo ajuste: el modelo devuelve un JSON Patch en lugar del juego completo
+patch_assembler = PromptAssembler(client, MODEL_NAME, PRODUCT_PROMPTS["mini_escape_patch"], **assembler_options)
+
+# Caché de generaciones iniciales (ideas repetidas y presets)
+generation_cache = GenerationCache(
+    max_entries=int(os.getenv("GENERATION_CACHE_SIZE", "500")),
+    ttl=int(os.getenv("GENERATION_CACHE_TTL", "86400")),
+    backend=DBCacheBackend(db, GenerationCacheEntry) if os.getenv("GENERATION_CACHE_PERSIST") == "1" else None,
+)
+
+# Control de admisión de llamadas al LLM (cola corta + 429) y coalescing por juego
+admission = AdmissionController(
+    max_concurrent=int(os.getenv("LLM_MAX_CONCURRENT", "8")),
+    max_queue=int(os.getenv("LLM_MAX_QUEUE", "16")),
+    max_wait=float(os.getenv("LLM_MAX_WAIT", "2")),
+    per_game=int(os.getenv("LLM_PER_GAME", "1")),
+)
+llm_flights = SingleFlight(follower_timeout=float(os.getenv("LLM_FOLLOWER_TIMEOUT", "120")))
+
+def experience_link(game_id):
+    """Enlace absoluto a la experiencia (el que codifica el QR)."""
+    domain = os.getenv("DOMAIN_SHARE", "http://localhost:5000")
+    return f"{domain}/experience/{game_id}"
+
+def experience_qr(game_id, fmt="png", size="md"):
+    """(bytes, etag) del QR de la experiencia: se renderiza una vez y se reutiliza."""
+    return qr_store.get(game_id, experience_link(game_id), fmt, size)
 
 def send_delivery_email(to_email, game_url, qr_b64, answers, game_title):
-    """Envía el email transaccional usando SendGrid (Opción A)."""
+    """
+    Envía el email transaccional usando SendGrid (Opción A).
+    Lanza la excepción si falla para que la cola de trabajos lo reintente.
+    """
     if not os.getenv("SENDGRID_API_KEY"):
         print("⚠️ SendGrid API Key no configurada. Email no enviado.")
         return
+    from sendgrid import SendGridAPIClient
+    from sendgrid.helpers.mail import Mail, Attachment, FileContent, FileName, FileType, Disposition
 
     # Plantilla HTML del correo
     html_content = f"""
@@ -134,11 +457,14 @@ def send_delivery_email(to_email, game_url, qr_b64, answers, game_title):
     message.attachment = attachment
 
     try:
-        sg = SendGridAPIClient(os.getenv("SENDGRID_API_KEY"))
-        response = sg.send(message)
+        # SENDGRID_HOST permite apuntar a un sumidero local (fakes.FakeSendGridServer)
+        sg = SendGridAPIClient(os.getenv("SENDGRID_API_KEY"), host=os.getenv("SENDGRID_HOST", "https://api.sendgrid.com"))
+        with dependency("sendgrid", "mail.send"):
+            response = sg.send(message)
         print(f"📧 Email enviado correctamente a {to_email}. Status: {response.status_code}")
     except Exception as e:
         print(f"❌ Error crítico enviando email: {e}")
+        raise
 
 # ==========================================================================
 # SECCIÓN 4: ACCESO, RECUPERACIÓN Y CREACIÓN
@@ -175,12 +501,9 @@ def recover_game(game_id):
         return jsonify({"exists": True, "title": title})
     return jsonify({"exists": False})
 
-@app.route("/start")
-def start_creation():
-    if not session.get('autorizado'): return redirect(url_for('acceso_privado'))
-
-    game_id = str(uuid.uuid4())[:8]
-    initial_data = {
+def new_game_data():
+    """Estructura base de un juego recién creado."""
+    return {
         "visual_config": {
             "primary_color": "#9333EA",
             "bg_color": "#0F172A",
@@ -191,13 +514,55 @@ def start_creation():
         "steps": []
     }
 
+# Con DEFER_DRAFT_INSERT=1 un /start vacío no escribe en la BD: la fila se crea
+# con el primer guardado real (ver load_draft), así los rebotes no dejan basura
+DEFER_DRAFT_INSERT = os.getenv("DEFER_DRAFT_INSERT", "1") == "1"
+
+def load_draft(game_id):
+    """
+    Experiencia del creador, creándola si el /start se difirió. Solo para ids
+    que vienen de la sesión (firmada): /start es quien los emite.
+    """
+    exp = Experience.query.get(game_id) if game_id else None
+    if exp is None and game_id and DEFER_DRAFT_INSERT:
+        exp = Experience(id=game_id, game_data=new_game_data())
+        db.session.add(exp)
+        try:
+            db.session.commit()
+            print(f"📝 Borrador {game_id} creado en su primer guardado")
+        except IntegrityError:
+            db.session.rollback() # Otra petición lo creó a la vez
+            exp = Experience.query.get(game_id)
+    return exp
+
+@app.route("/start")
+def start_creation():
+    if not session.get('autorizado'): return redirect(url_for('acceso_privado'))
+
+    game_id = str(uuid.uuid4())[:8]
+    initial_data = new_game_data()
+
+    # Si llega una temática (/start?theme=navidad) y hay un juego caliente, se entrega ya hecho
+    theme = request.args.get("theme")
+    warm = warm_pool.take(theme) if theme in THEMES else None
+    if warm:
+        initial_data = warm[1]
+
+    if DEFER_DRAFT_INSERT and not warm:
+        session['current_game_id'] = game_id
+        session['pending_game_id'] = game_id
+        session.pop('chat_history', None)
+        return redirect(url_for('creator', game_id=game_id))
+
     try:
         new_experience = Experience(id=game_id, game_data=initial_data)
         db.session.add(new_experience)
         db.session.commit()
+        if warm:
+            record_chat_turn(game_id, THEMES[theme][1], warm[0])
         
         session['current_game_id'] = game_id
-        session['chat_history'] = []
+        session.pop('chat_history', None) # Limpieza de cookies antiguas
         return redirect(url_for('creator', game_id=game_id))
     except Exception as e:
         db.session.rollback()
@@ -207,151 +572,734 @@ def start_creation():
 def creator(game_id):
     if not session.get('autorizado'): return redirect(url_for('acceso_privado'))
 
-    exp = Experience.query.get_or_404(game_id)
+    exp = Experience.query.get(game_id)
+    if exp is None:
+        # Borrador diferido: aún no existe en la BD hasta su primer guardado
+        if session.get('pending_game_id') != game_id: abort(404)
+        session['current_game_id'] = game_id
+        return render_template("creator.html", initial_data=new_game_data(), game_id=game_id, version=None)
     
     # SEGURIDAD: Si ya pagó, no dejar editar. Mandar a la entrega.
     if exp.is_paid:
         return redirect(url_for('share_game', game_id=game_id))
 
     session['current_game_id'] = game_id
-    return render_template("creator.html", initial_data=exp.game_data, game_id=game_id)
+    return render_template("creator.html", initial_data=exp.game_data, game_id=game_id, version=exp.version)
 
 # ==========================================================================
 # SECCIÓN 5: LÓGICA CORE DE IA (CHAT) Y GUARDADO
 # ==========================================================================
+def build_chat_request(user_message, current_json, history):
+    """Prepara contents + config de Gemini a partir del historial y el JSON actual."""
+    return prompt_assembler.build(user_message, current_json, history)
+
+def log_token_usage(usage_metadata, route):
+    """Contabiliza los tokens de la respuesta (usage_metadata de Gemini)."""
+    usage = prompt_assembler.record_usage(usage_metadata)
+    if usage:
+        gemini_tokens.inc(usage['prompt_tokens'], route=route, kind="prompt")
+        gemini_tokens.inc(usage['cached_tokens'], route=route, kind="cached")
+        gemini_tokens.inc(usage['output_tokens'], route=route, kind="output")
+        print(f"🔢 {route} tokens: prompt={usage['prompt_tokens']} (cache={usage['cached_tokens']}) salida={usage['output_tokens']}")
+
+def extract_game_json(reply_text):
+    """Separa 'prosa ###JSON_DATA### JSON'. Devuelve (prosa, juego validado o None)."""
+    if JSON_DELIMITER not in reply_text:
+        chat_json_results.inc(mode="full", result="missing")
+        return reply_text, None
+    prose, json_part = reply_text.split(JSON_DELIMITER, 1)
+    try:
+        new_json = json.loads(strip_fences(json_part))
+    except json.JSONDecodeError as e:
+        print(f"⚠️ JSON de la IA no parseable: {e}")
+        chat_json_results.inc(mode="full", result="parse_error")
+        return prose.strip(), None
+    errors = validate_game(new_json)
+    if errors:
+        print(f"⚠️ JSON de la IA fuera de esquema: {errors[:3]}")
+        chat_json_results.inc(mode="full", result="schema_error")
+        return prose.strip(), None
+    chat_json_results.inc(mode="full", result="ok")
+    return prose.strip(), normalize_game(new_json)
+
+def wants_patch(mode, current_json):
+    """El modo ajuste solo tiene sentido si ya hay un juego sobre el que aplicar el parche."""
+    return mode == "patch" and is_valid_game(current_json, strict=False)
+
+def build_patch_request(user_message, current_json, history):
+    """Petición del modo ajuste: respuesta restringida por PATCH_RESPONSE_SCHEMA."""
+    return patch_assembler.build(
+        user_message, current_json, history,
+        response_mime_type="application/json",
+        response_schema=PATCH_RESPONSE_SCHEMA,
+    )
+
+def run_patch_refinement(user_message, current_json, history):
+    """
+    Pide al modelo solo las operaciones JSON Patch, las aplica y valida el resultado.
+    Devuelve (comentario, nuevo_json) o None si hay que regenerar el juego completo.
+    """
+    contents, config = build_patch_request(user_message, current_json, history)
+    with dependency("gemini", "generate_content"):
+        response = client.models.generate_content(model=MODEL_NAME, contents=contents, config=config)
+    return apply_patch_reply(current_json, response)
+
+def apply_patch_reply(current_json, response):
+    """Aplica sobre current_json el parche de la respuesta del modelo (o None si no es válido)."""
+    log_token_usage(response.usage_metadata, "/chat (ajuste)")
+
+    try:
+        payload = json.loads(response.text)
+        new_json = apply_patch(current_json, decode_operations(payload["operations"]))
+    except json.JSONDecodeError as e:
+        print(f"⚠️ Parche no parseable, se regenera completo: {e}")
+        chat_json_results.inc(mode="patch", result="parse_error")
+        return None
+    except (PatchError, KeyError, TypeError) as e:
+        print(f"⚠️ Parche no aplicable, se regenera completo: {e}")
+        chat_json_results.inc(mode="patch", result="patch_error")
+        return None
+
+    # Plantillas antiguas (p.ej. 'type': 'quiz') se validan con el mismo nivel de exigencia
+    errors = validate_game(new_json, strict=is_valid_game(current_json))
+    if errors:
+        print(f"⚠️ Parche fuera de esquema, se regenera completo: {errors[:3]}")
+        chat_json_results.inc(mode="patch", result="schema_error")
+        return None
+    chat_json_results.inc(mode="patch", result="ok")
+    return str(payload.get("comment", "")).strip(), normalize_game(new_json)
+
+def generate_fresh_game(prompt):
+    """Generación completa desde un juego vacío (la usa el pool caliente en segundo plano)."""
+    contents, config = build_chat_request(prompt, new_game_data(), [])
+    with admission.acquire(), dependency("gemini", "generate_content"):
+        response = client.models.generate_content(model=MODEL_NAME, contents=contents, config=config)
+    log_token_usage(response.usage_metadata, "warm-pool")
+    reply_text, new_json = extract_game_json(response.text)
+    return (reply_text, new_json) if new_json else None
+
+# Pool caliente por temática: un juego listo por temática por defecto
+# (WARM_POOL_DEPTH=0 lo desactiva, p. ej. en tests y benchmarks)
+warm_pool = WarmPool(
+    generate_fresh_game,
+    depth=int(os.getenv("WARM_POOL_DEPTH", "1")),
+    max_workers=int(os.getenv("WARM_POOL_WORKERS", "2")),
+)
+metrics_registry.collected(
+    "dw_warm_pool_hits_total", "Aperturas servidas desde el pool caliente",
+    lambda: [({}, warm_pool.hits)], kind="counter")
+metrics_registry.collected(
+    "dw_warm_pool_misses_total", "Aperturas genéricas sin juego listo en el pool",
+    lambda: [({}, warm_pool.misses)], kind="counter")
+metrics_registry.collected(
+    "dw_warm_pool_depth", "Juegos listos por temática en el pool caliente",
+    lambda: [({"theme": theme}, n) for theme, n in warm_pool.stats()["depth"].items()], labels=("theme",))
+
+def ready_generation(cache_key, user_message, current_json, history):
+    """
+    Respuesta lista sin llamar al modelo: primero la caché exacta y, para
+    aperturas genéricas sobre un juego vacío, un juego del pool caliente.
+    Devuelve (reply, new_json) o None.
+    """
+    cached = generation_cache.get(cache_key) if cache_key else None
+    if cached:
+        return cached["reply"], cached["new_json"]
+    if history or (current_json or {}).get("steps"):
+        return None
+    theme = match_theme(user_message)
+    return warm_pool.take(theme) if theme else None
+
+def finish_generation(reply_text, cache_key):
+    """Extrae y valida el JSON de una generación completa y la cachea si procede."""
+    reply_text, new_json = extract_game_json(reply_text)
+    if cache_key and new_json:
+        generation_cache.set(cache_key, {"reply": reply_text, "new_json": new_json})
+    return reply_text, new_json
+
+def generation_cache_key(user_message, current_json, history):
+    """Solo la primera generación es cacheable: con historial la respuesta depende de la conversación."""
+    if history or not generation_cache.enabled:
+        return None
+    return generation_key(user_message, current_json, PROMPT_VERSION)
+
+def persist_game_json(game_id, new_json):
+    """Sincroniza el JSON generado con la Base de Datos. Devuelve la versión resultante."""
+    if not game_id: return None
+    exp = load_draft(game_id)
+    if not exp: return None
+    if exp.content_hash == game_data_hash(new_json):
+        return exp.version # Mismo contenido: nada que escribir
+    exp.game_data = new_json
+    db.session.commit()
+    experience_changed(exp)
+    return exp.version
+
+def commit_chat_result(game_id, user_message, reply_text, new_json):
+    """Persiste el nuevo JSON (si lo hay) y registra el turno."""
+    if new_json:
+        persist_game_json(game_id, new_json)
+    record_chat_turn(game_id, user_message, reply_text)
+
+def record_chat_turn(game_id, user_message, reply_text):
+    """Guarda el turno en el almacén de conversaciones (no en la cookie)."""
+    if not game_id: return
+    conversations.append(game_id,
+                         {"role": "user", "content": user_message},
+                         {"role": "assistant", "content": reply_text})
+
+def overloaded_response(error):
+    """429 con Retry-After cuando el control de admisión rechaza la llamada."""
+    reply = "Ya hay una generación en curso para este juego." if error.reason == "game_busy" \
+        else "Hay mucha demanda ahora mismo. Inténtalo en unos segundos."
+    response = jsonify({"reply": reply, "retry_after": error.retry_after})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response
+
+def resolve_chat(user_message, current_json, patch_mode, game_id, history):
+    """
+    Flujo completo de /chat: respuesta lista (caché / pool) o llamada al
+    modelo con plaza del control de admisión. Devuelve (reply, new_json).
+    """
+    cache_key = generation_cache_key(user_message, current_json, history)
+    ready = None if patch_mode else ready_generation(cache_key, user_message, current_json, history)
+    if ready:
+        commit_chat_result(game_id, user_message, *ready)
+        return ready
+
+    with admission.acquire(game_id):
+        if patch_mode:
+            result = run_patch_refinement(user_message, current_json, history)
+            if result:
+                commit_chat_result(game_id, user_message, *result)
+                return result
+
+        contents, config = build_chat_request(user_message, current_json, history)
+        with dependency("gemini", "generate_content"):
+            response = client.models.generate_content(model=MODEL_NAME, contents=contents, config=config)
+    log_token_usage(response.usage_metadata, "/chat")
+    reply_text, new_json = finish_generation(response.text, cache_key)
+    commit_chat_result(game_id, user_message, reply_text, new_json)
+    return reply_text, new_json
+
 @app.route("/chat", methods=["POST"])
 def chat():
     if not session.get('autorizado'): return jsonify({"reply": "No auth"}), 403
 
     user_message = request.json.get("message")
     current_json = request.json.get("current_json")
+    patch_mode = wants_patch(request.json.get("mode"), current_json)
     game_id = session.get('current_game_id')
-    history = session.get('chat_history', [])
+    history = conversations.load(game_id) if game_id else []
+    session.pop('chat_history', None)
     
-    system_instruction = PRODUCT_PROMPTS.get("mini_escape")
-    context_instruction = f"{system_instruction}\n\nJSON ACTUAL:\n{json.dumps(current_json)}"
-
-    gemini_history = []
-    for msg in history:
-        role = "model" if msg["role"] == "assistant" else "user"
-        gemini_history.append(types.Content(role=role, parts=[types.Part.from_text(text=msg["content"])]))
-
+    # Un doble clic en "Generar" comparte la llamada en vuelo en lugar de repetirla
+    key = flight_key(game_id, user_message, patch_mode, current_json)
     try:
-        response = client.models.generate_content(
-            model=MODEL_NAME,
-            contents=gemini_history + [types.Content(role="user", parts=[types.Part.from_text(text=user_message)])],
-            config=types.GenerateContentConfig(
-                system_instruction=context_instruction, 
-                temperature=0.7
-            )
-        )
-        reply_text = response.text
-        new_json_extracted = None
-
-        if "###JSON_DATA###" in reply_text:
-            parts = reply_text.split("###JSON_DATA###")
-            json_str = re.sub(r'```[a-z]*\n?|```', '', parts[1]).strip()
-            try:
-                new_json_extracted = json.loads(json_str)
-                if game_id:
-                    exp = Experience.query.get(game_id)
-                    if exp:
-                        exp.game_data = new_json_extracted
-                        db.session.commit()
-                reply_text = parts[0].strip()
-            except: pass
-
-        history.append({"role": "user", "content": user_message})
-        history.append({"role": "assistant", "content": reply_text})
-        session['chat_history'] = history
-        session.modified = True 
-        
+        reply_text, new_json_extracted = llm_flights.run(
+            key, partial(resolve_chat, user_message, current_json, patch_mode, game_id, history))
         return jsonify({"reply": reply_text, "new_json": new_json_extracted})
 
+    except Overloaded as e:
+        return overloaded_response(e)
     except Exception as e:
         print(f"IA ERROR: {e}")
         return jsonify({"reply": "Error de conexión con la IA."}), 500
 
+@app.route("/chat/stream", methods=["POST"])
+def chat_stream():
+    """
+    Variante en streaming de /chat (Server-Sent Events).
+    Eventos: 'delta' (prosa parcial), 'json' (nuevo game_data validado), 'done' y 'error'.
+    """
+    if not session.get('autorizado'): return jsonify({"reply": "No auth"}), 403
+
+    user_message = request.json.get("message")
+    current_json = request.json.get("current_json")
+    game_id = session.get('current_game_id')
+    history = conversations.load(game_id) if game_id else []
+    session.pop('chat_history', None)
+
+    patch_mode = wants_patch(request.json.get("mode"), current_json)
+    cache_key = generation_cache_key(user_message, current_json, history)
+    ready = None if patch_mode else ready_generation(cache_key, user_message, current_json, history)
+
+    # Sin respuesta lista: o nos sumamos a la misma petición en vuelo o pedimos plaza (429 si no la hay)
+    key, flight, leader, ticket = None, None, True, None
+    if not ready:
+        key = flight_key(game_id, user_message, patch_mode, current_json)
+        flight, leader = llm_flights.begin(key)
+        if leader:
+            try:
+                ticket = admission.acquire(game_id)
+            except Overloaded as e:
+                llm_flights.finish(key, flight, error=e)
+                return overloaded_response(e)
+
+    def generate():
+        parser = ReplyStreamParser(validate=is_valid_game, normalize=normalize_game)
+        usage_metadata = None
+        result = None
+        try:
+            if ready:
+                yield from emit_complete_reply(*ready, game_id, user_message)
+                return
+            if not leader:
+                yield from emit_shared_reply(flight)
+                return
+
+            if patch_mode:
+                # El parche es pequeño: se pide de una vez y se emite como un solo bloque
+                result = run_patch_refinement(user_message, current_json, history)
+                if result:
+                    yield from emit_complete_reply(*result, game_id, user_message)
+                    return
+
+            contents, config = build_chat_request(user_message, current_json, history)
+            with dependency("gemini", "generate_content_stream"):
+                stream = client.models.generate_content_stream(model=MODEL_NAME, contents=contents, config=config)
+                for chunk in stream:
+                    usage_metadata = chunk.usage_metadata or usage_metadata
+                    for event, data in parser.feed(chunk.text or ""):
+                        yield emit_stream_event(event, data, game_id)
+            for event, data in parser.finish():
+                yield emit_stream_event(event, data, game_id)
+            log_token_usage(usage_metadata, "/chat/stream")
+            record_stream_json(parser)
+            result = (parser.prose.strip(), parser.new_json)
+            if cache_key and parser.new_json:
+                generation_cache.set(cache_key, {"reply": result[0], "new_json": parser.new_json})
+            record_chat_turn(game_id, user_message, result[0])
+            yield sse("done", {"reply": result[0]})
+        except Exception as e:
+            print(f"IA ERROR (stream): {e}")
+            yield sse("error", {"reply": "Error de conexión con la IA."})
+        finally:
+            if ticket:
+                ticket.release()
+            if leader:
+                llm_flights.finish(key, flight, result=result, error=None if result else RuntimeError("Sin resultado"))
+
+    response = Response(stream_with_context(generate()), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    def release_stream():
+        # Si el cliente se va antes del primer chunk, el 'finally' de generate() no llega a
+        # ejecutarse: se suelta aquí la plaza y el vuelo (ambos idempotentes)
+        if ticket:
+            ticket.release()
+        if leader and key:
+            llm_flights.finish(key, flight, error=RuntimeError("Cliente desconectado"))
+    response.call_on_close(release_stream)
+    return response
+
+def emit_complete_reply(reply_text, new_json, game_id, user_message):
+    """Emite como un único bloque una respuesta que ya está completa (parche o caché)."""
+    yield sse("delta", {"text": reply_text})
+    yield emit_stream_event("json", new_json, game_id)
+    record_chat_turn(game_id, user_message, reply_text)
+    yield sse("done", {"reply": reply_text})
+
+def emit_shared_reply(flight):
+    """Seguidora de una petición idéntica en vuelo: emite el resultado del líder sin volver a persistirlo."""
+    reply_text, new_json = llm_flights.wait(flight)
+    yield sse("delta", {"text": reply_text})
+    if new_json:
+        yield sse("json", {"new_json": new_json})
+    yield sse("done", {"reply": reply_text})
+
+def record_stream_json(parser):
+    """Resultado del JSON de una respuesta en streaming (mismas etiquetas que extract_game_json)."""
+    chat_json_results.inc(mode="full", result="ok" if parser.new_json else "invalid")
+
+def emit_stream_event(event, data, game_id):
+    """Traduce un evento del parser a SSE, persistiendo el JSON en cuanto es válido."""
+    if event == "json":
+        version = persist_game_json(game_id, data)
+        return sse("json", {"new_json": data, "version": version})
+    return sse(event, {"text": data})
+
+# Variantes en paralelo: N candidatos de la misma idea para elegir lado a lado
+VARIANTS_MAX = int(os.getenv("VARIANTS_MAX", "3"))
+VARIANT_TEMPERATURES = (0.7, 0.95, 1.2)
+variant_runner = VariantRunner(
+    max_workers=int(os.getenv("VARIANT_WORKERS", "6")),
+    max_per_user=int(os.getenv("VARIANTS_PER_USER", "3")),
+)
+
+def variant_count(data):
+    """Número de variantes pedido ('n'), entre 1 y VARIANTS_MAX. ValueError si no es un número."""
+    try:
+        return max(1, min(int(data.get("n", VARIANTS_MAX)), VARIANTS_MAX))
+    except (TypeError, ValueError):
+        raise ValueError("'n' debe ser un número")
+
+def build_variant_request(user_message, current_json, history, index, total):
+    """Cada variante con temperatura e indicación de enfoque distintas."""
+    prompt = f"{user_message}\n\n(Propuesta {index + 1} de {total}: explora un enfoque distinto al de las demás.)"
+    temperature = VARIANT_TEMPERATURES[index % len(VARIANT_TEMPERATURES)]
+    return prompt_assembler.build(prompt, current_json, history, temperature=temperature)
+
+def finish_variant(response):
+    """(reply, new_json) de una variante; ValueError si no trae un juego válido."""
+    log_token_usage(response.usage_metadata, "/chat/variants")
+    reply_text, new_json = extract_game_json(response.text)
+    if not new_json:
+        raise ValueError("La variante no trae un JSON válido")
+    return reply_text, new_json
+
+def generate_variant(user_message, current_json, history, index, total):
+    """Una variante completa (en un hilo de variant_runner)."""
+    contents, config = build_variant_request(user_message, current_json, history, index, total)
+    with admission.acquire(), dependency("gemini", "generate_content"):
+        response = client.models.generate_content(model=MODEL_NAME, contents=contents, config=config)
+    return finish_variant(response)
+
+@app.route("/chat/variants", methods=["POST"])
+def chat_variants():
+    """
+    Lanza N generaciones de la misma idea en paralelo y las emite por SSE
+    ('batch', 'variant', 'variant_error', 'done') según van terminando.
+    """
+    if not session.get('autorizado'): return jsonify({"reply": "No auth"}), 403
+
+    user_message = request.json.get("message")
+    current_json = request.json.get("current_json")
+    game_id = session.get('current_game_id')
+    try:
+        total = variant_count(request.json)
+    except ValueError as e:
+        return jsonify({"reply": str(e)}), 400
+    history = conversations.load(game_id) if game_id else []
+
+    tasks = [partial(generate_variant, user_message, current_json, history, i, total) for i in range(total)]
+    try:
+        batch = variant_runner.start(game_id or request.remote_addr, tasks)
+    except TooManyVariants:
+        return jsonify({"reply": "Ya hay variantes generándose. Espera un momento."}), 429
+    batch.prompt = user_message
+
+    def generate():
+        try:
+            yield sse("batch", {"batch_id": batch.id, "n": total})
+            for index, result in batch.iter_results():
+                if isinstance(result, Exception):
+                    print(f"IA ERROR (variante {index}): {result}")
+                    yield sse("variant_error", {"index": index})
+                    continue
+                yield sse("variant", {"index": index, "reply": result[0], "new_json": result[1]})
+            yield sse("done", {})
+        except GeneratorExit:
+            batch.cancel() # El cliente se ha ido: no seguimos gastando llamadas
+            raise
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/chat/variants/<batch_id>/choose", methods=["POST"])
+def choose_variant(batch_id):
+    """Fija la variante elegida y cancela las que sigan pendientes."""
+    if not session.get('autorizado'): return jsonify({"reply": "No auth"}), 403
+
+    game_id = session.get('current_game_id')
+    batch = variant_runner.get(batch_id, game_id or request.remote_addr)
+    if not batch: return jsonify({"success": False}), 404
+
+    try:
+        index = int(request.json.get("index", -1))
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "error": "'index' debe ser un número"}), 400
+    result = batch.results.get(index)
+    if not result: return jsonify({"success": False}), 409
+
+    variant_runner.discard(batch_id)
+    reply_text, new_json = result
+    version = persist_game_json(game_id, new_json)
+    record_chat_turn(game_id, batch.prompt, reply_text)
+    return jsonify({"success": True, "reply": reply_text, "new_json": new_json, "version": version})
+
+# Autosave del creador: contadores de escrituras evitadas para /api/stats
+save_stats = {"requests": 0, "writes": 0, "skipped": 0, "partial": 0, "conflicts": 0, "bytes_in": 0}
+
+def save_conflict(exp):
+    """409 con el estado actual para que el cliente reaplique sus cambios encima."""
+    save_stats["conflicts"] += 1
+    return jsonify({"success": False, "conflict": True, "version": exp.version, "game_data": exp.game_data}), 409
+
 @app.route("/save_experience", methods=["POST"])
 def save_experience():
+    """
+    Acepta el game_data completo o un 'patch' (JSON Patch con solo los pasos /
+    claves que cambiaron). Con 'base_version' se exige que nadie haya escrito
+    desde entonces (409 si no). Si el contenido no cambia no se toca la fila.
+    """
     data = request.json
-    game_id = session.get('current_game_id') or data.get('game_id')
-    exp = Experience.query.get(game_id)
+    if session.get('current_game_id'):
+        game_id = session['current_game_id']
+        exp = load_draft(game_id)
+    else:
+        game_id = data.get('game_id')
+        exp = Experience.query.get(game_id)
     
     if not exp: return jsonify({"success": False}), 404
-    
-    if 'game_data' in data: exp.game_data = data['game_data']
-    if 'real_gift' in data: 
+    save_stats["requests"] += 1
+    save_stats["bytes_in"] += request.content_length or 0
+
+    base_version = data.get('base_version')
+    if base_version is not None and base_version != exp.version:
+        return save_conflict(exp)
+
+    game_data = exp.game_data
+    try:
+        if data.get('patch'):
+            game_data = apply_patch(exp.game_data or {}, data['patch'])
+            save_stats["partial"] += 1
+        elif 'game_data' in data:
+            game_data = data['game_data']
+    except (PatchError, KeyError, TypeError) as e:
+        # KeyError/TypeError: operación sin 'from', ruta que no es texto, parche que no es lista...
+        return jsonify({"success": False, "error": f"Parche no válido: {e}"}), 400
+
+    changed = False
+    if game_data_hash(game_data) != (exp.content_hash or game_data_hash(exp.game_data)):
+        errors = validate_game(game_data, strict=False, allow_empty=True)
+        if errors:
+            return jsonify({"success": False, "error": "; ".join(errors[:3])}), 400
+        exp.game_data = normalize_game(game_data)
+        changed = True
+    prepare_checkout = False
+    if 'real_gift' in data and (data['real_gift'] != exp.real_gift or not exp.finalized_at):
         exp.real_gift = data['real_gift']
         exp.finalized_at = datetime.utcnow()
-    
-    db.session.commit()
-    return jsonify({"success": True})
+        changed = True
+        prepare_checkout = CHECKOUT_PREPARE and not exp.is_paid
+
+    if not changed:
+        save_stats["skipped"] += 1
+        return jsonify({"success": True, "skipped": True, "version": exp.version})
+
+    try:
+        # El UPDATE versionado sale aquí (flush explícito): la consulta de enqueue()
+        # no puede volcarlo fuera de este try y saltarse el 409
+        db.session.flush()
+        if prepare_checkout:
+            # El creador ha terminado: la sesión de pago se crea ya, en segundo plano
+            job_queue.enqueue("prepare_checkout", {"game_id": game_id},
+                              key=f"prepare_checkout:{game_id}:{exp.version}", commit=False)
+        db.session.commit()
+    except StaleDataError:
+        # Otra escritura se coló entre la lectura y el UPDATE
+        db.session.rollback()
+        return save_conflict(Experience.query.get(game_id))
+    save_stats["writes"] += 1
+    experience_changed(exp)
+    return jsonify({"success": True, "version": exp.version})
+
+# Contadores internos (caché de generaciones, tokens...) para el área privada
+@app.route("/api/stats")
+def internal_stats():
+    if not session.get('autorizado'): return jsonify({"error": "No auth"}), 403
+    return jsonify({
+        "generation_cache": generation_cache.stats(),
+        "warm_pool": warm_pool.stats(),
+        "tokens": prompt_assembler.usage,
+        "tokens_patch": patch_assembler.usage,
+        "admission": admission.stats(),
+        "coalescing": llm_flights.stats(),
+        "jobs": job_queue.stats(),
+        "qr": qr_store.stats(),
+        "payment_events": payment_events.stats(),
+        "page_cache": page_cache.stats(),
+        "autosave": save_stats,
+        "db_pool": pool_status(db.engine),
+        "startup": startup_stats(),
+        "checkout": checkout_sessions.stats,
+        "plantillas": plantillas.stats(),
+        "telemetry": telemetry.stats(),
+    })
+
+# Scraping de Prometheus (métricas de este proceso)
+@app.route("/metrics")
+def prometheus_metrics():
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        return Response("No auth\n", status=403, mimetype="text/plain")
+    return Response(metrics_registry.render(), mimetype="text/plain; version=0.0.4")
 
 # ==========================================================================
 # SECCIÓN 6: PAGO, WEBHOOK Y ENTREGA (CRÍTICO)
 # ==========================================================================
 
-# 1. Endpoint ligero para que share.html pregunte si ya se pagó
+# Avisos de pago: el webhook publica y share.html espera (long-poll) sin tocar la BD.
+# Con Postgres se reparten entre procesos con LISTEN/NOTIFY; si no, broker en proceso,
+# que solo sirve con un único proceso web (hilos sí): con varios, quien espera en otro
+# worker no se enteraría nunca, así que se exige un broker real.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1")) # Workers de gunicorn/uvicorn
+if os.getenv("PAYMENT_BROKER", "postgres" if (db_url or "").startswith("postgresql") else "memory") == "postgres":
+    payment_events = PostgresBroker(db_url.replace("postgresql+psycopg2://", "postgresql://", 1))
+elif WEB_CONCURRENCY > 1:
+    raise RuntimeError(f"PAYMENT_BROKER=memory con WEB_CONCURRENCY={WEB_CONCURRENCY}: los avisos de pago "
+                       "no cruzan procesos. Usa Postgres (PAYMENT_BROKER=postgres) o un solo worker con hilos.")
+else:
+    payment_events = MemoryBroker()
+PAYMENT_WAIT_TIMEOUT = int(os.getenv("PAYMENT_WAIT_TIMEOUT", "25"))
+
+def payment_channel(game_id):
+    return f"payment:{game_id}"
+
+def payment_paid(game_id):
+    exp = Experience.query.get(game_id)
+    return bool(exp and exp.is_paid)
+
+# 1. Endpoint ligero para que share.html pregunte si ya se pagó (respaldo del long-poll)
 @app.route("/check_payment_status/<game_id>")
 def check_payment_status(game_id):
     exp = Experience.query.get(game_id)
     return jsonify({"paid": exp.is_paid if exp else False})
 
+@app.route("/payment_status/<game_id>/wait")
+def wait_payment_status(game_id):
+    """
+    Long-poll: una consulta a la BD al suscribirse y después solo el broker hasta
+    que el webhook publica el pago (o timeout=true pasados PAYMENT_WAIT_TIMEOUT s).
+    En un worker sin hilos ('gunicorn app:app', sync) esperar bloquearía el proceso:
+    ahí se responde ya y share.html vuelve a preguntar pasado 'retry_ms'.
+    """
+    if payment_paid(game_id):
+        payload = {"paid": True}
+    elif not request.environ.get("wsgi.multithread"):
+        payload = {"paid": False, "retry_ms": PAYMENT_WAIT_TIMEOUT * 1000}
+    else:
+        payload = payment_events.wait(payment_channel(game_id), PAYMENT_WAIT_TIMEOUT) or {"paid": False, "timeout": True}
+    response = jsonify(payload)
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
 # 2. Sala de Espera / Entrega de Producto
 @app.route("/share/<game_id>")
 def share_game(game_id):
     exp = Experience.query.get_or_404(game_id)
     
     # Construimos enlace absoluto
-    domain = os.getenv("DOMAIN_SHARE", "http://localhost:5000")
-    final_link = f"{domain}{url_for('play_experience', game_id=game_id)}"
+    final_link = experience_link(game_id)
     
-    qr_b64 = None
+    qr_url = None
     if exp.is_paid:
-        # Generamos el QR al vuelo solo si ya está pagado
-        qr_b64 = generate_qr_base64(final_link)
+        # El QR se sirve aparte (cacheable); la versión en la URL lo hace inmutable
+        _, etag = experience_qr(game_id)
+        qr_url = url_for('qr_image', game_id=game_id, fmt='png', size='md', v=etag[:12])
     
     return render_template("share.html", 
                            game=exp, 
                            game_link=final_link, 
-                           qr_code=qr_b64, 
+                           qr_url=qr_url, 
                            is_paid=exp.is_paid)
 
-# 3. Creación de Checkout de Stripe
+@app.route("/qr/<game_id>.<fmt>")
+def qr_image(game_id, fmt):
+    """QR de una experiencia pagada. ?size=sm|md|lg. ETag fuerte + caché larga."""
+    size = request.args.get('size', 'md')
+    if fmt not in FORMATS or size not in SIZES: return "Formato no soportado", 404
+    exp = Experience.query.get_or_404(game_id)
+    if not exp.is_paid: return "QR disponible tras el pago", 404
+
+    content, etag = experience_qr(game_id, fmt, size)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(content, mimetype=FORMATS[fmt])
+    response.set_etag(etag)
+    # Con ?v=<etag> la URL identifica el contenido exacto: inmutable
+    if request.args.get('v') == etag[:12]:
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    else:
+        response.headers["Cache-Control"] = "public, max-age=86400"
+    return response
+
+# 3. Checkout de Stripe: una sesión abierta por experiencia, reutilizada (ver checkout.py)
+# CHECKOUT_SESSION_TTL: vida de la sesión en Stripe (s, máx. 24 h); CHECKOUT_REUSE_MARGIN:
+# no se reutiliza si caduca antes de eso; CHECKOUT_PREPARE=0 no la crea al finalizar
+CHECKOUT_PREPARE = os.getenv("CHECKOUT_PREPARE", "1") == "1"
+
+def checkout_params(exp):
+    """Argumentos de Session.create. Sin url_for: también se llama desde la cola, fuera de petición."""
+    domain = os.getenv("DOMAIN_SHARE", "http://localhost:5000")
+    return dict(
+        payment_method_types=['card'],
+        customer_email=None, # Stripe se encarga de pedirlo en el formulario
+        line_items=[{
+            'price_data': {
+                'currency': 'eur',
+                'product_data': {
+                    'name': f'Digital Wrap: {(exp.game_data or {}).get("title", "Regalo")}',
+                    'description': 'Experiencia completa + QR + Enlace único',
+                },
+                'unit_amount': 249, # 2.49 EUR
+            },
+            'quantity': 1,
+        }],
+        mode='payment',
+        metadata={'game_id': exp.id},
+
+        # REDIRECCIONES CLAVE
+        success_url=f"{domain}/share/{exp.id}",
+        cancel_url=f"{domain}/demo/{exp.id}",
+    )
+
+checkout_sessions = CheckoutSessions(
+    db, Experience, stripe, checkout_params,
+    ttl=int(os.getenv("CHECKOUT_SESSION_TTL", str(23 * 3600))),
+    reuse_margin=int(os.getenv("CHECKOUT_REUSE_MARGIN", "900")),
+    timer=partial(dependency, "stripe"),
+)
+
 @app.route("/pay/<game_id>")
 def pay(game_id):
     exp = Experience.query.get_or_404(game_id)
-    domain = os.getenv("DOMAIN_SHARE", "http://localhost:5000")
-    
+    if exp.is_paid:
+        return redirect(url_for('share_game', game_id=game_id))
+
     try:
-        checkout_session = stripe.checkout.Session.create(
-            payment_method_types=['card'],
-            customer_email=None, # Stripe se encarga de pedirlo en el formulario
-            line_items=[{
-                'price_data': {
-                    'currency': 'eur',
-                    'product_data': {
-                        'name': f'Digital Wrap: {exp.game_data.get("title", "Regalo")}',
-                        'description': 'Experiencia completa + QR + Enlace único',
-                    },
-                    'unit_amount': 249, # 2.49 EUR
-                },
-                'quantity': 1,
-            }],
-            mode='payment',
-            metadata={'game_id': game_id},
-            
-            # REDIRECCIONES CLAVE
-            success_url=f"{domain}{url_for('share_game', game_id=game_id)}",
-            cancel_url=f"{domain}{url_for('demo_experience', game_id=game_id)}",
-        )
-        return redirect(checkout_session.url, code=303)
+        # Caso normal: sesión ya preparada al finalizar -> redirección sin llamar a Stripe
+        return redirect(checkout_sessions.checkout_url(exp), code=303)
     except Exception as e:
         print(f"Stripe Error: {e}")
         return "Error al iniciar pago.", 500
 
+@job_queue.handler("prepare_checkout")
+def prepare_checkout_job(payload):
+    """Trabajo: sesión de Stripe lista antes de que el comprador pulse "Pagar"."""
+    checkout_sessions.prepare(payload["game_id"])
+
+WEBHOOK_PAID_ATTEMPTS = 3
+
+def mark_paid(game_id, customer_email, event_id):
+    """
+    Marca la experiencia como pagada y encola la entrega (misma transacción).
+    Si un autosave cambia la fila entre la lectura y el UPDATE (StaleDataError)
+    se relee y se reintenta. Devuelve la experiencia, o None si no había nada que hacer.
+    """
+    for attempt in range(WEBHOOK_PAID_ATTEMPTS):
+        exp = Experience.query.get(game_id)
+        if not exp or exp.is_paid:
+            return None
+        exp.is_paid = True
+        exp.customer_email = customer_email
+        exp.checkout_session_id = exp.checkout_url = exp.checkout_expires_at = exp.checkout_key = None
+        try:
+            db.session.flush() # El UPDATE versionado, antes de la consulta de enqueue()
+            job_queue.enqueue("deliver_order", {"game_id": game_id}, key=event_id, commit=False)
+            db.session.commit()
+        except StaleDataError:
+            db.session.rollback()
+            print(f"⚠️ Webhook: {game_id} cambió mientras se marcaba como pagada (intento {attempt + 1})")
+            continue
+        except IntegrityError:
+            db.session.rollback() # Evento ya encolado por otra entrega del webhook
+            return None
+        return exp
+    raise StaleDataError(f"{game_id} sigue cambiando tras {WEBHOOK_PAID_ATTEMPTS} intentos")
+
 # 4. Webhook: Donde ocurre la magia (Confirmación + Email)
+# Solo marca el pago y encola la entrega: Stripe recibe su 200 al momento
 @app.route("/webhook", methods=["POST"])
 def webhook():
     payload = request.get_data()
@@ -359,9 +1307,11 @@ def webhook():
     endpoint_secret = os.getenv("STRIPE_WEBHOOK_SECRET")
 
     try:
-        event = stripe.Webhook.construct_event(payload, sig_header, endpoint_secret)
+        stripe.Webhook.construct_event(payload, sig_header, endpoint_secret)
     except Exception as e:
         return jsonify(success=False), 400
+    # Firma verificada: trabajamos con el JSON plano (los StripeObject recientes no admiten .get)
+    event = json.loads(payload)
 
     if event['type'] == 'checkout.session.completed':
         session_obj = event['data']['object']
@@ -369,47 +1319,87 @@ def webhook():
         customer_email = session_obj.get('customer_details', {}).get('email')
         
         if game_id:
-            exp = Experience.query.get(game_id)
-            if exp and not exp.is_paid:
-                # A. Actualizar Base de Datos
-                exp.is_paid = True
-                exp.customer_email = customer_email
-                db.session.commit()
+            try:
+                exp = mark_paid(game_id, customer_email, event['id'])
+            except StaleDataError:
+                return jsonify(success=False), 500 # Stripe reintenta la entrega del evento
+            if exp:
                 print(f"💰 PAGO OK: {game_id} | Email: {customer_email}")
-
-                # B. Preparar Datos para Email
-                domain = os.getenv("DOMAIN_SHARE", "http://localhost:5000")
-                final_link = f"{domain}{url_for('play_experience', game_id=game_id)}"
-                qr_b64 = generate_qr_base64(final_link)
-                title = exp.game_data.get("title", "Tu Experiencia")
-                
-                # C. Extraer respuestas (Parsing seguro)
-                answers_text = ""
+                experience_changed(exp)
                 try:
-                    steps = exp.game_data.get('steps', [])
-                    for i, step in enumerate(steps):
-                        if 'answer' in step:
-                            answers_text += f"Nivel {i+1}: {step['answer']}\n"
-                except:
-                    answers_text = "No se pudieron extraer las respuestas automáticas."
+                    payment_events.publish(payment_channel(game_id), {"paid": True})
+                except Exception as e:
+                    print(f"⚠️ No se pudo publicar el aviso de pago: {e}") # share.html tiene respaldo
 
-                # D. Enviar Email vía SendGrid
-                if customer_email:
-                    send_delivery_email(customer_email, final_link, qr_b64, answers_text, title)
+    elif event['type'] == 'checkout.session.expired':
+        # La sesión guardada caducó sin pago: el próximo /pay crea otra
+        checkout_sessions.forget(event['data']['object']['id'])
 
     return jsonify(success=True)
 
+@job_queue.handler("deliver_order")
+def deliver_order(payload):
+    """Trabajo de entrega: QR + hoja de respuestas por email al comprador."""
+    exp = Experience.query.get(payload["game_id"])
+    if not exp or not exp.customer_email:
+        print(f"⚠️ Entrega sin email para {payload['game_id']}, nada que enviar.")
+        return
+
+    # B. Preparar Datos para Email (mismo QR que sirve /qr/<id>.png)
+    final_link = experience_link(exp.id)
+    qr_png, _ = experience_qr(exp.id)
+    qr_b64 = base64.b64encode(qr_png).decode("utf-8")
+    title = (exp.game_data or {}).get("title", "Tu Experiencia")
+    
+    # C. Extraer respuestas (Parsing seguro)
+    answers_text = ""
+    try:
+        steps = exp.game_data.get('steps', [])
+        for i, step in enumerate(steps):
+            if 'answer' in step:
+                answers_text += f"Nivel {i+1}: {step['answer']}\n"
+    except:
+        answers_text = "No se pudieron extraer las respuestas automáticas."
+
+    # D. Enviar Email vía SendGrid (si falla, la cola reintenta con backoff)
+    send_delivery_email(exp.customer_email, final_link, qr_b64, answers_text, title)
+
 # ==========================================================================
 # SECCIÓN 7: VISTAS FINALES (DEMO VS JUEGO)
 # ==========================================================================
 @app.route('/demo/default')
 def demo():
-    # Demo estática (JSON local)
-    try:
-        json_path = os.path.join(app.static_folder, 'plantillas', 'logica.json')
-        with open(json_path, 'r', encoding='utf-8') as f: game_data = json.load(f)
-        return render_template('demo.html', game_data=json.dumps(game_data), is_demo=False)
-    except: return "Demo no encontrada", 404
+    # Demo estática (plantilla del registro, ya en memoria)
+    plantilla = plantillas.get('logica')
+    if plantilla is None: return "Demo no encontrada", 404
+    return render_template('demo.html', game_data=plantilla.body.decode('utf-8'), is_demo=False)
+
+def plantilla_response(payload, etag, immutable=False):
+    """JSON con ETag: 304 si el navegador ya lo tiene; inmutable si la URL lleva ?v=<etag>."""
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    elif isinstance(payload, bytes):
+        response = Response(payload, mimetype="application/json")
+    else:
+        response = jsonify(payload)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable" if immutable else "public, no-cache"
+    return response
+
+@app.route("/api/plantillas")
+def plantillas_manifest():
+    """Manifiesto de plantillas (título, icono, niveles, etag). ?include=data añade el contenido."""
+    if request.args.get('include') == 'data':
+        bundle = plantillas.bundle()
+        return plantilla_response(bundle, f"{bundle['version']}-data")
+    manifest = plantillas.manifest()
+    return plantilla_response(manifest, manifest["version"])
+
+@app.route("/api/plantillas/<name>")
+def plantilla_detail(name):
+    plantilla = plantillas.get(name)
+    if plantilla is None: return jsonify({"error": "Plantilla no encontrada"}), 404
+    return plantilla_response(plantilla.body, plantilla.etag, immutable=request.args.get('v') == plantilla.etag)
 
 @app.route("/demo/<game_id>")
 def demo_experience(game_id):
@@ -417,22 +1407,220 @@ def demo_experience(game_id):
     exp = Experience.query.get_or_404(game_id)
     return render_template("player.html", game_data=json.dumps(exp.game_data), is_demo=True, game_id=game_id)
 
+def experience_changed(exp):
+    """Tras escribir una experiencia: fuera su página cacheada y, si está pagada, se reexporta en segundo plano."""
+    page_cache.invalidate(exp.id)
+    if STATIC_EXPORT_DIR and exp.is_paid:
+        remove_export(STATIC_EXPORT_DIR, exp.id)
+        job_queue.enqueue("export_experience", {"game_id": exp.id})
+
+@job_queue.handler("export_experience")
+def export_experience_job(payload):
+    """Trabajo: HTML autocontenido y precomprimido de una experiencia pagada."""
+    exp = Experience.query.get(payload["game_id"])
+    if exp and exp.is_paid and STATIC_EXPORT_DIR:
+        export_experience(app, exp, STATIC_EXPORT_DIR)
+        print(f"📦 Experiencia {exp.id} exportada")
+
+def send_exported(found):
+    """Sirve la variante exportada (br/gzip/html) con validadores HTTP."""
+    path, encoding, etag, modified = found
+    response = send_file(path, mimetype="text/html", etag=etag, last_modified=modified, max_age=0, conditional=True)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
 @app.route("/experience/<game_id>")
 def play_experience(game_id):
-    # Juego final para el destinatario
-    exp = Experience.query.get_or_404(game_id)
-    
-    # SI NO HA PAGADO -> Redirigir a Demo
-    if not exp.is_paid:
-        return redirect(url_for('demo_experience', game_id=game_id))
-    
-    # SI HA PAGADO -> Mostrar juego completo + Regalo
-    return render_template("player.html", 
-                           game_data=json.dumps(exp.game_data), 
-                           real_gift=exp.real_gift, 
-                           is_demo=False)
+    # Juego final para el destinatario. Una vez pagado es prácticamente inmutable:
+    # 1) HTML exportado en disco (cero BD), 2) caché de páginas, 3) render normal.
+    if STATIC_EXPORT_DIR:
+        found = find_export(STATIC_EXPORT_DIR, game_id, request.headers.get("Accept-Encoding"))
+        if found:
+            return send_exported(found)
+
+    page = page_cache.get(game_id)
+    if page is None:
+        started = time.perf_counter()
+        exp = Experience.query.get_or_404(game_id)
+        
+        # SI NO HA PAGADO -> Redirigir a Demo
+        if not exp.is_paid:
+            return redirect(url_for('demo_experience', game_id=game_id))
+        
+        # SI HA PAGADO -> Mostrar juego completo + Regalo
+        html = render_template("player.html", 
+                               game_data=json.dumps(exp.game_data), 
+                               real_gift=exp.real_gift, 
+                               is_demo=False,
+                               game_id=game_id)
+        page = page_cache.set(game_id, html, time.perf_counter() - started)
+
+    response = Response(page.body, mimetype="text/html")
+    response.set_etag(page.etag)
+    response.last_modified = page.last_modified
+    response.headers["Cache-Control"] = "private, no-cache" # Siempre revalida: 304 barato
+    response.make_conditional(request)
+    if response.status_code == 304:
+        page_cache.record_not_modified()
+    return response
+
+# Telemetría del player (sendBeacon). Solo valida y encola: ninguna escritura en la BD
+# por petición; el volcado por lotes lo hace telemetry.py en segundo plano.
+TELEMETRY_MAX_BYTES = 16 * 1024
+TELEMETRY_MAX_EVENTS = 200
+TELEMETRY_ID_RE = re.compile(r'^[A-Za-z0-9-]{1,36}$')
+# Solo experiencias pagadas (las únicas que mandan eventos). El resultado se
+# recuerda TELEMETRY_GAME_TTL s (un beacon por nivel no cuesta una consulta);
+# el "no" solo unos segundos, para no perder la primera partida tras el pago
+TELEMETRY_GAME_TTL = int(os.getenv("TELEMETRY_GAME_TTL", "300"))
+TELEMETRY_UNPAID_TTL = 10
+TELEMETRY_GAME_CACHE_SIZE = 10000
+telemetry_games = {} # game_id -> (pagada, monotonic de la comprobación)
+
+def telemetry_game_ok(game_id):
+    now = time.monotonic()
+    cached = telemetry_games.get(game_id)
+    if cached and now - cached[1] < (TELEMETRY_GAME_TTL if cached[0] else TELEMETRY_UNPAID_TTL):
+        return cached[0]
+    if len(telemetry_games) >= TELEMETRY_GAME_CACHE_SIZE:
+        telemetry_games.clear() # Ids inventados en masa: se empieza de cero
+    paid = payment_paid(game_id)
+    telemetry_games[game_id] = (paid, now)
+    return paid
+
+@app.route("/api/telemetry", methods=['POST'])
+def ingest_telemetry():
+    if (request.content_length or 0) > TELEMETRY_MAX_BYTES:
+        telemetry.reject()
+        return "", 413
+    data = request.get_json(force=True, silent=True) # El beacon llega como text/plain o JSON
+    if not isinstance(data, dict) or not isinstance(data.get("e"), list):
+        telemetry.reject()
+        return "", 400
+    game_id, session_id = str(data.get("g", "")), str(data.get("s", ""))
+    if len(game_id) > 8 or not TELEMETRY_ID_RE.match(game_id) or not TELEMETRY_ID_RE.match(session_id):
+        telemetry.reject()
+        return "", 400
+    if len(data["e"]) > TELEMETRY_MAX_EVENTS:
+        telemetry.reject(len(data["e"]))
+        return "", 413
+    if not telemetry_game_ok(game_id):
+        telemetry.reject(len(data["e"]))
+        return "", 404
+
+    rows = [row for row in (normalize_event(raw, game_id, session_id) for raw in data["e"]) if row]
+    rejected = len(data["e"]) - len(rows)
+    if rejected:
+        telemetry.reject(rejected)
+    telemetry.add(rows)
+    return "", 204
+
+@app.route("/api/telemetry/report")
+@app.route("/api/telemetry/report/<game_id>")
+def telemetry_report(game_id=None):
+    """Abandono, fallos por acierto y tiempo medio por nivel (una experiencia o todas)."""
+    if not session.get('autorizado'): return jsonify({"error": "No auth"}), 403
+    if game_id:
+        return jsonify({"game_id": game_id, "levels": level_report(PlayerLevelStats, game_id)})
+    return jsonify({"levels": difficulty_report(db, PlayerLevelStats)})
+
+# ==========================================================================
+# SECCIÓN 8: MANTENIMIENTO (BORRADORES ABANDONADOS)
+# ==========================================================================
+# 'flask --app app maintenance ...' y purga programada con
+# 'python worker.py --maintenance-every 24' (ver maintenance.py)
+MAINTENANCE_DRAFT_DAYS = int(os.getenv("MAINTENANCE_DRAFT_DAYS", "30"))
+MAINTENANCE_ARCHIVE = os.getenv("MAINTENANCE_ARCHIVE", "0") == "1"
+# Eventos crudos de telemetría: pasado este plazo solo queda el resumen por nivel
+TELEMETRY_RETENTION_DAYS = int(os.getenv("TELEMETRY_RETENTION_DAYS", "90"))
+draft_models = (Experience, Conversation, ArchivedExperience)
+register_commands(app, db, draft_models, event_model=PlayerEvent, event_days=TELEMETRY_RETENTION_DAYS)
+
+@job_queue.handler("purge_drafts")
+def purge_drafts_job(payload):
+    """
+    Trabajo: purga por lotes de borradores sin pagar de más de MAINTENANCE_DRAFT_DAYS días
+    y de eventos de telemetría de más de TELEMETRY_RETENTION_DAYS.
+    """
+    summary = purge_stale_drafts(db, draft_models, days=payload.get("days", MAINTENANCE_DRAFT_DAYS),
+                                 archive=MAINTENANCE_ARCHIVE)
+    print(f"🧹 Purga de borradores: {summary}")
+    summary = purge_old_events(db, PlayerEvent, days=payload.get("event_days", TELEMETRY_RETENTION_DAYS))
+    print(f"🧹 Purga de eventos de telemetría: {summary}")
+
+# ==========================================================================
+# SECCIÓN 9: ARRANQUE (FACTORÍA)
+# ==========================================================================
+# Importar app.py solo declara rutas y objetos: no abre hilos ni carga SDKs.
+# create_app() arranca lo que vive en segundo plano (pool caliente, worker
+# de la cola, LISTEN de pagos) y, con PREWARM_ON_BOOT=1, carga en un hilo
+# los SDKs y la conexión a la BD para que la primera petición real no pague
+# el arranque en frío. Es idempotente y se llama sola en la primera petición,
+# así 'gunicorn app:app' sigue funcionando; 'gunicorn "app:create_app()"'
+# arranca los hilos en cada worker sin esperar a esa petición.
+JOB_INLINE_WORKER = os.getenv("JOB_INLINE_WORKER", "1") == "1"
+PREWARM_ON_BOOT = os.getenv("PREWARM_ON_BOOT", "1") == "1"
+boot_lock = threading.Lock()
+boot_state = {"booted_at": None, "prewarm_seconds": None}
+
+def prewarm():
+    """Carga en segundo plano lo que la primera petición pagaría en frío."""
+    started = time.perf_counter()
+    steps = [
+        ("gemini", client.get),
+        ("stripe", stripe.get),
+        ("sendgrid", lambda: __import__("sendgrid.helpers.mail")),
+        ("qrcode", lambda: __import__("qrcode.image.pil")),
+        ("templates", lambda: [app.jinja_env.get_template(name) for name in ("landing.html", "creator.html", "player.html")]),
+    ]
+    for name, step in steps:
+        try:
+            step()
+        except Exception as e:
+            print(f"⚠️ Precalentamiento de {name} fallido: {e}")
+    try:
+        with app.app_context(), db.engine.connect() as conn:
+            conn.execute(db.text("SELECT 1"))
+    except Exception as e:
+        print(f"⚠️ Precalentamiento de la BD fallido: {e}")
+    boot_state["prewarm_seconds"] = round(time.perf_counter() - started, 3)
+    print(f"🔥 Precalentamiento completado en {boot_state['prewarm_seconds']} s")
+
+def flush_telemetry():
+    with app.app_context():
+        telemetry.flush()
+
+def create_app():
+    """Arranca los servicios de fondo una sola vez por proceso y devuelve la app."""
+    with boot_lock:
+        if boot_state["booted_at"]:
+            return app
+        boot_state["booted_at"] = datetime.utcnow().isoformat()
+    plantillas.refresh(force=True) # Pocos KB: se cargan y validan ya, no en el primer clic
+    warm_pool.start()
+    if isinstance(payment_events, PostgresBroker):
+        payment_events.start()
+    if JOB_INLINE_WORKER:
+        job_queue.start_thread(app, poll_interval=float(os.getenv("JOB_POLL_INTERVAL", "2")))
+    telemetry.start_thread(app)
+    atexit.register(flush_telemetry) # Lo que quede en el buffer al parar el worker
+    if PREWARM_ON_BOOT:
+        threading.Thread(target=prewarm, name="prewarm", daemon=True).start()
+    return app
+
+@app.before_request
+def boot_on_first_request():
+    if not boot_state["booted_at"]:
+        create_app()
+
+def startup_stats():
+    return {**boot_state, "clients": {"gemini": client.ready, "stripe": stripe.ready}}
 
 if __name__ == "__main__":
     with app.app_context():
-        db.create_all()
+        upgrade_schema(db)
+    create_app()
     app.run(debug=True, port=5000)
\ No newline at end of file
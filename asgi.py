@@ -0,0 +1,377 @@
+# asgi.py
+# ==========================================================================
+# PUNTO DE ENTRADA ASGI: RUTAS DE IA ASÍNCRONAS + RESTO DE LA APP FLASK
+# ==========================================================================
+#   uvicorn asgi:application --workers 2
+#   gunicorn asgi:application -k uvicorn.workers.UvicornWorker
+#
+# /chat, /chat/stream y /chat/variants se atienden en el event loop con client.aio:
+# mientras Gemini piensa, el proceso sigue sirviendo otras peticiones. El acceso a BD
+# (rápido) va a hilos con asyncio.to_thread dentro del app_context de Flask.
+# Todo lo demás (landing, share, player, pagos, elegir variante...) pasa tal cual
+# por WsgiToAsgi. Las llamadas de fondo (pool caliente) siguen en sus hilos.
+import asyncio
+import contextvars
+import json
+import re
+import time
+from functools import partial
+from http.cookies import SimpleCookie
+
+from asgiref.wsgi import WsgiToAsgi
+from itsdangerous import BadSignature
+
+import app as web
+from admission import Overloaded, flight_key
+from streaming import ReplyStreamParser, sse
+from variants import TooManyVariants
+
+# Las rutas asíncronas no pasan por before_request: se arranca aquí, en cada worker
+flask_app = web.create_app()
+wsgi_application = WsgiToAsgi(flask_app)
+
+JSON_HEADERS = [(b"content-type", b"application/json")]
+SSE_HEADERS = [
+    (b"content-type", b"text/event-stream"),
+    (b"cache-control", b"no-cache"),
+    (b"x-accel-buffering", b"no"),
+]
+
+
+# --- UTILIDADES ---
+def load_session(scope):
+    """Lee la cookie de sesión firmada por Flask (solo lectura)."""
+    cookies = SimpleCookie()
+    for name, value in scope.get("headers", []):
+        if name == b"cookie":
+            cookies.load(value.decode("latin-1"))
+    morsel = cookies.get(flask_app.config["SESSION_COOKIE_NAME"])
+    if morsel is None:
+        return {}
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    try:
+        return serializer.loads(morsel.value, max_age=int(flask_app.permanent_session_lifetime.total_seconds()))
+    except BadSignature:
+        return {}
+
+
+async def read_json(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    return json.loads(body or b"{}")
+
+
+async def send_json(send, data, status=200, headers=()):
+    raw = json.dumps(data, ensure_ascii=False).encode("utf-8")
+    await send({"type": "http.response.start", "status": status,
+                "headers": JSON_HEADERS + [(b"content-length", str(len(raw)).encode())] + list(headers)})
+    await send({"type": "http.response.body", "body": raw})
+
+
+def _in_app_context(fn, *args):
+    with flask_app.app_context():
+        return fn(*args)
+
+
+async def db_call(fn, *args):
+    """Ejecuta código síncrono (SQLAlchemy, cachés...) en un hilo con app_context."""
+    return await asyncio.to_thread(partial(_in_app_context, fn, *args))
+
+
+async def send_overloaded(send, error):
+    """Mismo 429 + Retry-After que app.overloaded_response()."""
+    with flask_app.test_request_context():
+        response = web.overloaded_response(error)
+    await send_json(send, response.get_json(), 429, [(b"retry-after", str(error.retry_after).encode())])
+
+
+# --- LÓGICA DE CHAT ASÍNCRONA ---
+async def resolve_chat(data, game_id, history):
+    """Mismo flujo que app.resolve_chat(), con la llamada a Gemini en el event loop."""
+    user_message = data.get("message")
+    current_json = data.get("current_json")
+    patch_mode = web.wants_patch(data.get("mode"), current_json)
+    cache_key = web.generation_cache_key(user_message, current_json, history)
+    ready = None if patch_mode else await db_call(web.ready_generation, cache_key, user_message, current_json, history)
+    if ready:
+        await db_call(web.commit_chat_result, game_id, user_message, *ready)
+        return ready
+
+    with await web.admission.acquire_async(game_id):
+        if patch_mode:
+            contents, config = await asyncio.to_thread(web.build_patch_request, user_message, current_json, history)
+            with web.dependency("gemini", "generate_content"):
+                response = await web.client.aio.models.generate_content(model=web.MODEL_NAME, contents=contents, config=config)
+            result = web.apply_patch_reply(current_json, response)
+            if result:
+                await db_call(web.commit_chat_result, game_id, user_message, *result)
+                return result
+
+        contents, config = await asyncio.to_thread(web.build_chat_request, user_message, current_json, history)
+        with web.dependency("gemini", "generate_content"):
+            response = await web.client.aio.models.generate_content(model=web.MODEL_NAME, contents=contents, config=config)
+    web.log_token_usage(response.usage_metadata, "/chat")
+    reply_text, new_json = await db_call(web.finish_generation, response.text, cache_key)
+    await db_call(web.commit_chat_result, game_id, user_message, reply_text, new_json)
+    return reply_text, new_json
+
+
+async def coalesced_chat(data, game_id):
+    """Peticiones idénticas en vuelo para el mismo juego comparten una sola llamada."""
+    history = await db_call(web.conversations.load, game_id) if game_id else []
+    current_json = data.get("current_json")
+    patch_mode = web.wants_patch(data.get("mode"), current_json)
+    key = flight_key(game_id, data.get("message"), patch_mode, current_json)
+    flight, leader = web.llm_flights.begin(key)
+    if not leader:
+        return await web.llm_flights.wait_async(flight)
+    try:
+        result = await resolve_chat(data, game_id, history)
+    except BaseException as e:
+        web.llm_flights.finish(key, flight, error=e if isinstance(e, Exception) else RuntimeError("Cancelada"))
+        raise
+    web.llm_flights.finish(key, flight, result=result)
+    return result
+
+
+async def stream_chat_events(data, game_id, history, ready, patch_mode, cache_key):
+    """Mismo protocolo SSE que app.chat_stream() (el líder ya tiene plaza concedida)."""
+    user_message = data.get("message")
+    current_json = data.get("current_json")
+
+    if ready:
+        for event in await db_call(lambda: list(web.emit_complete_reply(*ready, game_id, user_message))):
+            yield event
+        return
+
+    if patch_mode:
+        contents, config = await asyncio.to_thread(web.build_patch_request, user_message, current_json, history)
+        with web.dependency("gemini", "generate_content"):
+            response = await web.client.aio.models.generate_content(model=web.MODEL_NAME, contents=contents, config=config)
+        result = web.apply_patch_reply(current_json, response)
+        if result:
+            for event in await db_call(lambda: list(web.emit_complete_reply(*result, game_id, user_message))):
+                yield event
+            yield result
+            return
+
+    parser = ReplyStreamParser(validate=web.is_valid_game, normalize=web.normalize_game)
+    usage_metadata = None
+    contents, config = await asyncio.to_thread(web.build_chat_request, user_message, current_json, history)
+    with web.dependency("gemini", "generate_content_stream"):
+        stream = await web.client.aio.models.generate_content_stream(model=web.MODEL_NAME, contents=contents, config=config)
+        async for chunk in stream:
+            usage_metadata = chunk.usage_metadata or usage_metadata
+            for event, payload in parser.feed(chunk.text or ""):
+                yield await emit(event, payload, game_id)
+    for event, payload in parser.finish():
+        yield await emit(event, payload, game_id)
+
+    web.log_token_usage(usage_metadata, "/chat/stream")
+    web.record_stream_json(parser)
+    reply_text = parser.prose.strip()
+    if cache_key and parser.new_json:
+        await db_call(web.generation_cache.set, cache_key, {"reply": reply_text, "new_json": parser.new_json})
+    await db_call(web.record_chat_turn, game_id, user_message, reply_text)
+    yield sse("done", {"reply": reply_text})
+    yield reply_text, parser.new_json
+
+
+async def emit(event, payload, game_id):
+    if event == "json":
+        return await db_call(web.emit_stream_event, event, payload, game_id)
+    return web.emit_stream_event(event, payload, game_id)
+
+
+async def generate_variant(user_message, current_json, history, index, total):
+    """Mismo flujo que app.generate_variant(), con la llamada a Gemini en el event loop."""
+    contents, config = await asyncio.to_thread(web.build_variant_request, user_message, current_json, history,
+                                               index, total)
+    with await web.admission.acquire_async(), web.dependency("gemini", "generate_content"):
+        response = await web.client.aio.models.generate_content(model=web.MODEL_NAME, contents=contents, config=config)
+    return web.finish_variant(response)
+
+
+# --- HANDLERS ASGI ---
+async def chat(scope, receive, send):
+    session = load_session(scope)
+    if not session.get("autorizado"):
+        return await send_json(send, {"reply": "No auth"}, 403)
+    data = await read_json(receive)
+    try:
+        reply_text, new_json = await coalesced_chat(data, session.get("current_game_id"))
+    except Overloaded as e:
+        return await send_overloaded(send, e)
+    except Exception as e:
+        print(f"IA ERROR: {e}")
+        return await send_json(send, {"reply": "Error de conexión con la IA."}, 500)
+    await send_json(send, {"reply": reply_text, "new_json": new_json})
+
+
+async def chat_stream(scope, receive, send):
+    session = load_session(scope)
+    if not session.get("autorizado"):
+        return await send_json(send, {"reply": "No auth"}, 403)
+    data = await read_json(receive)
+    game_id = session.get("current_game_id")
+    user_message = data.get("message")
+    current_json = data.get("current_json")
+
+    history = await db_call(web.conversations.load, game_id) if game_id else []
+    patch_mode = web.wants_patch(data.get("mode"), current_json)
+    cache_key = web.generation_cache_key(user_message, current_json, history)
+    ready = None if patch_mode else await db_call(web.ready_generation, cache_key, user_message, current_json, history)
+
+    key, flight, leader, ticket = None, None, True, None
+    if not ready:
+        key = flight_key(game_id, user_message, patch_mode, current_json)
+        flight, leader = web.llm_flights.begin(key)
+        if leader:
+            try:
+                ticket = await web.admission.acquire_async(game_id)
+            except Overloaded as e:
+                web.llm_flights.finish(key, flight, error=e)
+                return await send_overloaded(send, e)
+            except BaseException:
+                # Cancelada mientras esperaba plaza (cliente desconectado): no dejar el vuelo abierto
+                web.llm_flights.finish(key, flight, error=RuntimeError("Cancelada"))
+                raise
+
+    async def body(chunk):
+        await send({"type": "http.response.body", "body": chunk.encode("utf-8"), "more_body": True})
+
+    result = None
+    try:
+        await send({"type": "http.response.start", "status": 200, "headers": SSE_HEADERS})
+        if leader:
+            async for event in stream_chat_events(data, game_id, history, ready, patch_mode, cache_key):
+                if isinstance(event, tuple):
+                    result = event
+                else:
+                    await body(event)
+        else:
+            await web.llm_flights.wait_async(flight)
+            for event in web.emit_shared_reply(flight):
+                await body(event)
+    except Exception as e:
+        print(f"IA ERROR (stream): {e}")
+        await body(sse("error", {"reply": "Error de conexión con la IA."}))
+    finally:
+        if ticket:
+            ticket.release()
+        if leader:
+            web.llm_flights.finish(key, flight, result=result, error=None if result else RuntimeError("Sin resultado"))
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def chat_variants(scope, receive, send):
+    """Mismo protocolo SSE que app.chat_variants(); la elección (/choose) sigue en Flask."""
+    session = load_session(scope)
+    if not session.get("autorizado"):
+        return await send_json(send, {"reply": "No auth"}, 403)
+    data = await read_json(receive)
+    try:
+        total = web.variant_count(data)
+    except ValueError as e:
+        return await send_json(send, {"reply": str(e)}, 400)
+    game_id = session.get("current_game_id")
+    user_message = data.get("message")
+    history = await db_call(web.conversations.load, game_id) if game_id else []
+
+    tasks = [partial(generate_variant, user_message, data.get("current_json"), history, i, total)
+             for i in range(total)]
+    # Mismo dueño que request.remote_addr en Flask: /choose tiene que encontrar el lote
+    owner = game_id or (scope.get("client") or ("",))[0]
+    try:
+        batch = web.variant_runner.start_async(owner, tasks)
+    except TooManyVariants:
+        return await send_json(send, {"reply": "Ya hay variantes generándose. Espera un momento."}, 429)
+    batch.prompt = user_message
+
+    async def body(chunk):
+        await send({"type": "http.response.body", "body": chunk.encode("utf-8"), "more_body": True})
+
+    try:
+        await send({"type": "http.response.start", "status": 200, "headers": SSE_HEADERS})
+        await body(sse("batch", {"batch_id": batch.id, "n": total}))
+        async for index, result in batch.iter_results_async():
+            if isinstance(result, Exception):
+                print(f"IA ERROR (variante {index}): {result}")
+                await body(sse("variant_error", {"index": index}))
+                continue
+            await body(sse("variant", {"index": index, "reply": result[0], "new_json": result[1]}))
+        await body(sse("done", {}))
+    except BaseException:
+        batch.cancel() # El cliente se ha ido: no seguimos gastando llamadas
+        raise
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def wait_payment_status(scope, receive, send, game_id):
+    """Long-poll de app.wait_payment_status() sin ocupar un hilo mientras espera."""
+    if await db_call(web.payment_paid, game_id):
+        payload = {"paid": True}
+    else:
+        data = await web.payment_events.wait_async(web.payment_channel(game_id), web.PAYMENT_WAIT_TIMEOUT)
+        payload = data or {"paid": False, "timeout": True}
+    await send_json(send, payload, headers=[(b"cache-control", b"no-store")])
+
+
+async def pass_to_flask(scope, receive, send):
+    # Contexto limpio por petición: uvicorn reutiliza el de la conexión keep-alive
+    # y asgiref dejaría apuntando a un executor de la petición anterior.
+    await asyncio.get_running_loop().create_task(
+        wsgi_application(scope, receive, send), context=contextvars.Context()
+    )
+
+
+async def instrumented(endpoint, handler, scope, receive, send, **params):
+    """Mismas métricas de latencia que las rutas Flask (app.observe_request)."""
+    status = {"code": 500}
+
+    async def capture(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+        await send(message)
+
+    started = time.perf_counter()
+    try:
+        return await handler(scope, receive, capture, **params)
+    finally:
+        web.observe_request(endpoint, scope["method"], status["code"], time.perf_counter() - started, scope["path"])
+
+
+ASYNC_ROUTES = {
+    ("POST", "/chat"): chat,
+    ("POST", "/chat/stream"): chat_stream,
+    ("POST", "/chat/variants"): chat_variants,
+}
+# Rutas con parámetros: (método, patrón, endpoint para métricas, handler(scope, receive, send, **grupos))
+ASYNC_PATTERNS = [
+    ("GET", re.compile(r"^/payment_status/(?P<game_id>[^/]+)/wait$"), "/payment_status/<game_id>/wait",
+     wait_payment_status),
+]
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    handler = ASYNC_ROUTES.get((scope.get("method"), scope.get("path")))
+    if handler:
+        return await instrumented(scope["path"], handler, scope, receive, send)
+    for method, pattern, endpoint, handler in ASYNC_PATTERNS:
+        match = pattern.match(scope.get("path", "")) if scope.get("method") == method else None
+        if match:
+            return await instrumented(endpoint, handler, scope, receive, send, **match.groupdict())
+    await pass_to_flask(scope, receive, send)
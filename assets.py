@@ -0,0 +1,321 @@
+# assets.py
+# ==========================================================================
+# ASSETS COMPILADOS: TAILWIND PURGADO, FONT AWESOME RECORTADO, HASH + .br/.gz
+# ==========================================================================
+# Sin build, cada página carga el compilador JIT de Tailwind (cdn.tailwindcss.com)
+# y el Font Awesome completo: el móvil del destinatario genera CSS en cada visita.
+# Este paso deja en static/dist/:
+#
+#   - tailwind.<hash>.css     solo las clases de templates/ y static/js/, minificado
+#   - webfonts/fontawesome.<hash>.css + fuentes: solo los iconos usados y ALLOWED_ICONS
+#   - css/*.<hash>.css, js/*.<hash>.js   los ficheros locales con hash
+#   - *.gz (y *.br con 'brotli') de todo lo anterior + manifest.json
+#
+# Flask los sirve en /assets/ con caché inmutable (asset_url() en las
+# plantillas); si no hay build se sigue usando el CDN y /static.
+# Con 'fonttools' instalado las fuentes se recortan a los glifos usados
+# (woff2 si además está 'brotli'); sin él se copian completas. Ambos están en
+# requirements-build.txt (solo para el build, no hacen falta en runtime).
+#
+#   pip install -r requirements-build.txt && python assets.py   # build completo (Render: build command)
+#   python assets.py --skip-tailwind               # solo Font Awesome + ficheros locales
+#   TAILWIND_BIN=./tailwindcss-linux-x64 python assets.py   # CLI standalone sin Node
+#   FONTAWESOME_DIR=node_modules/@fortawesome/fontawesome-free python assets.py
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import tempfile
+import urllib.request
+import zipfile
+
+from static_export import accepted_encodings
+
+try:
+    import brotli
+except ImportError:  # opcional: sin brotli solo se genera .gz
+    brotli = None
+
+DIST_DIR = "dist"
+MANIFEST = "manifest.json"
+# Ficheros locales que las plantillas cargan con asset_url()
+LOCAL_ASSETS = ("css", "js")
+COMPRESSIBLE = (".css", ".js", ".svg", ".json")
+
+# Tailwind v3 (la versión del CDN que usaban las plantillas); lee tailwind.config.js
+TAILWIND_CMD = os.getenv("TAILWIND_BIN", "npx --yes tailwindcss@3.4.17")
+# Misma versión que el CDN de cdnjs que había en las plantillas
+FONTAWESOME_VERSION = "6.0.0"
+FONTAWESOME_ZIP = (f"https://use.fontawesome.com/releases/v{FONTAWESOME_VERSION}/"
+                   f"fontawesome-free-{FONTAWESOME_VERSION}-web.zip")
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".assets-cache")
+
+ICON_RE = re.compile(r"\bfa-[a-z0-9]+(?:-[a-z0-9]+)*")
+# '.fa-brain::before,.fa-x:before{content:"\f5dc"}' (regla de glifo, con o sin minificar)
+GLYPH_RULE_RE = re.compile(r'((?:\.fa-[a-z0-9-]+::?before\s*,?\s*)+)\{\s*content:\s*"\\([0-9a-fA-F]+)";?\s*\}')
+FONT_FACE_RE = re.compile(r"@font-face\s*\{[^}]*\}")
+FONT_URL_RE = re.compile(r'url\(["\']?\.\./webfonts/([^"\')]+?)\.(woff2|ttf)["\']?\)')
+CSS_COMMENT_RE = re.compile(r"/\*(?!!).*?\*/", re.S)  # /*! ... */ (licencias) se conserva
+HASHED_RE = re.compile(r"^(?P<stem>.+)\.[0-9a-f]{10}(?P<ext>\.[a-z0-9]+)$")
+
+
+# --- RUNTIME: MANIFEST Y URLS ---
+class AssetManifest:
+    """
+    Nombre lógico ('tailwind.css', 'js/player.js') -> fichero con hash en
+    static/dist. Se lee una vez al arrancar: tras un build hay que reiniciar.
+    """
+
+    def __init__(self, static_folder, base_url="/assets"):
+        self.dist = os.path.join(static_folder, DIST_DIR)
+        self.base_url = base_url.rstrip("/")
+        self.files = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(os.path.join(self.dist, MANIFEST), "r", encoding="utf-8") as f:
+                self.files = json.load(f)["files"]
+        except (FileNotFoundError, KeyError, ValueError):
+            self.files = {}
+        self._outputs = set(self.files.values())
+        return self.files
+
+    @property
+    def built(self):
+        return bool(self.files)
+
+    def url(self, name):
+        hashed = self.files.get(name)
+        return f"{self.base_url}/{hashed}" if hashed else None
+
+    def font(self, stem):
+        """(url, formato) de la fuente 'stem' que dejó el build (woff2 o woff), o None."""
+        for fmt in ("woff2", "woff"):
+            url = self.url(f"{stem}.{fmt}")
+            if url:
+                return url, fmt
+        return None
+
+    def find(self, filename, accept_encoding=""):
+        """
+        (ruta, content-encoding o None, inmutable) del fichero pedido, o None.
+        Un hash de un build anterior (HTML exportado o cacheado) recibe la
+        versión actual del mismo asset, sin caché inmutable.
+        """
+        immutable = filename in self._outputs
+        if not immutable:
+            match = HASHED_RE.match(filename)
+            filename = self.files.get(match["stem"] + match["ext"]) if match else None
+            if not filename:
+                return None
+        path = os.path.join(self.dist, filename)
+        for encoding, suffix in accepted_encodings(accept_encoding):
+            if os.path.exists(path + suffix):
+                return path + suffix, encoding, immutable
+        return (path, None, immutable) if os.path.exists(path) else None
+
+
+# --- BUILD ---
+def hashed_name(name, data):
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
+
+
+def write_output(dist, name, data):
+    """Escribe 'name' con hash (+ .gz/.br si es texto). Devuelve el nombre con hash."""
+    hashed = hashed_name(name, data)
+    path = os.path.join(dist, hashed)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    if hashed.endswith(COMPRESSIBLE):
+        with open(path + ".gz", "wb") as f:
+            f.write(gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(path + ".br", "wb") as f:
+                f.write(brotli.compress(data, quality=11))
+    return hashed
+
+
+def minify_css(css):
+    """Minificado conservador: comentarios, espacios repetidos y alrededor de { } ; ,"""
+    css = CSS_COMMENT_RE.sub("", css)
+    css = re.sub(r"\s+", " ", css)
+    return re.sub(r"\s*([{};,])\s*", r"\1", css).replace(";}", "}").strip()
+
+
+def used_icons(root, extra=()):
+    """Clases fa-* que aparecen en plantillas, JS y plantillas de juego, más 'extra'."""
+    icons = set(extra)
+    for folder in ("templates", os.path.join("static", "js"), os.path.join("static", "plantillas")):
+        for dirpath, _, filenames in os.walk(os.path.join(root, folder)):
+            for filename in filenames:
+                with open(os.path.join(dirpath, filename), "r", encoding="utf-8", errors="ignore") as f:
+                    icons.update(ICON_RE.findall(f.read()))
+    return icons
+
+
+def build_tailwind(root, command=TAILWIND_CMD):
+    """CSS de Tailwind con solo las clases usadas (content de tailwind.config.js)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, "tailwind.css")
+        cmd = shlex.split(command) + ["-c", os.path.join(root, "tailwind.config.js"), "-o", output, "--minify"]
+        subprocess.run(cmd, cwd=root, check=True, stdout=subprocess.DEVNULL)
+        with open(output, "rb") as f:
+            return f.read()
+
+
+def fontawesome_source(source=None):
+    """Carpeta con css/ y webfonts/ de Font Awesome Free (FONTAWESOME_DIR o descarga cacheada)."""
+    source = source or os.getenv("FONTAWESOME_DIR")
+    if source:
+        return source
+    target = os.path.join(CACHE_DIR, f"fontawesome-free-{FONTAWESOME_VERSION}-web")
+    if not os.path.isdir(target):
+        print(f"⬇️ Descargando Font Awesome {FONTAWESOME_VERSION}...")
+        with urllib.request.urlopen(FONTAWESOME_ZIP, timeout=60) as response:
+            zipfile.ZipFile(io.BytesIO(response.read())).extractall(CACHE_DIR)
+    return target
+
+
+def subset_glyph_rules(css, icons):
+    """Quita las reglas de glifo de iconos no usados. Devuelve (css, codepoints usados)."""
+    codepoints = set()
+
+    def keep(match):
+        selectors = [s.strip() for s in match.group(1).split(",") if s.strip()]
+        used = [s for s in selectors if s.split(":")[0][1:] in icons]
+        if not used:
+            return ""
+        codepoints.add(int(match.group(2), 16))
+        return f'{",".join(used)}{{content:"\\{match.group(2)}"}}'
+
+    return GLYPH_RULE_RE.sub(keep, css), codepoints
+
+
+def subset_font(data, codepoints):
+    """Fuente recortada a 'codepoints' con fontTools (opcional). Devuelve (bytes, formato)."""
+    try:
+        from fontTools import subset
+        from fontTools.ttLib import TTFont
+    except ImportError:  # sin fontTools se sirve la fuente completa
+        return data, "woff2"
+    font = TTFont(io.BytesIO(data))
+    options = subset.Options()
+    options.flavor = "woff2" if brotli is not None else "woff"
+    options.layout_features = ["*"]
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    out = io.BytesIO()
+    font.flavor = options.flavor
+    font.save(out)
+    return out.getvalue(), options.flavor
+
+
+def build_fontawesome(dist, icons, source=None):
+    """
+    CSS de Font Awesome con solo 'icons' y sus fuentes recortadas. Devuelve
+    el manifest parcial (webfonts/* y fontawesome.css).
+    """
+    source = fontawesome_source(source)
+    with open(os.path.join(source, "css", "all.min.css"), "r", encoding="utf-8") as f:
+        css, codepoints = subset_glyph_rules(f.read(), icons)
+
+    files = {}
+
+    def font_face(match):
+        block = match.group(0)
+        fonts = {name for name, _ in FONT_URL_RE.findall(block)}
+        if not fonts:
+            return block
+        name = sorted(fonts)[0]
+        with open(os.path.join(source, "webfonts", f"{name}.woff2"), "rb") as f:
+            data, fmt = subset_font(f.read(), codepoints)
+        logical = f"webfonts/{name}.{fmt}"
+        files[logical] = write_output(dist, logical, data)
+        # Solo woff2/woff (todos los móviles actuales): fuera el respaldo .ttf.
+        # URL relativa: la hoja se escribe en la misma carpeta que las fuentes
+        src = f'src:url({os.path.basename(files[logical])}) format("{fmt}")'
+        return re.sub(r"src:[^;}]+", lambda m: src, block, count=1)
+
+    css = minify_css(FONT_FACE_RE.sub(font_face, css))
+    files["fontawesome.css"] = write_output(dist, "webfonts/fontawesome.css", css.encode("utf-8"))
+    return files, len(codepoints)
+
+
+def build_local(static_folder, dist):
+    """static/css y static/js con hash (CSS sin comentarios)."""
+    files = {}
+    for folder in LOCAL_ASSETS:
+        for dirpath, _, filenames in os.walk(os.path.join(static_folder, folder)):
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                logical = os.path.relpath(path, static_folder).replace(os.sep, "/")
+                with open(path, "rb") as f:
+                    data = f.read()
+                if filename.endswith(".css"):
+                    data = minify_css(data.decode("utf-8")).encode("utf-8")
+                files[logical] = write_output(dist, logical, data)
+    return files
+
+
+def build(root, static_folder, tailwind=True, fontawesome=True, extra_icons=(), fontawesome_dir=None):
+    """Regenera static/dist desde cero y escribe manifest.json. Devuelve el manifest."""
+    dist = os.path.join(static_folder, DIST_DIR)
+    shutil.rmtree(dist, ignore_errors=True)
+    os.makedirs(dist)
+    files, report = {}, {}
+    if tailwind:
+        files["tailwind.css"] = write_output(dist, "tailwind.css", build_tailwind(root))
+    if fontawesome:
+        icons = used_icons(root, extra_icons)
+        fa_files, report["icons"] = build_fontawesome(dist, icons, fontawesome_dir)
+        files.update(fa_files)
+    files.update(build_local(static_folder, dist))
+    manifest = {"files": dict(sorted(files.items())), **report}
+    with open(os.path.join(dist, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+    return manifest
+
+
+def sizes(dist, hashed):
+    """Bytes en disco y por la red (gzip/brotli) de un fichero del build."""
+    path = os.path.join(dist, hashed)
+    info = {"raw": os.path.getsize(path)}
+    for suffix in (".gz", ".br"):
+        if os.path.exists(path + suffix):
+            info[suffix[1:]] = os.path.getsize(path + suffix)
+    return info
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from game_schema import ALLOWED_ICONS
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Compila Tailwind, recorta Font Awesome y versiona los assets")
+    parser.add_argument("--static", default=os.path.join(root, "static"))
+    parser.add_argument("--skip-tailwind", action="store_true")
+    parser.add_argument("--skip-fontawesome", action="store_true")
+    parser.add_argument("--fontawesome-dir", help="Font Awesome Free ya descargado (css/ + webfonts/)")
+    args = parser.parse_args()
+
+    manifest = build(root, args.static, tailwind=not args.skip_tailwind, fontawesome=not args.skip_fontawesome,
+                     extra_icons=ALLOWED_ICONS, fontawesome_dir=args.fontawesome_dir)
+    dist = os.path.join(args.static, DIST_DIR)
+    for name, hashed in manifest["files"].items():
+        info = sizes(dist, hashed)
+        wire = " · ".join(f"{k} {v / 1024:.1f} KB" for k, v in info.items() if k != "raw")
+        print(f"  {name:<32} {info['raw'] / 1024:>8.1f} KB" + (f"  ({wire})" if wire else ""))
+    if "icons" in manifest:
+        print(f"🔣 Font Awesome: {manifest['icons']} glifos")
+    print(f"✅ Assets en {dist} ({len(manifest['files'])} ficheros)")
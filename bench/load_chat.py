@@ -0,0 +1,160 @@
+# bench/load_chat.py
+# ==========================================================================
+# PRUEBA DE CARGA DE /chat: WSGI (gunicorn sync) VS ASGI (uvicorn + client.aio)
+# ==========================================================================
+# Levanta un servidor Gemini falso con latencia artificial y, contra él, un
+# único proceso de la app en cada modo. Para cada nivel de concurrencia mide
+# throughput, latencias y errores de /chat.
+#
+#   python bench/load_chat.py --latency 1.0 --levels 1,10,50 --duration 10
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fakes import FakeGeminiServer  # noqa: E402
+
+SERVERS = {
+    "wsgi": ["gunicorn", "--workers", "1", "--worker-class", "sync", "--timeout", "120", "app:app"],
+    "asgi": ["uvicorn", "asgi:application", "--workers", "1", "--log-level", "warning"],
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def start_server(mode, env):
+    port = free_port()
+    cmd = list(SERVERS[mode])
+    cmd += ["--bind", f"127.0.0.1:{port}"] if mode == "wsgi" else ["--host", "127.0.0.1", "--port", str(port)]
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            requests.get(base + "/", timeout=1)
+            return proc, base
+        except requests.RequestException:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f"El servidor {mode} no arrancó")
+
+
+def creator_session(base):
+    """Sesión autorizada con una experiencia propia (como un creador real)."""
+    http = requests.Session()
+    http.post(base + "/acceso", data={"codigo": "envoltorio"}, timeout=30)
+    r = http.get(base + "/start", timeout=30)
+    r.raise_for_status()
+    return http
+
+
+def run_level(base, concurrency, duration, timeout):
+    sessions = [creator_session(base) for _ in range(concurrency)]
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.time() + duration
+
+    def user(http, n):
+        i = 0
+        while time.time() < deadline:
+            i += 1
+            start = time.perf_counter()
+            try:
+                r = http.post(base + "/chat", timeout=timeout,
+                              json={"message": f"idea {n}-{i}", "current_json": {"steps": []}})
+                ok = r.status_code == 200
+            except requests.RequestException:
+                ok = False
+            with lock:
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors[0] += 1
+
+    started = time.time()
+    threads = [threading.Thread(target=user, args=(http, n)) for n, http in enumerate(sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.time() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors[0],
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_s": round(percentile(latencies, 50), 3),
+        "p95_s": round(percentile(latencies, 95), 3),
+        "mean_s": round(statistics.mean(latencies), 3) if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=1.0, help="Latencia del LLM falso (s)")
+    parser.add_argument("--levels", default="1,10,50", help="Niveles de concurrencia")
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos por nivel")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--modes", default="wsgi,asgi")
+    parser.add_argument("--json", help="Guardar resultados en este fichero")
+    args = parser.parse_args()
+
+    fake = FakeGeminiServer(latency=args.latency)
+    fake_url = fake.start()
+    tmp = tempfile.mkdtemp(prefix="dw-load-")
+    env = dict(os.environ,
+               DATABASE_URL=f"sqlite:///{tmp}/load.db",
+               GEMINI_API_KEY="fake",
+               GEMINI_BASE_URL=fake_url,
+               GENERATION_CACHE_SIZE="0",
+               WARM_POOL_DEPTH="0",
+               PYTHONUNBUFFERED="1")
+    subprocess.run([sys.executable, "migrations.py"],
+                   cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+
+    results = {}
+    for mode in args.modes.split(","):
+        proc, base = start_server(mode, env)
+        try:
+            results[mode] = [run_level(base, int(c), args.duration, args.timeout) for c in args.levels.split(",")]
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    print(f"\nLLM falso: {args.latency}s por llamada · {args.duration}s por nivel · 1 proceso\n")
+    print(f"{'modo':<6}{'conc':>6}{'ok':>7}{'err':>6}{'req/s':>9}{'p50':>8}{'p95':>8}")
+    for mode, rows in results.items():
+        for row in rows:
+            print(f"{mode:<6}{row['concurrency']:>6}{row['requests']:>7}{row['errors']:>6}"
+                  f"{row['throughput_rps']:>9}{row['p50_s']:>8}{row['p95_s']:>8}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"latency_s": args.latency, "results": results}, f, indent=2)
+    fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+# bench/startup.py
+# ==========================================================================
+# ARRANQUE EN FRÍO: TIEMPO DE IMPORTACIÓN Y TIEMPO HASTA LA PRIMERA RESPUESTA
+# ==========================================================================
+# Dos medidas, repetidas --runs veces (se informa la mediana):
+#
+#   1. python -X importtime -c "import app": coste de importar app.py y los
+#      paquetes que más pesan (y si se coló algún SDK pesado).
+#   2. Proceso nuevo del servidor -> primer 200 en '/': lo que espera el
+#      primer visitante tras un despliegue o un despertar de Render.
+#
+# Con --baseline compara con una ejecución anterior, igual que e2e.py.
+#
+#   python bench/startup.py --runs 5
+#   python bench/startup.py --server asgi --no-prewarm
+#   python bench/startup.py --save-baseline          # fija bench/startup_baseline.json
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from e2e import SERVERS  # noqa: E402
+from load_chat import free_port  # noqa: E402
+
+BASELINE = os.path.join(ROOT, "bench", "startup_baseline.json")
+# Paquetes que no deberían cargarse al importar app.py (ver lazy.py)
+HEAVY = ("google.genai", "stripe", "sendgrid", "qrcode", "PIL")
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)$")
+
+
+def app_env(db_path, prewarm):
+    env = dict(os.environ)
+    env.update(
+        DATABASE_URL=f"sqlite:///{db_path}",
+        GEMINI_API_KEY=env.get("GEMINI_API_KEY", "bench-key"),
+        JOB_INLINE_WORKER="0",
+        WARM_POOL_DEPTH="0",
+        PREWARM_ON_BOOT="1" if prewarm else "0",
+    )
+    return env
+
+
+def measure_imports(env):
+    """Un 'import app' en un proceso limpio con -X importtime."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"],
+                          cwd=ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import app falló:\n{proc.stderr[-2000:]}")
+    modules = []
+    for line in proc.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, len(indent) // 2, int(self_us), int(cumulative_us)))
+    total_us = next((cumulative for name, depth, _, cumulative in modules if name == "app" and depth == 0), 0)
+    # Importaciones directas de app.py (profundidad 1), agrupadas por paquete raíz
+    packages = {}
+    for name, depth, _, cumulative in modules:
+        if depth == 1:
+            root = name.split(".")[0]
+            packages[root] = packages.get(root, 0) + cumulative
+    loaded = {name for name, *_ in modules}
+    return {
+        "import_ms": round(total_us / 1000, 1),
+        "modules": len(modules),
+        "packages_ms": {name: round(us / 1000, 1) for name, us in packages.items()},
+        "heavy_loaded": [pkg for pkg in HEAVY if any(m == pkg or m.startswith(pkg + ".") for m in loaded)],
+    }
+
+
+def measure_first_response(mode, env, timeout):
+    """Segundos desde lanzar el servidor hasta el primer 200 en '/' (+ la segunda petición, ya en caliente)."""
+    port = free_port()
+    cmd = list(SERVERS[mode])
+    cmd += ["--bind", f"127.0.0.1:{port}"] if mode == "wsgi" else ["--host", "127.0.0.1", "--port", str(port)]
+    base = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                if requests.get(base + "/", timeout=timeout).status_code == 200:
+                    break
+            except requests.RequestException:
+                time.sleep(0.01)
+        else:
+            raise RuntimeError(f"El servidor {mode} no respondió en {timeout} s")
+        first = time.perf_counter() - started
+        second_started = time.perf_counter()
+        requests.get(base + "/", timeout=timeout)
+        return {"first_response_ms": round(first * 1000, 1),
+                "warm_response_ms": round((time.perf_counter() - second_started) * 1000, 1)}
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def median_of(runs, key):
+    return round(statistics.median(run[key] for run in runs), 1)
+
+
+def compare(results, baseline, tolerance):
+    """Imprime la variación de cada mediana y devuelve las que empeoran más de 'tolerance'."""
+    if baseline.get("params") != results["params"]:
+        print("⚠️ La baseline se tomó con otros parámetros: la comparación es orientativa")
+    regressions = []
+    print("\n📏 Frente a la baseline")
+    for key, now in results["summary"].items():
+        before = baseline.get("summary", {}).get(key)
+        if not before:
+            continue
+        delta = (now - before) / before
+        worse = delta > tolerance and now - before > 20
+        if worse:
+            regressions.append(key)
+        print(f"  {key:<20} {before:>8} -> {now:>8} ms  ({delta:+.0%})" + ("  ⚠️ REGRESIÓN" if worse else ""))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de importación y de primera respuesta en frío")
+    parser.add_argument("--server", choices=sorted(SERVERS), default="wsgi")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--no-prewarm", action="store_true", help="Arrancar con PREWARM_ON_BOOT=0")
+    parser.add_argument("--top", type=int, default=10, help="Paquetes más lentos a mostrar")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--json", help="Guardar resultados en este fichero")
+    parser.add_argument("--baseline", default=BASELINE, help="Baseline con la que comparar")
+    parser.add_argument("--save-baseline", action="store_true", help="Guardar esta ejecución como baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Empeoramiento tolerado")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    imports, responses = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in range(args.runs):
+            env = app_env(os.path.join(tmp, f"startup-{n}.db"), not args.no_prewarm)
+            imports.append(measure_imports(env))
+            responses.append(measure_first_response(args.server, env, args.timeout))
+            print(f"  ⏱️ Ejecución {n + 1}: import {imports[-1]['import_ms']} ms · "
+                  f"primera respuesta {responses[-1]['first_response_ms']} ms")
+
+    packages = {}
+    for run in imports:
+        for name, ms in run["packages_ms"].items():
+            packages.setdefault(name, []).append(ms)
+    results = {
+        "params": {"server": args.server, "prewarm": not args.no_prewarm},
+        "summary": {
+            "import_ms": median_of(imports, "import_ms"),
+            "first_response_ms": median_of(responses, "first_response_ms"),
+            "warm_response_ms": median_of(responses, "warm_response_ms"),
+        },
+        "modules": imports[-1]["modules"],
+        "heavy_loaded": imports[-1]["heavy_loaded"],
+        "slowest_packages_ms": dict(sorted(((name, round(statistics.median(values), 1)) for name, values in packages.items()),
+                                           key=lambda item: -item[1])[:args.top]),
+    }
+
+    s = results["summary"]
+    print(f"\n🚀 Arranque ({args.server}, mediana de {args.runs}): import app {s['import_ms']} ms · "
+          f"primera respuesta {s['first_response_ms']} ms · en caliente {s['warm_response_ms']} ms")
+    print(f"📦 {results['modules']} módulos importados. Los más pesados:")
+    for name, ms in results["slowest_packages_ms"].items():
+        print(f"  {name:<24} {ms:>8} ms")
+    if results["heavy_loaded"]:
+        print(f"⚠️ SDKs pesados cargados al importar: {', '.join(results['heavy_loaded'])}")
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"💾 Baseline guardada en {args.baseline}")
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
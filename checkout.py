@@ -0,0 +1,117 @@
+# checkout.py
+# ==========================================================================
+# SESIONES DE STRIPE CHECKOUT: UNA ABIERTA POR EXPERIENCIA Y REUTILIZADA
+# ==========================================================================
+# Cada Session.create es un viaje a Stripe y deja una sesión huérfana si el
+# comprador vuelve atrás o pulsa "Pagar" dos veces. La sesión abierta se
+# guarda en la propia experiencia (id, url, caducidad y huella de lo que se
+# cobra) y /pay redirige a ella sin llamar a la API mientras siga abierta y
+# el título o el precio no hayan cambiado. Al finalizar en el creador se
+# prepara en segundo plano (cola de trabajos): el primer /pay ya es una
+# redirección pura.
+import hashlib
+import json
+import time
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+
+from admission import SingleFlight
+
+
+def checkout_key(params):
+    """Huella de lo que se cobra (sin la caducidad): si cambia, la sesión guardada ya no vale."""
+    stable = {key: value for key, value in params.items() if key != "expires_at"}
+    raw = json.dumps(stable, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class CheckoutSessions:
+    """
+    Gestor de la sesión de pago de cada experiencia.
+
+    - build_params(exp) devuelve los argumentos de Session.create (sin expires_at).
+    - ttl: vida pedida a Stripe (entre 30 min y 24 h).
+    - reuse_margin: una sesión que caduca antes de eso no se reutiliza; el
+      comprador necesita tiempo para rellenar la tarjeta.
+    - timer(operation): context manager para cronometrar la llamada (métricas).
+
+    Las columnas checkout_* se escriben con UPDATE directo: no suben la
+    versión de la experiencia y no provocan 409 en el autosave del creador.
+    """
+
+    def __init__(self, db, model, stripe, build_params, ttl=23 * 3600, reuse_margin=900, timer=None):
+        self.db = db
+        self.model = model
+        self.stripe = stripe
+        self.build_params = build_params
+        self.ttl = ttl
+        self.reuse_margin = reuse_margin
+        self.timer = timer or (lambda operation: nullcontext())
+        self.flights = SingleFlight()  # Doble clic en "Pagar": una sola creación
+        self.stats = {"reused": 0, "created": 0, "prepared": 0, "replaced": 0, "forgotten": 0}
+
+    def reusable(self, exp, key):
+        if not (exp.checkout_session_id and exp.checkout_url and exp.checkout_expires_at):
+            return False
+        fresh_until = datetime.utcnow() + timedelta(seconds=self.reuse_margin)
+        return exp.checkout_key == key and exp.checkout_expires_at > fresh_until
+
+    def checkout_url(self, exp):
+        """URL de pago de 'exp': la guardada si sigue valiendo; si no, se crea (llamada a Stripe)."""
+        params = self.build_params(exp)
+        key = checkout_key(params)
+        if self.reusable(exp, key):
+            self.stats["reused"] += 1
+            return exp.checkout_url
+        return self.flights.run(f"{exp.id}:{key}", lambda: self._create(exp.id, params, key))["url"]
+
+    def prepare(self, game_id):
+        """Para la cola: deja lista la sesión de una experiencia finalizada y caduca la anterior."""
+        exp = self.model.query.get(game_id)
+        if not exp or exp.is_paid:
+            return None
+        params = self.build_params(exp)
+        key = checkout_key(params)
+        if self.reusable(exp, key):
+            return exp.checkout_session_id
+        previous = exp.checkout_session_id
+        created = self.flights.run(f"{exp.id}:{key}", lambda: self._create(exp.id, params, key))
+        self.stats["prepared"] += 1
+        if previous and previous != created["id"]:
+            self.expire(previous)
+        return created["id"]
+
+    def expire(self, session_id):
+        """Cierra en Stripe una sesión sustituida (si ya no estaba abierta, no pasa nada)."""
+        try:
+            with self.timer("checkout.expire"):
+                self.stripe.checkout.Session.expire(session_id)
+            self.stats["replaced"] += 1
+        except Exception as e:
+            print(f"⚠️ No se pudo caducar la sesión {session_id}: {e}")
+
+    def forget(self, session_id):
+        """Webhook checkout.session.expired: la sesión guardada ya no sirve."""
+        cleared = (self.model.query
+                   .filter(self.model.checkout_session_id == session_id)
+                   .update(self._columns(None, None, None, None), synchronize_session=False))
+        self.db.session.commit()
+        self.stats["forgotten"] += cleared
+        return cleared
+
+    def _create(self, game_id, params, key):
+        expires_at = int(time.time()) + self.ttl
+        with self.timer("checkout.create"):
+            session = self.stripe.checkout.Session.create(expires_at=expires_at, **params)
+        expires = datetime.utcfromtimestamp(session.expires_at or expires_at)
+        (self.model.query
+         .filter(self.model.id == game_id, self.model.is_paid.is_(False))
+         .update(self._columns(session.id, session.url, expires, key), synchronize_session=False))
+        self.db.session.commit()
+        self.stats["created"] += 1
+        return {"id": session.id, "url": session.url}
+
+    @staticmethod
+    def _columns(session_id, url, expires_at, key):
+        return {"checkout_session_id": session_id, "checkout_url": url,
+                "checkout_expires_at": expires_at, "checkout_key": key}
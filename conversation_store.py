@@ -0,0 +1,140 @@
+# conversation_store.py
+# ==========================================================================
+# HISTORIAL DE CHAT EN SERVIDOR (sustituye a session['chat_history'])
+# ==========================================================================
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+
+
+class ConversationStore:
+    """
+    Interfaz común. Las conversaciones se indexan por game_id y se recortan
+    a un máximo de mensajes y de bytes (serializados) al guardar.
+    """
+
+    def __init__(self, max_turns=20, max_bytes=16384):
+        self.max_turns = max_turns
+        self.max_bytes = max_bytes
+
+    def load(self, key):
+        raise NotImplementedError
+
+    def save(self, key, history):
+        raise NotImplementedError
+
+    def clear(self, key):
+        raise NotImplementedError
+
+    def append(self, key, *messages):
+        """
+        Añade mensajes al final, recorta y persiste. Devuelve el historial resultante.
+        Las implementaciones lo hacen atómico: dos turnos a la vez no se pisan.
+        """
+        history = self.load(key) + list(messages)
+        history = self.trim(history)
+        self.save(key, history)
+        return history
+
+    def trim(self, history):
+        """Descarta los mensajes más antiguos (por parejas usuario/modelo) hasta cumplir los límites."""
+        while len(history) > self.max_turns:
+            history = history[2:]
+        while history and len(json.dumps(history, ensure_ascii=False).encode("utf-8")) > self.max_bytes:
+            history = history[2:]
+        return history
+
+
+class MemoryConversationStore(ConversationStore):
+    """Implementación en memoria con expulsión LRU. Pensada para tests y desarrollo local."""
+
+    def __init__(self, max_conversations=1000, **kwargs):
+        super().__init__(**kwargs)
+        self.max_conversations = max_conversations
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, key):
+        with self._lock:
+            if key not in self._data:
+                return []
+            self._data.move_to_end(key)
+            return list(self._data[key])
+
+    def save(self, key, history):
+        with self._lock:
+            self._data[key] = list(history)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_conversations:
+                self._data.popitem(last=False)
+
+    def append(self, key, *messages):
+        with self._lock:
+            history = self.trim(list(self._data.get(key, [])) + list(messages))
+            self._data[key] = history
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_conversations:
+                self._data.popitem(last=False)
+            return list(history)
+
+    def clear(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class DBConversationStore(ConversationStore):
+    """
+    Implementación persistente sobre la tabla 'conversations' (modelo Conversation,
+    versionado con version_id_col).
+    """
+
+    def __init__(self, db, model, attempts=5, **kwargs):
+        super().__init__(**kwargs)
+        self.db = db
+        self.model = model
+        self.attempts = attempts
+
+    def append(self, key, *messages):
+        """
+        Leer-modificar-escribir con la fila bloqueada (FOR UPDATE en Postgres) y
+        UPDATE versionado: si otro turno se coló (StaleDataError, o INSERT
+        simultáneo de la primera fila) se relee y se reintenta.
+        """
+        for attempt in range(self.attempts):
+            row = (self.model.query.filter_by(game_id=key)
+                   .with_for_update().populate_existing().first())
+            if row is None:
+                row = self.model(game_id=key, history=[])
+                self.db.session.add(row)
+            history = self.trim(list(row.history or []) + list(messages))
+            row.history = history
+            row.updated_at = datetime.utcnow()
+            try:
+                self.db.session.commit()
+            except (StaleDataError, IntegrityError):
+                self.db.session.rollback()
+                if attempt + 1 == self.attempts:
+                    raise
+                continue
+            return history
+
+    def load(self, key):
+        row = self.model.query.get(key)
+        return list(row.history or []) if row else []
+
+    def save(self, key, history):
+        row = self.model.query.get(key)
+        if row is None:
+            row = self.model(game_id=key)
+            self.db.session.add(row)
+        row.history = history
+        row.updated_at = datetime.utcnow()
+        self.db.session.commit()
+
+    def clear(self, key):
+        self.model.query.filter_by(game_id=key).delete()
+        self.db.session.commit()
@@ -1,20 +1,190 @@
-import psycopg2
+# db.py
+# ==========================================================================
+# SONDA Y BENCHMARK DE LA BASE DE DATOS (DATABASE_URL)
+# ==========================================================================
+# Usa las mismas opciones de pool que la app (db_config.py), así lo que se
+# mide aquí es lo que verá Flask. Funciona con Postgres y con SQLite.
+#
+#   python db.py                                 # conexión + latencia de ida y vuelta
+#   python db.py --concurrency 32 --hold-ms 20   # además, satura el pool
+#   python db.py --url sqlite:///local.db --json
+import argparse
+import json
 import os
+import sys
+import threading
+import time
+
 from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import NullPool
+
+from db_config import engine_options, normalize_url, pool_status
 
 load_dotenv()
 
-try:
-    # Intentamos conectar manualmente con los datos del .env
-    conn = psycopg2.connect(
-        host="127.0.0.1",
-        port="5432",
-        user="user",
-        password="pass",
-        database="dwdb",
-        connect_timeout=3
-    )
-    print("✅ ¡CONEXIÓN EXITOSA DESDE PYTHON!")
-    conn.close()
-except Exception as e:
-    print(f"❌ FALLO DE CONEXIÓN: {e}")
\ No newline at end of file
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def summary_ms(samples):
+    return {
+        "n": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 2),
+        "p95_ms": round(percentile(samples, 95) * 1000, 2),
+        "p99_ms": round(percentile(samples, 99) * 1000, 2),
+        "max_ms": round(max(samples) * 1000, 2) if samples else 0.0,
+    }
+
+
+def probe_connect(url, options, attempts):
+    """Conexiones nuevas (sin pool): DNS + TCP + TLS + auth."""
+    engine = create_engine(url, poolclass=NullPool, connect_args=options.get("connect_args", {}))
+    samples = []
+    for _ in range(attempts):
+        start = time.perf_counter()
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        samples.append(time.perf_counter() - start)
+    engine.dispose()
+    return summary_ms(samples)
+
+
+def probe_roundtrip(engine, queries):
+    """SELECT 1 repetido sobre una conexión ya abierta: latencia pura de red + servidor."""
+    samples = []
+    with engine.connect() as conn:
+        for _ in range(queries):
+            start = time.perf_counter()
+            conn.execute(text("SELECT 1")).scalar()
+            samples.append(time.perf_counter() - start)
+    return summary_ms(samples)
+
+
+def probe_saturation(engine, concurrency, duration, hold_ms):
+    """
+    'concurrency' hilos piden conexión, la retienen 'hold_ms' (como una petición
+    real) y la devuelven. Mide la espera por conexión, el pico de uso del pool
+    y cuántas peticiones agotaron DB_POOL_TIMEOUT.
+    """
+    postgres = engine.dialect.name == "postgresql"
+    waits, errors = [], []
+    done = [0]
+    peak = {"checkedout": 0, "overflow": 0}
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def worker():
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                with engine.connect() as conn:
+                    waited = time.perf_counter() - start
+                    if postgres and hold_ms:
+                        conn.execute(text("SELECT pg_sleep(:s)"), {"s": hold_ms / 1000})
+                    else:
+                        conn.execute(text("SELECT 1"))
+                        time.sleep(hold_ms / 1000)
+            except PoolTimeout as e:
+                with lock:
+                    errors.append(type(e).__name__)
+                continue
+            with lock:
+                waits.append(waited)
+                done[0] += 1
+
+    def sampler():
+        while not stop.is_set():
+            status = pool_status(engine)
+            for key in peak:
+                peak[key] = max(peak[key], status.get(key, 0))
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    threads.append(threading.Thread(target=sampler, daemon=True))
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    status = pool_status(engine)
+    return {
+        "concurrency": concurrency,
+        "hold_ms": hold_ms,
+        "requests_per_s": round(done[0] / elapsed, 1),
+        "checkout_wait": summary_ms(waits),
+        "pool_timeouts": len(errors),
+        "peak_checkedout": peak["checkedout"],
+        "peak_overflow": peak["overflow"],
+        "capacity": status.get("capacity"),
+        "saturated": bool(status.get("capacity")) and peak["checkedout"] >= status["capacity"],
+    }
+
+
+def show(report):
+    print(f"🔌 {report['url']}")
+    print(f"⚙️  Pool: {report['options']}")
+    c = report["connect"]
+    print(f"⏱️  Conexión nueva: p50 {c['p50_ms']} ms · max {c['max_ms']} ms ({c['n']} intentos)")
+    r = report["roundtrip"]
+    print(f"🏓 SELECT 1: p50 {r['p50_ms']} ms · p95 {r['p95_ms']} ms · p99 {r['p99_ms']} ms ({r['n']} consultas)")
+    s = report.get("saturation")
+    if s:
+        w = s["checkout_wait"]
+        print(f"🚦 {s['concurrency']} hilos x {s['hold_ms']} ms: {s['requests_per_s']} req/s · "
+              f"espera por conexión p95 {w['p95_ms']} ms · p99 {w['p99_ms']} ms")
+        print(f"   Pico en uso {s['peak_checkedout']}/{s['capacity']} (overflow {s['peak_overflow']}) · "
+              f"timeouts {s['pool_timeouts']}" + (" · ⚠️ POOL SATURADO" if s["saturated"] else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sonda de conexión y latencia de la BD")
+    parser.add_argument("--url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--connects", type=int, default=5, help="Conexiones nuevas a cronometrar")
+    parser.add_argument("--queries", type=int, default=200, help="SELECT 1 sobre una misma conexión")
+    parser.add_argument("--concurrency", type=int, default=0, help="Hilos para la prueba de saturación (0 = no)")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--hold-ms", type=float, default=10.0, help="Tiempo que cada hilo retiene la conexión")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    url = normalize_url(args.url)
+    if not url:
+        sys.exit("❌ Falta DATABASE_URL (o --url)")
+    options = engine_options(url)
+    engine = None
+    try:
+        engine = create_engine(url, **options)
+        report = {
+            "url": engine.url.render_as_string(hide_password=True),
+            "options": {k: v for k, v in options.items() if k != "connect_args"},
+            "connect": probe_connect(url, options, args.connects),
+            "roundtrip": probe_roundtrip(engine, args.queries),
+        }
+        if args.concurrency:
+            report["saturation"] = probe_saturation(engine, args.concurrency, args.duration, args.hold_ms)
+    except Exception as e:
+        print(f"❌ FALLO DE CONEXIÓN: {e}")
+        sys.exit(1)
+    finally:
+        if engine is not None:
+            engine.dispose()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        show(report)
+        print("✅ ¡CONEXIÓN EXITOSA DESDE PYTHON!")
+
+
+if __name__ == "__main__":
+    main()
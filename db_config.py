@@ -0,0 +1,59 @@
+# db_config.py
+# ==========================================================================
+# CONFIGURACIÓN DEL POOL DE CONEXIONES (ENV -> OPCIONES DEL ENGINE)
+# ==========================================================================
+# Render duerme la BD y mata conexiones ociosas: sin pre-ping la primera
+# petición tras el parón se encuentra un socket muerto. Todo ajustable:
+#
+#   DB_POOL_SIZE=5  DB_MAX_OVERFLOW=10  DB_POOL_TIMEOUT=10  DB_POOL_RECYCLE=1800
+#   DB_POOL_PRE_PING=1  DB_CONNECT_TIMEOUT=5  DB_STATEMENT_TIMEOUT_MS=30000
+import os
+
+
+def normalize_url(url):
+    """Render entrega postgres://, SQLAlchemy solo entiende postgresql://"""
+    if url and url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql://", 1)
+    return url
+
+
+def _int(env, name, default):
+    return int(env.get(name, default))
+
+
+def engine_options(url, env=os.environ):
+    """Opciones para SQLALCHEMY_ENGINE_OPTIONS según el motor de 'url'."""
+    options = {"pool_pre_ping": env.get("DB_POOL_PRE_PING", "1") == "1"}
+    if not url or url.startswith("sqlite"):
+        # SQLite no tiene pool de red; 'timeout' es la espera por el bloqueo de escritura
+        options["connect_args"] = {"timeout": _int(env, "DB_CONNECT_TIMEOUT", 5)}
+        return options
+
+    options.update(
+        pool_size=_int(env, "DB_POOL_SIZE", 5),
+        max_overflow=_int(env, "DB_MAX_OVERFLOW", 10),
+        pool_timeout=_int(env, "DB_POOL_TIMEOUT", 10),
+        pool_recycle=_int(env, "DB_POOL_RECYCLE", 1800),
+    )
+    connect_args = {}
+    if url.startswith("postgresql"):
+        connect_args["connect_timeout"] = _int(env, "DB_CONNECT_TIMEOUT", 5)
+        statement_timeout = _int(env, "DB_STATEMENT_TIMEOUT_MS", 30000)
+        if statement_timeout:
+            connect_args["options"] = f"-c statement_timeout={statement_timeout}"
+    options["connect_args"] = connect_args
+    return options
+
+
+def pool_status(engine):
+    """Ocupación del pool (para /api/stats y db.py)."""
+    pool = engine.pool
+    status = {"class": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        method = getattr(pool, name, None)
+        if callable(method):
+            status[name] = method()
+    max_overflow = getattr(pool, "_max_overflow", None)
+    if "size" in status and max_overflow is not None:
+        status["capacity"] = status["size"] + max(max_overflow, 0)
+    return status
@@ -0,0 +1,466 @@
+# fakes.py
+# ==========================================================================
+# DOBLES LOCALES DE SERVICIOS EXTERNOS (para desarrollo, pruebas y benchmarks)
+# ==========================================================================
+import asyncio
+import hashlib
+import hmac
+import itertools
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qsl
+
+from google.genai import types
+
+from prompt_builder import estimate_tokens
+from streaming import JSON_DELIMITER
+
+
+def sample_game(idea):
+    """Juego válido según el esquema de MINI_ESCAPE_PROMPT, derivado de la idea."""
+    title = (idea or "Experiencia").strip()[:40] or "Experiencia"
+    steps = [{"type": "intro", "title": title, "subtitle": "Un reto hecho a medida."}]
+    for n in range(1, 6):
+        steps.append({
+            "type": "level",
+            "level_number": n,
+            "level_title": f"Nivel {n}",
+            "question": f"Pregunta {n} sobre {title}",
+            "answer": f"respuesta{n}",
+        })
+    return {
+        "visual_config": {
+            "primary_color": "#22D3EE",
+            "bg_color": "#0F172A",
+            "font_family": "Space Grotesk",
+            "theme_icon": "fa-brain",
+        },
+        "title": title,
+        "steps": steps,
+    }
+
+
+def fake_reply(idea, json_mode=False):
+    """Respuesta tipo Gemini: 'prosa + ###JSON_DATA### + JSON' o, en modo ajuste, un parche."""
+    if json_mode:
+        # Modo ajuste: parche mínimo sobre el primer nivel
+        return json.dumps({
+            "comment": "Ajuste aplicado.",
+            "operations": [{"op": "replace", "path": "/steps/1/question",
+                            "value_json": json.dumps(f"Pregunta ajustada: {idea[:60]}")}],
+        }, ensure_ascii=False)
+    return f"Concepto listo: **{idea[:60]}**.\n{JSON_DELIMITER}\n{json.dumps(sample_game(idea), ensure_ascii=False)}"
+
+
+def _chunks(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+
+def _text_of(contents):
+    parts = []
+    for content in contents or []:
+        for part in content.parts or []:
+            if part.text:
+                parts.append(part.text)
+    return "\n".join(parts)
+
+
+class _FakeResponse:
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class _FakeModels:
+    def __init__(self, owner):
+        self.owner = owner
+
+    def generate_content(self, model, contents, config=None):
+        self.owner.calls.append({"model": model, "contents": contents, "config": config})
+        time.sleep(self.owner.latency)
+        text = self.owner.reply_for(contents, config)
+        return _FakeResponse(text, self.owner.usage_for(contents, config, text))
+
+    def generate_content_stream(self, model, contents, config=None):
+        self.owner.calls.append({"model": model, "contents": contents, "config": config})
+        time.sleep(self.owner.first_token_latency)
+        text = self.owner.reply_for(contents, config)
+        chunks = _chunks(text, self.owner.chunk_size)
+        delay = max(self.owner.latency - self.owner.first_token_latency, 0) / max(len(chunks), 1)
+        for i, chunk in enumerate(chunks):
+            last = i == len(chunks) - 1
+            yield _FakeResponse(chunk, self.owner.usage_for(contents, config, text) if last else None)
+            time.sleep(delay)
+
+    def count_tokens(self, model, contents, config=None):
+        return types.CountTokensResponse(total_tokens=estimate_tokens(_text_of(contents)))
+
+
+class _FakeAsyncModels:
+    """Equivalente de client.aio.models: misma latencia, sin bloquear el event loop."""
+
+    def __init__(self, owner):
+        self.owner = owner
+
+    async def generate_content(self, model, contents, config=None):
+        self.owner.calls.append({"model": model, "contents": contents, "config": config})
+        await asyncio.sleep(self.owner.latency)
+        text = self.owner.reply_for(contents, config)
+        return _FakeResponse(text, self.owner.usage_for(contents, config, text))
+
+    async def generate_content_stream(self, model, contents, config=None):
+        self.owner.calls.append({"model": model, "contents": contents, "config": config})
+        owner = self.owner
+
+        async def stream():
+            await asyncio.sleep(owner.first_token_latency)
+            text = owner.reply_for(contents, config)
+            chunks = _chunks(text, owner.chunk_size)
+            delay = max(owner.latency - owner.first_token_latency, 0) / len(chunks)
+            for i, chunk in enumerate(chunks):
+                last = i == len(chunks) - 1
+                yield _FakeResponse(chunk, owner.usage_for(contents, config, text) if last else None)
+                await asyncio.sleep(delay)
+
+        return stream()
+
+
+class _FakeCaches:
+    def __init__(self, owner):
+        self.owner = owner
+        self.items = {}
+        self._ids = itertools.count(1)
+
+    def create(self, model, config=None):
+        name = f"cachedContents/fake-{next(self._ids)}"
+        self.items[name] = config.system_instruction if config else ""
+        return types.CachedContent(name=name, model=model, display_name=config.display_name if config else None)
+
+    def get(self, name, config=None):
+        return types.CachedContent(name=name)
+
+    def delete(self, name, config=None):
+        self.items.pop(name, None)
+
+
+class FakeGeminiClient:
+    """
+    Sustituto local de genai.Client con latencia configurable.
+    Responde con 'prosa + ###JSON_DATA### + JSON' usando sample_game() o
+    con la respuesta fija indicada en 'reply'.
+    """
+
+    def __init__(self, latency=0.0, first_token_latency=0.0, reply=None, chunk_size=32):
+        self.latency = latency
+        self.first_token_latency = first_token_latency
+        self.reply = reply
+        self.chunk_size = chunk_size
+        self.calls = []
+        self.models = _FakeModels(self)
+        self.caches = _FakeCaches(self)
+        self.aio = SimpleNamespace(models=_FakeAsyncModels(self), caches=self.caches)
+
+    def reply_for(self, contents, config):
+        if self.reply is not None:
+            return self.reply(contents, config) if callable(self.reply) else self.reply
+        idea = contents[-1].parts[-1].text if contents else ""
+        json_mode = config is not None and config.response_mime_type == "application/json"
+        return fake_reply(idea, json_mode)
+
+    def usage_for(self, contents, config, text):
+        cached = 0
+        if config is not None and config.cached_content:
+            cached = estimate_tokens(self.caches.items.get(config.cached_content, ""))
+        prompt = estimate_tokens(_text_of(contents)) + cached
+        if config is not None and config.system_instruction:
+            prompt += estimate_tokens(str(config.system_instruction))
+        return types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=prompt,
+            cached_content_token_count=cached,
+            candidates_token_count=estimate_tokens(text),
+        )
+
+
+class _BacklogHTTPServer(ThreadingHTTPServer):
+    # La cola por defecto (5) rechaza conexiones en cuanto hay carga concurrente
+    request_queue_size = 256
+    daemon_threads = True
+
+
+class _FakeServer:
+    """Arranque/parada en un hilo de fondo de un servidor HTTP falso."""
+
+    server = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeGeminiServer(_FakeServer):
+    """
+    Servidor HTTP local que imita la API REST de Gemini (generateContent,
+    streamGenerateContent y cachedContents) con latencia artificial.
+    Se usa con GEMINI_BASE_URL para ejercitar el SDK real, síncrono y asíncrono.
+    """
+
+    def __init__(self, latency=1.0, first_token_latency=0.2, host="127.0.0.1", port=0, chunk_size=64):
+        owner = self
+        self.latency = latency
+        self.first_token_latency = first_token_latency
+        self.chunk_size = chunk_size
+        self.requests = 0
+        self._ids = itertools.count(1)
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                owner.requests += 1
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if "cachedContents" in self.path:
+                    return self._json({"name": f"cachedContents/fake-{next(owner._ids)}",
+                                       "model": body.get("model"), "expireTime": "2099-01-01T00:00:00Z"})
+                match = re.search(r":(generateContent|streamGenerateContent)", self.path)
+                if not match:
+                    return self._json({"error": {"code": 404, "message": "not found"}}, 404)
+
+                contents = body.get("contents") or [{}]
+                parts = contents[-1].get("parts") or [{}]
+                idea = parts[-1].get("text", "")
+                json_mode = (body.get("generationConfig") or {}).get("responseMimeType") == "application/json"
+                text = fake_reply(idea, json_mode)
+                usage = {"promptTokenCount": len(json.dumps(body)) // 4,
+                         "candidatesTokenCount": len(text) // 4}
+
+                if match.group(1) == "generateContent":
+                    time.sleep(owner.latency)
+                    return self._json({"candidates": [{"content": {"role": "model", "parts": [{"text": text}]},
+                                                       "finishReason": "STOP"}],
+                                       "usageMetadata": usage})
+
+                # streamGenerateContent?alt=sse
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                time.sleep(owner.first_token_latency)
+                chunks = _chunks(text, owner.chunk_size)
+                delay = max(owner.latency - owner.first_token_latency, 0) / len(chunks)
+                for i, chunk in enumerate(chunks):
+                    payload = {"candidates": [{"content": {"role": "model", "parts": [{"text": chunk}]}}]}
+                    if i == len(chunks) - 1:
+                        payload["usageMetadata"] = usage
+                    self.wfile.write(f"data: {json.dumps(payload)}\r\n\r\n".encode("utf-8"))
+                    self.wfile.flush()
+                    time.sleep(delay)
+                self.close_connection = True
+
+            def _json(self, data, status=200):
+                raw = json.dumps(data).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+        self.server = _BacklogHTTPServer((host, port), Handler)
+        self._thread = None
+
+
+class FakeSendGridServer(_FakeServer):
+    """
+    Sumidero local de la API v3 de SendGrid (POST /v3/mail/send).
+    Guarda los mensajes recibidos en .messages y puede fallar las primeras
+    'fail_first' peticiones (500) para ejercitar los reintentos de la cola.
+    Se usa con SENDGRID_HOST.
+    """
+
+    def __init__(self, latency=0.0, fail_first=0, host="127.0.0.1", port=0):
+        owner = self
+        self.latency = latency
+        self.fail_first = fail_first
+        self.requests = 0
+        self.messages = []
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                owner.requests += 1
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                time.sleep(owner.latency)
+                if not self.path.startswith("/v3/mail/send"):
+                    return self._reply(404, b'{"errors": [{"message": "not found"}]}')
+                if owner.requests <= owner.fail_first:
+                    return self._reply(500, b'{"errors": [{"message": "fallo simulado"}]}')
+                owner.messages.append(body)
+                self._reply(202, b"")
+
+            def _reply(self, status, raw):
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+        self.server = _BacklogHTTPServer((host, port), Handler)
+        self._thread = None
+
+
+def _form_to_dict(pairs):
+    """'metadata[game_id]=x' (codificación de formularios de Stripe) -> {'metadata': {'game_id': 'x'}}"""
+    result = {}
+    for key, value in pairs:
+        parts = re.findall(r"[^\[\]]+", key)
+        target = result
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    return result
+
+
+def sign_webhook(payload, secret, timestamp=None):
+    """Cabecera Stripe-Signature válida para 'payload' (lo que comprueba stripe.Webhook)."""
+    timestamp = int(timestamp or time.time())
+    signed = f"{timestamp}.{payload}".encode("utf-8")
+    signature = hmac.new(secret.encode("utf-8"), signed, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def checkout_completed_event(checkout_session, email="comprador@example.com"):
+    """Evento checkout.session.completed como el que Stripe manda al webhook."""
+    completed = dict(checkout_session, status="complete", payment_status="paid",
+                     customer_details={"email": email})
+    return {"id": f"evt_{checkout_session['id']}", "object": "event",
+            "type": "checkout.session.completed", "data": {"object": completed}}
+
+
+def checkout_expired_event(checkout_session):
+    """Evento checkout.session.expired (la sesión caducó sin pagarse)."""
+    expired = dict(checkout_session, status="expired")
+    return {"id": f"evt_expired_{checkout_session['id']}", "object": "event",
+            "type": "checkout.session.expired", "data": {"object": expired}}
+
+
+class FakeStripeServer(_FakeServer):
+    """
+    API mínima de Stripe Checkout (crear, recuperar y caducar sesiones) con
+    latencia configurable. Se usa con STRIPE_API_BASE; las sesiones creadas
+    quedan en .sessions para construir después el webhook
+    (checkout_completed_event) y .created cuenta las llamadas de creación.
+    """
+
+    def __init__(self, latency=0.0, host="127.0.0.1", port=0):
+        owner = self
+        self.latency = latency
+        self.requests = 0
+        self.sessions = {}
+        self.created = 0
+        self._ids = itertools.count(1)
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                owner.requests += 1
+                length = int(self.headers.get("Content-Length") or 0)
+                form = _form_to_dict(parse_qsl(self.rfile.read(length).decode("utf-8")))
+                time.sleep(owner.latency)
+                expire = re.match(r"^/v1/checkout/sessions/([\w]+)/expire$", self.path)
+                if expire:
+                    session = owner.sessions.get(expire.group(1))
+                    if session is None or session["status"] != "open":
+                        return self._json({"error": {"message": "Only open sessions can be expired"}}, 400)
+                    session["status"] = "expired"
+                    return self._json(session)
+                if self.path.rstrip("/") != "/v1/checkout/sessions":
+                    return self._json({"error": {"message": "not found"}}, 404)
+                owner.created += 1
+                session_id = f"cs_test_fake{next(owner._ids)}"
+                session = {
+                    "id": session_id,
+                    "object": "checkout.session",
+                    "status": "open",
+                    "payment_status": "unpaid",
+                    "mode": form.get("mode"),
+                    "metadata": form.get("metadata", {}),
+                    "success_url": form.get("success_url"),
+                    "cancel_url": form.get("cancel_url"),
+                    "expires_at": int(form.get("expires_at") or time.time() + 24 * 3600),
+                    "url": f"{owner.base_url}/c/pay/{session_id}",
+                }
+                owner.sessions[session_id] = session
+                self._json(session)
+
+            def do_GET(self):
+                owner.requests += 1
+                time.sleep(owner.latency)
+                match = re.match(r"^/v1/checkout/sessions/([\w]+)", self.path)
+                session = owner.sessions.get(match.group(1)) if match else None
+                if session is None:
+                    return self._json({"error": {"message": "No such checkout.session"}}, 404)
+                self._json(session)
+
+            def _json(self, data, status=200):
+                raw = json.dumps(data).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+        self.server = _BacklogHTTPServer((host, port), Handler)
+        self._thread = None
+
+
+if __name__ == "__main__":
+    # Servidores falsos sueltos para desarrollo local:
+    #   python fakes.py sendgrid --port 3030   ->  SENDGRID_HOST=http://127.0.0.1:3030
+    #   python fakes.py gemini --port 3031     ->  GEMINI_BASE_URL=http://127.0.0.1:3031
+    #   python fakes.py stripe --port 3032     ->  STRIPE_API_BASE=http://127.0.0.1:3032
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("service", choices=["sendgrid", "gemini", "stripe"])
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--fail-first", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.service == "sendgrid":
+        fake = FakeSendGridServer(latency=args.latency, fail_first=args.fail_first, port=args.port)
+    elif args.service == "stripe":
+        fake = FakeStripeServer(latency=args.latency, port=args.port)
+    else:
+        fake = FakeGeminiServer(latency=args.latency, port=args.port)
+    print(f"Fake {args.service} escuchando en {fake.base_url}")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        fake.server.server_close()
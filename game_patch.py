@@ -0,0 +1,141 @@
+# game_patch.py
+# ==========================================================================
+# APLICACIÓN DE JSON PATCH (RFC 6902) SOBRE game_data
+# ==========================================================================
+import copy
+import json
+import re
+
+LIST_INDEX_RE = re.compile(r"^(0|[1-9][0-9]*)$")
+
+
+class PatchError(ValueError):
+    """El parche no es aplicable al documento actual."""
+
+
+def _parse_pointer(path):
+    if path == "":
+        return []
+    if not isinstance(path, str) or not path.startswith("/"):
+        raise PatchError(f"Ruta inválida: {path!r}")
+    return [token.replace("~1", "/").replace("~0", "~") for token in path[1:].split("/")]
+
+
+def _resolve(doc, tokens):
+    """Devuelve (contenedor, clave) del último segmento de la ruta."""
+    target = doc
+    for token in tokens[:-1]:
+        target = _child(target, token)
+    return target, tokens[-1]
+
+
+def _child(target, token):
+    if isinstance(target, list):
+        return target[_list_index(target, token, allow_end=False)]
+    try:
+        return target[token]
+    except (KeyError, TypeError):
+        raise PatchError(f"Segmento inexistente: {token!r}")
+
+
+def _list_index(target, token, allow_end):
+    """Índice de lista según RFC 6901: '0' o sin ceros a la izquierda; nada de '-1' ni '+1'."""
+    if token == "-" and allow_end:
+        return len(target)
+    if not LIST_INDEX_RE.match(token):
+        raise PatchError(f"Índice inválido: {token!r}")
+    index = int(token)
+    upper = len(target) if allow_end else len(target) - 1
+    if index > upper:
+        raise PatchError(f"Índice fuera de rango: {index}")
+    return index
+
+
+def _get(doc, path):
+    target = doc
+    for token in _parse_pointer(path):
+        target = _child(target, token)
+    return target
+
+
+def _add(doc, path, value):
+    tokens = _parse_pointer(path)
+    if not tokens:
+        return value
+    parent, key = _resolve(doc, tokens)
+    if isinstance(parent, list):
+        parent.insert(_list_index(parent, key, allow_end=True), value)
+    elif isinstance(parent, dict):
+        parent[key] = value
+    else:
+        raise PatchError(f"No se puede añadir en {path!r}")
+    return doc
+
+
+def _remove(doc, path):
+    tokens = _parse_pointer(path)
+    if not tokens:
+        raise PatchError("No se puede eliminar la raíz")
+    parent, key = _resolve(doc, tokens)
+    if isinstance(parent, list):
+        return parent.pop(_list_index(parent, key, allow_end=False))
+    if isinstance(parent, dict) and key in parent:
+        return parent.pop(key)
+    raise PatchError(f"Nada que eliminar en {path!r}")
+
+
+def apply_patch(doc, operations):
+    """
+    Aplica las operaciones sobre una copia del documento y la devuelve.
+    Soporta add, remove, replace, move, copy y test.
+    """
+    doc = copy.deepcopy(doc)
+    for op in operations:
+        if not isinstance(op, dict) or "op" not in op or "path" not in op:
+            raise PatchError(f"Operación mal formada: {op!r}")
+        kind, path = op["op"], op["path"]
+        if kind in ("move", "copy") and "from" not in op:
+            raise PatchError(f"'{kind}' sin 'from': {op!r}")
+        if kind in ("add", "replace", "test") and "value" not in op:
+            raise PatchError(f"'{kind}' sin 'value': {op!r}")
+        if kind == "add":
+            doc = _add(doc, path, copy.deepcopy(op["value"]))
+        elif kind == "remove":
+            _remove(doc, path)
+        elif kind == "replace":
+            _get(doc, path)  # La ruta debe existir
+            if path == "":
+                doc = copy.deepcopy(op["value"])
+            else:
+                _remove(doc, path)
+                doc = _add(doc, path, copy.deepcopy(op["value"]))
+        elif kind == "move":
+            value = _get(doc, op["from"])
+            _remove(doc, op["from"])
+            doc = _add(doc, path, value)
+        elif kind == "copy":
+            doc = _add(doc, path, copy.deepcopy(_get(doc, op["from"])))
+        elif kind == "test":
+            if _get(doc, path) != op["value"]:
+                raise PatchError(f"Test fallido en {path!r}")
+        else:
+            raise PatchError(f"Operación desconocida: {kind!r}")
+    return doc
+
+
+def decode_operations(raw_operations):
+    """
+    Convierte las operaciones del modelo (valor serializado en 'value_json',
+    porque el response_schema de Gemini no admite valores de tipo libre)
+    en operaciones JSON Patch estándar.
+    """
+    operations = []
+    for raw in raw_operations:
+        op = {key: raw[key] for key in ("op", "path", "from") if key in raw}
+        if raw.get("value_json") not in (None, ""):
+            try:
+                op["value"] = json.loads(raw["value_json"])
+            except json.JSONDecodeError:
+                op["value"] = raw["value_json"]  # Texto plano sin comillas
+        operations.append(op)
+    return operations
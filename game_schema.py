@@ -0,0 +1,109 @@
+# game_schema.py
+# ==========================================================================
+# VALIDACIÓN DEL JSON DE JUEGO (ESQUEMA DE MINI_ESCAPE_PROMPT)
+# ==========================================================================
+import re
+
+HEX_COLOR_RE = re.compile(r'^#[0-9A-Fa-f]{6}$')
+
+VISUAL_CONFIG_FIELDS = ("primary_color", "bg_color", "font_family", "theme_icon")
+INTRO_FIELDS = ("title", "subtitle")
+LEVEL_FIELDS = ("level_title", "question", "answer")
+
+# Iconos que la IA puede elegir como theme_icon (los lista el prompt). Son los
+# únicos que entran en el Font Awesome recortado de assets.py: otro no se vería.
+ALLOWED_ICONS = (
+    "fa-brain", "fa-compass", "fa-vault", "fa-microchip", "fa-shuttle-space", "fa-puzzle-piece",
+    "fa-key", "fa-lock", "fa-lightbulb", "fa-user-secret", "fa-magnifying-glass", "fa-fingerprint",
+    "fa-eye", "fa-scroll", "fa-map", "fa-map-location-dot", "fa-hourglass-half", "fa-clock",
+    "fa-star", "fa-heart", "fa-gift", "fa-cake-candles", "fa-ring", "fa-champagne-glasses",
+    "fa-crown", "fa-gem", "fa-trophy", "fa-medal", "fa-chess-queen", "fa-chess-knight", "fa-dice",
+    "fa-gamepad", "fa-dragon", "fa-ghost", "fa-hat-wizard", "fa-wand-magic-sparkles", "fa-skull",
+    "fa-snowflake", "fa-leaf", "fa-tree", "fa-mountain", "fa-umbrella-beach", "fa-anchor",
+    "fa-plane", "fa-earth-europe", "fa-rocket", "fa-moon", "fa-sun", "fa-bolt", "fa-fire",
+    "fa-music", "fa-guitar", "fa-headphones", "fa-film", "fa-camera", "fa-palette", "fa-feather",
+    "fa-book", "fa-book-open", "fa-mug-hot", "fa-wine-glass", "fa-pizza-slice", "fa-utensils",
+    "fa-dumbbell", "fa-futbol", "fa-paw", "fa-cat", "fa-dog", "fa-terminal", "fa-code",
+    "fa-robot", "fa-atom", "fa-flask", "fa-dna",
+)
+DEFAULT_ICON = "fa-puzzle-piece"
+
+
+def _is_text(value):
+    return isinstance(value, str) and value.strip() != ""
+
+
+def validate_game(data, strict=True, allow_empty=False):
+    """
+    Devuelve la lista de errores del JSON de juego (vacía si es válido).
+
+    strict=True exige el esquema completo que pide MINI_ESCAPE_PROMPT
+    (lo que debe devolver la IA). strict=False solo comprueba lo que el
+    player necesita para funcionar (plantillas antiguas con 'type': 'quiz'...).
+    allow_empty=True acepta 'steps' vacío (borrador recién creado en el creador).
+    """
+    if not isinstance(data, dict):
+        return ["El juego no es un objeto JSON"]
+
+    errors = []
+    steps = data.get("steps")
+    if allow_empty and steps == []:
+        pass
+    elif not isinstance(steps, list) or not steps:
+        errors.append("'steps' debe ser una lista no vacía")
+        steps = []
+
+    for i, step in enumerate(steps):
+        if not isinstance(step, dict):
+            errors.append(f"steps[{i}] no es un objeto")
+            continue
+        if step.get("type") == "intro":
+            required = INTRO_FIELDS if strict else ("title",)
+        else:
+            if strict and step.get("type") != "level":
+                errors.append(f"steps[{i}].type debe ser 'intro' o 'level'")
+            required = LEVEL_FIELDS if strict else ("question", "answer")
+        for field in required:
+            if not _is_text(step.get(field)):
+                errors.append(f"steps[{i}].{field} es obligatorio")
+
+    config = data.get("visual_config")
+    if config is None and not strict:
+        return errors
+    if not isinstance(config, dict):
+        errors.append("'visual_config' debe ser un objeto")
+        return errors
+
+    for field in VISUAL_CONFIG_FIELDS if strict else ():
+        if not _is_text(config.get(field)):
+            errors.append(f"visual_config.{field} es obligatorio")
+    for field in ("primary_color", "bg_color"):
+        if field in config and not HEX_COLOR_RE.match(str(config[field])):
+            errors.append(f"visual_config.{field} debe ser un color Hex (#RRGGBB)")
+
+    if strict and not _is_text(data.get("title")):
+        errors.append("'title' es obligatorio")
+    return errors
+
+
+def allowed_icon(value):
+    """'fa-solid fa-brain' o 'fa-brain' -> 'fa-brain'; cualquier otro -> DEFAULT_ICON."""
+    icon = value.split()[-1]
+    return icon if icon in ALLOWED_ICONS else DEFAULT_ICON
+
+
+def normalize_game(data):
+    """
+    Corrige en el sitio lo que no merece regenerar el juego y devuelve 'data'.
+    Hoy solo theme_icon: uno fuera de ALLOWED_ICONS no se vería con el Font
+    Awesome recortado. Se llama al aceptar un juego de la IA o del creador,
+    no al validar (las plantillas se publican tal cual).
+    """
+    config = data.get("visual_config") if isinstance(data, dict) else None
+    if isinstance(config, dict) and _is_text(config.get("theme_icon")):
+        config["theme_icon"] = allowed_icon(config["theme_icon"])
+    return data
+
+
+def is_valid_game(data, strict=True):
+    return not validate_game(data, strict=strict)
@@ -0,0 +1,123 @@
+# generation_cache.py
+# ==========================================================================
+# CACHÉ DE GENERACIONES (IDEAS REPETIDAS Y PRESETS)
+# ==========================================================================
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from prompt_builder import compact_json
+
+_PUNCT_RE = re.compile(r'[^\w\s]')
+_SPACES_RE = re.compile(r'\s+')
+
+
+def normalize_prompt(text):
+    """'¡Cumpleaños de mi NOVIA!' y 'cumpleanos de mi novia' comparten entrada."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = _PUNCT_RE.sub(" ", text.lower())
+    return _SPACES_RE.sub(" ", text).strip()
+
+
+def generation_key(prompt, current_json, prompt_version):
+    json_hash = hashlib.sha256(compact_json(current_json).encode("utf-8")).hexdigest()
+    raw = f"{prompt_version}|{json_hash}|{normalize_prompt(prompt)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class DBCacheBackend:
+    """Backend persistente sobre la tabla 'generation_cache' (sobrevive a reinicios de workers)."""
+
+    def __init__(self, db, model):
+        self.db = db
+        self.model = model
+
+    def get(self, key):
+        row = self.model.query.get(key)
+        if row is None:
+            return None
+        if row.expires_at < datetime.utcnow():
+            self.db.session.delete(row)
+            self.db.session.commit()
+            return None
+        return row.value
+
+    def set(self, key, value, ttl):
+        row = self.model.query.get(key) or self.model(key=key)
+        row.value = value
+        row.expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+        self.db.session.add(row)
+        self.db.session.commit()
+
+
+class GenerationCache:
+    """
+    LRU en memoria con TTL y tamaño máximo, con backend persistente opcional
+    detrás (read-through / write-through). max_entries=0 desactiva la caché.
+    """
+
+    def __init__(self, max_entries=500, ttl=86400, backend=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.backend = backend
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.backend_hits = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._items.get(key)
+            if entry and entry[0] > now:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self._items.pop(key, None)
+
+        value = self.backend.get(key) if self.backend else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.backend_hits += 1
+        self._remember(key, value, now)
+        return value
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+        self._remember(key, value, time.time())
+        if self.backend:
+            self.backend.set(key, value, self.ttl)
+
+    def _remember(self, key, value, now):
+        with self._lock:
+            self._items[key] = (now + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "backend_hits": self.backend_hits,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+            "size": len(self._items),
+            "max_entries": self.max_entries,
+        }
@@ -0,0 +1,188 @@
+# jobs.py
+# ==========================================================================
+# COLA DE TRABAJOS PERSISTENTE EN BASE DE DATOS (REINTENTOS + DEAD-LETTER)
+# ==========================================================================
+import os
+import random
+import socket
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+PENDING, RUNNING, DONE, DEAD = "pending", "running", "done", "dead"
+
+
+def backoff_seconds(attempts, base=30, cap=3600):
+    """30s, 60s, 120s... hasta 1h, con un 10% de jitter para no sincronizar reintentos."""
+    delay = min(cap, base * 2 ** max(attempts - 1, 0))
+    return delay * random.uniform(0.9, 1.1)
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+class JobQueue:
+    """
+    Cola durable sobre la tabla 'jobs'. Cada trabajo tiene un 'kind' con su
+    handler registrado y un payload JSON.
+
+    - enqueue() es idempotente por 'key' (p.ej. el id del evento de Stripe).
+    - claim() reserva trabajos con un UPDATE condicional: varios workers
+      (procesos o hilos) pueden competir sin procesar dos veces el mismo.
+    - Un fallo reprograma el trabajo con backoff exponencial; al agotar
+      max_attempts pasa a 'dead' para revisión manual (retry_dead()).
+    - Un trabajo 'running' cuyo worker murió se recupera pasado 'lease'.
+    """
+
+    def __init__(self, db, model, max_attempts=8, lease=300):
+        self.db = db
+        self.model = model
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self.handlers = {}
+
+    def handler(self, kind):
+        """Decorador para registrar la función que procesa un tipo de trabajo."""
+        def register(fn):
+            self.handlers[kind] = fn
+            return fn
+        return register
+
+    def enqueue(self, kind, payload, key=None, commit=True):
+        """Devuelve (job, creado). Si ya existe un trabajo con esa key no duplica."""
+        if key:
+            existing = self.model.query.filter_by(idempotency_key=key).first()
+            if existing:
+                return existing, False
+        job = self.model(kind=kind, payload=payload, idempotency_key=key,
+                         status=PENDING, attempts=0, run_at=datetime.utcnow())
+        self.db.session.add(job)
+        if not commit:
+            return job, True
+        try:
+            self.db.session.commit()
+        except IntegrityError:
+            # Otro proceso encoló la misma key a la vez
+            self.db.session.rollback()
+            return self.model.query.filter_by(idempotency_key=key).first(), False
+        return job, True
+
+    def claim(self, worker_id, limit=1):
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=self.lease)
+        candidates = (
+            self.model.query
+            .filter(((self.model.status == PENDING) & (self.model.run_at <= now)) |
+                    ((self.model.status == RUNNING) & (self.model.locked_at < stale)))
+            .order_by(self.model.run_at)
+            .limit(limit * 3)
+            .all()
+        )
+        claimed = []
+        for job in candidates:
+            updated = (
+                self.model.query
+                .filter(self.model.id == job.id, self.model.status == job.status,
+                        self.model.attempts == job.attempts)
+                .update({"status": RUNNING, "locked_by": worker_id, "locked_at": now,
+                         "attempts": job.attempts + 1}, synchronize_session=False)
+            )
+            self.db.session.commit()
+            if updated:
+                claimed.append(self.model.query.get(job.id))
+            if len(claimed) >= limit:
+                break
+        return claimed
+
+    def run_job(self, job):
+        handler = self.handlers.get(job.kind)
+        try:
+            if handler is None:
+                raise LookupError(f"Sin handler para '{job.kind}'")
+            handler(job.payload)
+        except Exception as e:
+            self.db.session.rollback()
+            self.fail(job, e)
+            return False
+        self.complete(job)
+        return True
+
+    def complete(self, job):
+        job.status = DONE
+        job.finished_at = datetime.utcnow()
+        job.locked_by = None
+        job.last_error = None
+        self.db.session.commit()
+
+    def fail(self, job, error):
+        job.last_error = f"{type(error).__name__}: {error}"[:2000]
+        job.locked_by = None
+        if job.attempts >= self.max_attempts:
+            job.status = DEAD
+            job.finished_at = datetime.utcnow()
+            print(f"☠️ Trabajo {job.id} ({job.kind}) a dead-letter tras {job.attempts} intentos: {job.last_error}")
+        else:
+            job.status = PENDING
+            job.run_at = datetime.utcnow() + timedelta(seconds=backoff_seconds(job.attempts))
+            print(f"🔁 Trabajo {job.id} ({job.kind}) falló (intento {job.attempts}), reintento a las {job.run_at:%H:%M:%S}")
+        self.db.session.commit()
+
+    def run_pending(self, worker_id=None, limit=10):
+        """Procesa lo que haya listo ahora mismo. Devuelve cuántos trabajos ejecutó."""
+        jobs = self.claim(worker_id or worker_name(), limit)
+        for job in jobs:
+            self.run_job(job)
+        return len(jobs)
+
+    def work(self, app, stop=None, poll_interval=2.0, batch=10):
+        """Bucle de un worker: duerme poll_interval cuando la cola está vacía."""
+        stop = stop or threading.Event()
+        worker_id = worker_name()
+        while not stop.is_set():
+            try:
+                with app.app_context():
+                    processed = self.run_pending(worker_id, batch)
+            except Exception as e:
+                print(f"⚠️ Worker de trabajos: {e}")
+                processed = 0
+            if not processed:
+                stop.wait(poll_interval)
+
+    def start_thread(self, app, poll_interval=2.0):
+        """Worker dentro del propio proceso web (despliegues de un solo servicio)."""
+        stop = threading.Event()
+        thread = threading.Thread(target=self.work, args=(app, stop, poll_interval),
+                                  name="job-worker", daemon=True)
+        thread.start()
+        return stop
+
+    def retry_dead(self, job_id):
+        job = self.model.query.get(job_id)
+        if not job or job.status != DEAD:
+            return False
+        job.status = PENDING
+        job.attempts = 0
+        job.run_at = datetime.utcnow()
+        job.finished_at = None
+        self.db.session.commit()
+        return True
+
+    def stats(self):
+        counts = dict(
+            self.db.session.query(self.model.status, func.count(self.model.id))
+            .group_by(self.model.status).all()
+        )
+        oldest = (
+            self.db.session.query(func.min(self.model.created_at))
+            .filter(self.model.status == PENDING).scalar()
+        )
+        return {
+            "pending": counts.get(PENDING, 0),
+            "running": counts.get(RUNNING, 0),
+            "done": counts.get(DONE, 0),
+            "dead": counts.get(DEAD, 0),
+            "oldest_pending_s": round((datetime.utcnow() - oldest).total_seconds(), 1) if oldest else 0.0,
+        }
@@ -0,0 +1,45 @@
+# lazy.py
+# ==========================================================================
+# CLIENTES PEREZOSOS: EL SDK SE IMPORTA Y SE CONSTRUYE EN EL PRIMER USO
+# ==========================================================================
+# google.genai, stripe y compañía suman cientos de ms al arranque. Con
+# LazyClient el módulo los declara igual que antes (client.models...,
+# stripe.checkout...) pero el import y la construcción ocurren la primera
+# vez que alguien toca un atributo, o antes si create_app() los precalienta.
+import threading
+import time
+
+
+class LazyClient:
+    """Delegado que construye el objeto real con 'factory' una sola vez (thread-safe)."""
+
+    def __init__(self, factory, name):
+        self._factory = factory
+        self._name = name
+        self._target = None
+        self._lock = threading.Lock()
+        self.build_seconds = None
+
+    @property
+    def ready(self):
+        return self._target is not None
+
+    def get(self):
+        target = self._target
+        if target is not None:
+            return target
+        with self._lock:
+            if self._target is None:
+                start = time.perf_counter()
+                self._target = self._factory()
+                self.build_seconds = time.perf_counter() - start
+                print(f"📦 {self._name} cargado en {self.build_seconds * 1000:.0f} ms")
+            return self._target
+
+    def __getattr__(self, attr):
+        # Solo llega aquí lo que no es del propio delegado (models, aio, checkout...)
+        return getattr(self.get(), attr)
+
+    def __repr__(self):
+        state = "listo" if self.ready else "sin cargar"
+        return f"<LazyClient {self._name} ({state})>"
@@ -0,0 +1,204 @@
+# maintenance.py
+# ==========================================================================
+# MANTENIMIENTO: BORRADORES ABANDONADOS, ÍNDICES Y TAMAÑO DE TABLAS
+# ==========================================================================
+# Los borradores sin pagar se acumulan en 'experiences'. Se purgan (o se
+# archivan en 'experiences_archive') por lotes pequeños, cada uno en su
+# propia transacción, así ninguna pasada bloquea la tabla mucho rato. Los
+# eventos crudos de 'player_events' se borran igual pasada su retención: los
+# informes leen 'player_level_stats', que se conserva.
+#
+#   flask --app app maintenance stats
+#   flask --app app maintenance purge --days 30 --batch 500 [--archive] [--dry-run]
+#   flask --app app maintenance purge-events --days 90 [--dry-run]
+#   flask --app app maintenance vacuum
+#   python worker.py --maintenance-every 24   # programado (ver schedule_purge)
+import threading
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import inspect, text
+
+TABLES = ("experiences", "experiences_archive", "conversations", "jobs", "player_events", "player_level_stats")
+
+
+def stale_drafts(model, cutoff, conversation=None):
+    """
+    Sin pagar y sin actividad desde 'cutoff': ni guardados (updated_at; las filas
+    anteriores a esa columna usan created_at), ni finalizados después (pueden
+    estar en el checkout), ni turnos de chat recientes si se pasa 'conversation'.
+    """
+    query = model.query.filter(
+        model.is_paid.is_(False),
+        (model.updated_at < cutoff) | (model.updated_at.is_(None) & (model.created_at < cutoff)),
+        (model.finalized_at.is_(None)) | (model.finalized_at < cutoff),
+    )
+    if conversation is not None:
+        recent = conversation.query.filter(conversation.game_id == model.id, conversation.updated_at >= cutoff)
+        query = query.filter(~recent.exists())
+    return query
+
+
+def purge_stale_drafts(db, models, days=30, batch_size=500, max_batches=None,
+                       archive=False, pause=0.05, dry_run=False):
+    """
+    Borra (o archiva y borra) los borradores sin actividad en 'days' días.
+    'models' = (Experience, Conversation, ArchivedExperience). Devuelve el
+    resumen: candidatos, borrados, archivados y lotes.
+    """
+    experience, conversation, archived = models
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    summary = {"cutoff": cutoff.isoformat(), "candidates": stale_drafts(experience, cutoff, conversation).count(),
+               "deleted": 0, "archived": 0, "batches": 0}
+    if dry_run:
+        return summary
+
+    while max_batches is None or summary["batches"] < max_batches:
+        rows = (stale_drafts(experience, cutoff, conversation)
+                .order_by(experience.created_at)
+                .limit(batch_size)
+                .all())
+        if not rows:
+            break
+        ids = [row.id for row in rows]
+        if archive:
+            db.session.add_all(archived(id=row.id, game_data=row.game_data, real_gift=row.real_gift,
+                                        created_at=row.created_at) for row in rows)
+            summary["archived"] += len(rows)
+        conversation.query.filter(conversation.game_id.in_(ids)).delete(synchronize_session=False)
+        # Se repite is_paid en el DELETE: un pago que llegue a mitad de lote se respeta
+        deleted = (experience.query
+                   .filter(experience.id.in_(ids), experience.is_paid.is_(False))
+                   .delete(synchronize_session=False))
+        db.session.commit()
+        db.session.expunge_all()
+        summary["deleted"] += deleted
+        summary["batches"] += 1
+        if len(rows) < batch_size:
+            break
+        time.sleep(pause)  # Deja respirar al resto de escrituras entre lotes
+    return summary
+
+
+def purge_old_events(db, event_model, days=90, batch_size=5000, max_batches=None, pause=0.05, dry_run=False):
+    """
+    Borra por lotes los eventos de telemetría de más de 'days' días (el
+    resumen por nivel ya los tiene sumados). Devuelve candidatos, borrados y lotes.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    old = event_model.query.filter(event_model.created_at < cutoff)
+    summary = {"cutoff": cutoff.isoformat(), "candidates": old.count(), "deleted": 0, "batches": 0}
+    if dry_run:
+        return summary
+
+    while max_batches is None or summary["batches"] < max_batches:
+        ids = [row.id for row in old.with_entities(event_model.id).order_by(event_model.id).limit(batch_size)]
+        if not ids:
+            break
+        deleted = event_model.query.filter(event_model.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        summary["deleted"] += deleted
+        summary["batches"] += 1
+        if len(ids) < batch_size:
+            break
+        time.sleep(pause)
+    return summary
+
+
+def table_sizes(db, tables=TABLES):
+    """Filas (y bytes en disco cuando el motor lo permite) de cada tabla."""
+    sizes = {}
+    postgres = db.engine.dialect.name == "postgresql"
+    with db.engine.connect() as conn:
+        existing = set(inspect(conn).get_table_names())
+        for table in tables:
+            if table not in existing:
+                continue
+            info = {"rows": conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()}
+            if postgres:
+                info["bytes"] = conn.execute(text("SELECT pg_total_relation_size(:t)"), {"t": table}).scalar()
+            sizes[table] = info
+        if db.engine.dialect.name == "sqlite":
+            pages = conn.execute(text("PRAGMA page_count")).scalar()
+            sizes["database_bytes"] = pages * conn.execute(text("PRAGMA page_size")).scalar()
+    return sizes
+
+
+def vacuum(db, tables=("experiences", "conversations", "player_events")):
+    """Devuelve al disco el espacio de las filas borradas (fuera de transacción)."""
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if db.engine.dialect.name == "postgresql":
+            for table in tables:
+                conn.execute(text(f"VACUUM (ANALYZE) {table}"))
+        else:
+            conn.execute(text("VACUUM"))
+
+
+def schedule_purge(app, job_queue, every_hours, stop, check_every=60):
+    """
+    Encola un 'purge_drafts' por ventana de 'every_hours'. La key de la ventana
+    hace que, con varios workers programando a la vez, solo se encole uno.
+    """
+    period = every_hours * 3600
+
+    def loop():
+        while not stop.is_set():
+            window = int(time.time() // period)
+            with app.app_context():
+                try:
+                    job_queue.enqueue("purge_drafts", {}, key=f"purge_drafts:{every_hours}h:{window}")
+                except Exception as e:
+                    print(f"⚠️ No se pudo programar la purga: {e}")
+            stop.wait(check_every)
+
+    thread = threading.Thread(target=loop, name="maintenance-scheduler", daemon=True)
+    thread.start()
+    return thread
+
+
+def register_commands(app, db, models, event_model=None, event_days=90):
+    """Añade el grupo 'flask maintenance ...' a la app."""
+    group = AppGroup("maintenance", help="Purga de borradores y estado de las tablas")
+
+    def show(title, sizes):
+        click.echo(title)
+        for table, info in sizes.items():
+            click.echo(f"  {table}: {info}")
+
+    @group.command("stats")
+    def stats_command():
+        show("📊 Tamaño de tablas", table_sizes(db))
+
+    @group.command("purge")
+    @click.option("--days", default=30, show_default=True, help="Antigüedad mínima del borrador")
+    @click.option("--batch", "batch_size", default=500, show_default=True)
+    @click.option("--max-batches", type=int, default=None)
+    @click.option("--archive", is_flag=True, help="Copiar a experiences_archive antes de borrar")
+    @click.option("--dry-run", is_flag=True, help="Solo contar candidatos")
+    def purge_command(days, batch_size, max_batches, archive, dry_run):
+        show("📊 Antes", table_sizes(db))
+        summary = purge_stale_drafts(db, models, days=days, batch_size=batch_size,
+                                     max_batches=max_batches, archive=archive, dry_run=dry_run)
+        click.echo(f"🧹 {summary}")
+        show("📊 Después", table_sizes(db))
+
+    @group.command("purge-events")
+    @click.option("--days", default=event_days, show_default=True, help="Retención de player_events")
+    @click.option("--batch", "batch_size", default=5000, show_default=True)
+    @click.option("--dry-run", is_flag=True, help="Solo contar candidatos")
+    def purge_events_command(days, batch_size, dry_run):
+        if event_model is None:
+            raise click.ClickException("La app no registra un modelo de eventos")
+        show("📊 Antes", table_sizes(db))
+        click.echo(f"🧹 {purge_old_events(db, event_model, days=days, batch_size=batch_size, dry_run=dry_run)}")
+        show("📊 Después", table_sizes(db))
+
+    @group.command("vacuum")
+    def vacuum_command():
+        show("📊 Antes", table_sizes(db))
+        vacuum(db)
+        show("📊 Después", table_sizes(db))
+
+    app.cli.add_command(group)
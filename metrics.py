@@ -0,0 +1,230 @@
+# metrics.py
+# ==========================================================================
+# MÉTRICAS INTERNAS EN PROCESO (HISTOGRAMAS, CONTADORES, FORMATO PROMETHEUS)
+# ==========================================================================
+# Cada proceso lleva sus propias métricas: con varios workers, Prometheus
+# las suma al agregar por instancia.
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Segundos: de una consulta a la BD (ms) a una generación completa de Gemini
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class Histogram:
+    """
+    Histograma acumulativo de buckets fijos (estilo Prometheus) + suma y máximo.
+    Barato de observar desde cualquier hilo; snapshot() lo serializa para /api/stats.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # el último es +Inf
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sum += value
+            self._max = max(self._max, value)
+
+    @property
+    def count(self):
+        return sum(self._counts)
+
+    def quantile(self, q):
+        """Aproximación por el límite superior del bucket que contiene el cuantil."""
+        with self._lock:
+            total = sum(self._counts)
+            if not total:
+                return 0.0
+            target, seen = q * total, 0
+            for bound, n in zip(self.buckets, self._counts):
+                seen += n
+                if seen >= target:
+                    return bound
+            return self._max
+
+    def snapshot(self):
+        with self._lock:
+            cumulative, seen = {}, 0
+            for bound, n in zip(self.buckets, self._counts):
+                seen += n
+                cumulative[str(bound)] = seen
+            total = seen + self._counts[-1]
+            cumulative["+Inf"] = total
+            return {
+                "count": total,
+                "sum": round(self._sum, 4),
+                "max": round(self._max, 4),
+                "buckets": cumulative,
+            }
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Family:
+    """Una métrica con etiquetas: un valor (o histograma) por combinación."""
+
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = sorted(self._children.items())
+        for key, child in children:
+            lines.extend(self._render_child(key, child))
+        return lines
+
+
+class Counter(_Family):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._children[key] = self._children.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._children.get(self._key(labels), 0)
+
+    def _render_child(self, key, value):
+        return [f"{self.name}{_labels(self.labels, key)} {value}"]
+
+
+class Collected(_Family):
+    """
+    Métrica cuyo valor vive en otro objeto (p. ej. el pool caliente): se lee
+    al renderizar. collect() devuelve pares (etiquetas, valor).
+    """
+
+    def __init__(self, name, help_text, collect, kind="gauge", labels=()):
+        super().__init__(name, help_text, labels)
+        self.kind = kind
+        self.collect = collect
+
+    def render(self):
+        children = {self._key(labels): value for labels, value in self.collect()}
+        with self._lock:
+            self._children = children
+        return super().render()
+
+    def _render_child(self, key, value):
+        return [f"{self.name}{_labels(self.labels, key)} {value}"]
+
+
+class HistogramVec(_Family):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS, labels=()):
+        super().__init__(name, help_text, labels)
+        self.buckets = buckets
+
+    def child(self, **labels):
+        key = self._key(labels)
+        with self._lock:
+            histogram = self._children.get(key)
+            if histogram is None:
+                histogram = self._children[key] = Histogram(self.buckets)
+        return histogram
+
+    def observe(self, value, **labels):
+        self.child(**labels).observe(value)
+
+    def _render_child(self, key, histogram):
+        snapshot = histogram.snapshot()
+        lines = [f"{self.name}_bucket{_labels(self.labels, key, [('le', le)])} {count}"
+                 for le, count in snapshot["buckets"].items()]
+        lines.append(f"{self.name}_sum{_labels(self.labels, key)} {snapshot['sum']}")
+        lines.append(f"{self.name}_count{_labels(self.labels, key)} {snapshot['count']}")
+        return lines
+
+
+class Registry:
+    """Conjunto de métricas que /metrics expone en formato texto de Prometheus."""
+
+    def __init__(self):
+        self.families = []
+
+    def counter(self, name, help_text, labels=()):
+        family = Counter(name, help_text, labels)
+        self.families.append(family)
+        return family
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS, labels=()):
+        family = HistogramVec(name, help_text, buckets, labels)
+        self.families.append(family)
+        return family
+
+    def collected(self, name, help_text, collect, kind="gauge", labels=()):
+        family = Collected(name, help_text, collect, kind, labels)
+        self.families.append(family)
+        return family
+
+    def render(self):
+        lines = []
+        for family in self.families:
+            lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def timed(histogram, errors=None, **labels):
+    """Cronometra el bloque en 'histogram'; si lanza una excepción la cuenta en 'errors'."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        if errors is not None:
+            errors.inc(**labels)
+        raise
+    finally:
+        histogram.observe(time.perf_counter() - start, **labels)
+
+
+def instrument_sqlalchemy(engine, histogram, errors=None, dependency="db"):
+    """Tiempo de cada sentencia SQL, etiquetado por verbo (SELECT, INSERT...)."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("dw_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["dw_query_start"].pop()
+        histogram.observe(time.perf_counter() - started, dependency=dependency, operation=_verb(statement))
+
+    @event.listens_for(engine, "handle_error")
+    def failed(context):
+        starts = context.connection.info.get("dw_query_start") if context.connection else None
+        if starts:
+            starts.pop()
+        if errors is not None:
+            errors.inc(dependency=dependency, operation=_verb(context.statement or ""))
+
+
+def _verb(statement):
+    parts = statement.lstrip().split(None, 1)
+    return parts[0].upper() if parts else "?"
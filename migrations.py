@@ -0,0 +1,84 @@
+# migrations.py
+# ==========================================================================
+# ESQUEMA: TABLAS NUEVAS + COLUMNAS E ÍNDICES AÑADIDOS A TABLAS EXISTENTES
+# ==========================================================================
+# db.create_all() crea las tablas que faltan pero no toca las que ya existen.
+# Las columnas e índices nuevos de tablas antiguas se listan aquí y se
+# añaden si la BD todavía no los tiene (idempotente, se puede repetir).
+#
+#   python migrations.py
+from sqlalchemy import inspect, text
+
+ADDED_COLUMNS = {
+    "experiences": {
+        "version": "INTEGER NOT NULL DEFAULT 1",
+        "content_hash": "VARCHAR(64)",
+        "checkout_session_id": "VARCHAR(255)",
+        "checkout_url": "TEXT",
+        "checkout_expires_at": "TIMESTAMP",
+        "checkout_key": "VARCHAR(64)",
+        "updated_at": "TIMESTAMP",
+    },
+    "conversations": {
+        "version": "INTEGER NOT NULL DEFAULT 1",
+    },
+}
+
+# nombre -> (tabla, columnas). En Postgres se crean CONCURRENTLY: sin bloquear escrituras
+ADDED_INDEXES = {
+    "ix_experiences_is_paid_created_at": ("experiences", ("is_paid", "created_at")),
+    "ix_experiences_is_paid_updated_at": ("experiences", ("is_paid", "updated_at")),
+    "ix_player_events_created_at": ("player_events", ("created_at",)),
+}
+
+
+def add_missing_columns(db):
+    """Añade las columnas de ADDED_COLUMNS que falten. Devuelve las añadidas."""
+    inspector = inspect(db.engine)
+    added = []
+    with db.engine.begin() as conn:
+        for table, columns in ADDED_COLUMNS.items():
+            if not inspector.has_table(table):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table)}
+            for name, ddl in columns.items():
+                if name not in existing:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+                    added.append(f"{table}.{name}")
+    return added
+
+
+def add_missing_indexes(db):
+    """Crea los índices de ADDED_INDEXES que falten. Devuelve los creados."""
+    inspector = inspect(db.engine)
+    postgres = db.engine.dialect.name == "postgresql"
+    created = []
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name, (table, columns) in ADDED_INDEXES.items():
+            if not inspector.has_table(table):
+                continue
+            if name in {index["name"] for index in inspector.get_indexes(table)}:
+                continue
+            concurrently = "CONCURRENTLY " if postgres else ""
+            conn.execute(text(f"CREATE INDEX {concurrently}IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"))
+            created.append(name)
+    return created
+
+
+def upgrade_schema(db):
+    db.create_all()
+    for column in add_missing_columns(db):
+        print(f"🧱 Columna añadida: {column}")
+    for index in add_missing_indexes(db):
+        print(f"🧱 Índice creado: {index}")
+
+
+if __name__ == "__main__":
+    import os
+
+    os.environ.setdefault("JOB_INLINE_WORKER", "0")
+    from app import app, db
+
+    with app.app_context():
+        upgrade_schema(db)
+    print("✅ Esquema al día")
@@ -0,0 +1,172 @@
+# notify.py
+# ==========================================================================
+# NOTIFICACIONES PUSH ENTRE PROCESOS (ESTADO DE PAGO)
+# ==========================================================================
+import asyncio
+import json
+import select
+import threading
+import time
+
+
+class MemoryBroker:
+    """
+    Broker en proceso: publish() despierta a quien espera en ese canal.
+    Recuerda el último mensaje de cada canal durante 'retention' segundos,
+    así quien se suscribe justo después de publicarse no se lo pierde.
+    Esperar no cuesta consultas a la BD.
+    """
+
+    def __init__(self, retention=600):
+        self.retention = retention
+        self._recent = {}
+        self._waiters = {}
+        self._lock = threading.Lock()
+        self.published = 0
+        self.delivered = 0
+
+    def publish(self, channel, data):
+        self._dispatch(channel, data)
+
+    def _dispatch(self, channel, data):
+        now = time.time()
+        with self._lock:
+            self.published += 1
+            self._recent[channel] = (now, data)
+            callbacks = self._waiters.pop(channel, [])
+            self._expire(now)
+        for callback in callbacks:
+            callback(data)
+
+    def _subscribe(self, channel, callback):
+        """Registra callback(data). Si hay un mensaje reciente lo devuelve en lugar de suscribir."""
+        with self._lock:
+            recent = self._recent.get(channel)
+            if recent and time.time() - recent[0] < self.retention:
+                return recent[1]
+            self._waiters.setdefault(channel, []).append(callback)
+        return None
+
+    def _unsubscribe(self, channel, callback):
+        with self._lock:
+            callbacks = self._waiters.get(channel, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+            if not callbacks:
+                self._waiters.pop(channel, None)
+
+    def wait(self, channel, timeout):
+        """Bloquea hasta que llegue un mensaje al canal (o timeout). Devuelve data o None."""
+        received = []
+        event = threading.Event()
+
+        def callback(data):
+            received.append(data)
+            event.set()
+
+        recent = self._subscribe(channel, callback)
+        if recent is not None:
+            return recent
+        if not event.wait(timeout):
+            self._unsubscribe(channel, callback)
+        return self._delivered(received)
+
+    async def wait_async(self, channel, timeout):
+        """Igual que wait() pero sin ocupar un hilo (ruta ASGI)."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def callback(data):
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(data))
+
+        recent = self._subscribe(channel, callback)
+        if recent is not None:
+            return recent
+        try:
+            data = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self._unsubscribe(channel, callback)
+        return self._delivered([data])
+
+    def _delivered(self, received):
+        if not received:
+            return None
+        with self._lock:
+            self.delivered += 1
+        return received[0]
+
+    def _expire(self, now):
+        for channel, (ts, _) in list(self._recent.items()):
+            if now - ts > self.retention:
+                del self._recent[channel]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": type(self).__name__,
+                "waiting": sum(len(callbacks) for callbacks in self._waiters.values()),
+                "published": self.published,
+                "delivered": self.delivered,
+            }
+
+
+class PostgresBroker(MemoryBroker):
+    """
+    Reparte las publicaciones entre procesos/nodos con LISTEN/NOTIFY.
+    Cada proceso mantiene una conexión LISTEN en un hilo de fondo que
+    reinyecta los mensajes en su broker local; las esperas siguen sin
+    consultar la BD.
+    """
+
+    def __init__(self, dsn, pg_channel="dw_events", retention=600):
+        super().__init__(retention)
+        self.dsn = dsn
+        self.pg_channel = pg_channel
+        self._thread = None
+
+    def start(self):
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._listen_forever, name="pg-listen", daemon=True)
+        self._thread.start()
+
+    def publish(self, channel, data):
+        import psycopg2
+
+        payload = json.dumps({"channel": channel, "data": data})
+        conn = psycopg2.connect(self.dsn)
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pg_notify(%s, %s)", (self.pg_channel, payload))
+        finally:
+            conn.close()
+
+    def _listen_forever(self):
+        while True:
+            try:
+                self._listen()
+            except Exception as e:
+                print(f"⚠️ LISTEN {self.pg_channel} caído, reconectando: {e}")
+                time.sleep(2)
+
+    def _listen(self):
+        import psycopg2
+
+        conn = psycopg2.connect(self.dsn)
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {self.pg_channel}")
+            while True:
+                if select.select([conn], [], [], 30) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    message = json.loads(notify.payload)
+                    self._dispatch(message["channel"], message["data"])
+        finally:
+            conn.close()
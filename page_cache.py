@@ -0,0 +1,160 @@
+# page_cache.py
+# ==========================================================================
+# CACHÉ DE PÁGINAS RENDERIZADAS (EXPERIENCIAS PAGADAS)
+# ==========================================================================
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+
+class CachedPage:
+    __slots__ = ("body", "etag", "last_modified", "render_seconds", "cached_at")
+
+    def __init__(self, body, etag, last_modified, render_seconds, cached_at=None):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.render_seconds = render_seconds
+        self.cached_at = cached_at or time.time()
+
+    def to_dict(self):
+        return {"body": self.body, "etag": self.etag, "last_modified": self.last_modified.timestamp(),
+                "render_seconds": self.render_seconds}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["body"], data["etag"],
+                   datetime.fromtimestamp(data["last_modified"], timezone.utc), data["render_seconds"])
+
+
+class DiskPageBackend:
+    """
+    Backend compartido entre workers del mismo nodo: un fichero JSON por página.
+    Escritura atómica (tmp + rename) para que ningún lector vea medio fichero.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{hashlib.sha256(key.encode('utf-8')).hexdigest()}.json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return CachedPage.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def set(self, key, page):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(page.to_dict(), f)
+        os.replace(tmp, self._path(key))
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class PageCache:
+    """
+    LRU en memoria de páginas ya renderizadas, con backend compartido
+    opcional detrás. 'ttl' acota cuánto puede servir un worker una entrada
+    que otro proceso ya invalidó. max_entries=0 desactiva la caché.
+    """
+
+    def __init__(self, max_entries=1000, ttl=300, backend=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.backend = backend
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.backend_hits = 0
+        self.not_modified = 0
+        self.invalidations = 0
+        self.render_seconds_saved = 0.0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            page = self._items.get(key)
+            if page and now - page.cached_at < self.ttl:
+                self._items.move_to_end(key)
+                self._hit(page)
+                return page
+            self._items.pop(key, None)
+
+        page = self.backend.get(key) if self.backend else None
+        with self._lock:
+            if page is None:
+                self.misses += 1
+                return None
+            self.backend_hits += 1
+            self._hit(page)
+        self._remember(key, page)
+        return page
+
+    def set(self, key, body, render_seconds):
+        """Guarda el HTML recién renderizado y devuelve la CachedPage (ETag = hash del cuerpo)."""
+        etag = hashlib.sha256(body.encode("utf-8")).hexdigest()[:32]
+        page = CachedPage(body, etag, datetime.now(timezone.utc).replace(microsecond=0), render_seconds)
+        if self.enabled:
+            self._remember(key, page)
+            if self.backend:
+                self.backend.set(key, page)
+        return page
+
+    def invalidate(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+            self.invalidations += 1
+        if self.backend:
+            self.backend.delete(key)
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def _hit(self, page):
+        self.hits += 1
+        self.render_seconds_saved += page.render_seconds
+
+    def _remember(self, key, page):
+        page.cached_at = time.time()
+        with self._lock:
+            self._items[key] = page
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "backend_hits": self.backend_hits,
+                "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+                "not_modified": self.not_modified,
+                "invalidations": self.invalidations,
+                "render_seconds_saved": round(self.render_seconds_saved, 3),
+                "size": len(self._items),
+                "max_entries": self.max_entries,
+            }
@@ -0,0 +1,145 @@
+# plantillas.py
+# ==========================================================================
+# REGISTRO EN MEMORIA DE static/plantillas (MANIFIESTO + ETAGS)
+# ==========================================================================
+# Las plantillas del creador se leían del disco en cada petición (/demo/default)
+# o se pedían una a una al hacer clic. El registro las carga y valida una vez,
+# las guarda ya serializadas en JSON compacto con su ETag y solo relee un
+# fichero si cambia su mtime o tamaño (se comprueba como mucho cada
+# 'check_interval' segundos). El manifiesto resume todas; con ?include=data
+# lleva además el contenido y el creador las precarga en una sola petición.
+import hashlib
+import json
+import os
+import threading
+import time
+
+from game_schema import validate_game
+
+
+class Plantilla:
+    __slots__ = ("name", "data", "body", "etag", "signature")
+
+    def __init__(self, name, data, body, signature):
+        self.name = name
+        self.data = data
+        self.body = body
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.signature = signature
+
+    def summary(self):
+        config = self.data.get("visual_config") or {}
+        intro = next((s for s in self.data["steps"] if s.get("type") == "intro"), {})
+        return {
+            "etag": self.etag,
+            "title": self.data.get("title") or intro.get("title"),
+            "theme_icon": config.get("theme_icon"),
+            "primary_color": config.get("primary_color"),
+            "levels": sum(1 for s in self.data["steps"] if s.get("type") != "intro"),
+            "bytes": len(self.body),
+        }
+
+
+class TemplateRegistry:
+    """
+    Plantillas de 'directory' indexadas por nombre (fichero sin .json).
+
+    Una plantilla que no pasa validate_game(strict=False) no se publica (se
+    avisa en el log); si ya estaba cargada se mantiene la versión anterior.
+    """
+
+    def __init__(self, directory, check_interval=2.0):
+        self.directory = directory
+        self.check_interval = check_interval
+        self._state = ({}, None)  # (plantillas, manifiesto): se sustituyen juntos
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.counters = {"loads": 0, "reloads": 0, "invalid": 0, "checks": 0}
+
+    def _signatures(self):
+        signatures = {}
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return signatures
+        for filename in names:
+            if not filename.endswith(".json"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, filename))
+            except FileNotFoundError:
+                continue
+            signatures[filename[:-5]] = (stat.st_mtime_ns, stat.st_size)
+        return signatures
+
+    def _read(self, name, signature):
+        path = os.path.join(self.directory, f"{name}.json")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Plantilla {name} ilegible: {e}")
+            return None
+        errors = validate_game(data, strict=False)
+        if errors:
+            print(f"⚠️ Plantilla {name} no válida: {'; '.join(errors[:3])}")
+            return None
+        body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        return Plantilla(name, data, body, signature)
+
+    def refresh(self, force=False):
+        """Relee lo que haya cambiado en disco. Devuelve True si el conjunto cambió."""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return False
+        with self._lock:
+            if not force and now - self._checked_at < self.check_interval:
+                return False
+            self._checked_at = now
+            self.counters["checks"] += 1
+            signatures = self._signatures()
+            items = dict(self._state[0])
+            changed = False
+            for name in set(items) - set(signatures):
+                del items[name]
+                changed = True
+            for name, signature in signatures.items():
+                current = items.get(name)
+                if current and current.signature == signature:
+                    continue
+                loaded = self._read(name, signature)
+                if loaded is None:
+                    self.counters["invalid"] += 1
+                    if current:
+                        current.signature = signature  # No reintentar hasta el próximo cambio
+                    continue
+                self.counters["reloads" if current else "loads"] += 1
+                items[name] = loaded
+                changed = True
+            if changed or self._state[1] is None:
+                self._state = (items, self._build_manifest(items))
+            return changed
+
+    @staticmethod
+    def _build_manifest(items):
+        templates = {name: items[name].summary() for name in sorted(items)}
+        version = hashlib.sha256(json.dumps(templates, sort_keys=True).encode("utf-8")).hexdigest()[:32]
+        return {"version": version, "templates": templates}
+
+    def get(self, name):
+        self.refresh()
+        return self._state[0].get(name)
+
+    def manifest(self):
+        self.refresh()
+        return self._state[1]
+
+    def bundle(self):
+        """Manifiesto con el contenido de cada plantilla (precarga en una petición)."""
+        self.refresh()
+        items, manifest = self._state
+        templates = {name: dict(summary, data=items[name].data) for name, summary in manifest["templates"].items()}
+        return {"version": manifest["version"], "templates": templates}
+
+    def stats(self):
+        return dict(self.counters, templates=len(self._state[0]))
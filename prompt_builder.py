@@ -0,0 +1,156 @@
+# prompt_builder.py
+# ==========================================================================
+# ENSAMBLADO DE PROMPTS CON PRESUPUESTO DE TOKENS + CACHÉ DE CONTEXTO GEMINI
+# ==========================================================================
+import json
+import threading
+import time
+
+
+# Aproximación barata (sin llamada a la API) para decidir cuándo compactar
+CHARS_PER_TOKEN = 4
+SUMMARY_ITEM_CHARS = 160
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def compact_json(data):
+    """JSON minificado: mismo contenido, bastantes menos tokens que json.dumps por defecto."""
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+class PromptAssembler:
+    """
+    Construye (contents, config) para cada llamada al modelo:
+
+    - El prompt de sistema (inmutable) se sube una vez como 'cached content'
+      y se reutiliza por nombre hasta que expira. Si la caché no está
+      disponible (prompt demasiado corto, cuota, modelo sin soporte...) se
+      envía como system_instruction normal.
+    - El JSON actual del juego viaja minificado en el último turno del usuario.
+    - Si el historial supera el presupuesto, los turnos antiguos se resumen
+      en un único turno y solo se conservan literales los más recientes.
+    """
+
+    def __init__(self, client, model, system_prompt, token_budget=4000,
+                 keep_recent=4, cache_ttl=3600, use_cache=True, retry_after=600):
+        self.client = client
+        self.model = model
+        self.system_prompt = system_prompt
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.cache_ttl = cache_ttl
+        self.use_cache = use_cache
+        self.retry_after = retry_after
+
+        self._cache_name = None
+        self._cache_expires = 0
+        self._cache_disabled_until = 0
+        self._cache_creating = False
+        self._lock = threading.Lock()
+        self.usage = {
+            "requests": 0,
+            "prompt_tokens": 0,
+            "cached_tokens": 0,
+            "output_tokens": 0,
+            "compactions": 0,
+        }
+
+    # --- CACHÉ DEL PROMPT DE SISTEMA ---
+    def system_cache_name(self):
+        """
+        Nombre del cached content vigente, creándolo si hace falta. None si no hay caché.
+
+        La creación (una llamada de red) va fuera del lock: solo un hilo la
+        hace (_cache_creating) y el resto sigue con la caché que aún no ha
+        expirado o, si no hay, con system_instruction.
+        """
+        if not self.use_cache:
+            return None
+        now = time.time()
+        with self._lock:
+            if self._cache_name and now < self._cache_expires - 60:
+                return self._cache_name
+            if self._cache_creating or now < self._cache_disabled_until:
+                return self._cache_name if now < self._cache_expires else None
+            self._cache_creating = True
+
+        try:
+            from google.genai import types  # SDK pesado: se importa en la primera llamada
+
+            cache = self.client.caches.create(
+                model=self.model,
+                config=types.CreateCachedContentConfig(
+                    system_instruction=self.system_prompt,
+                    ttl=f"{self.cache_ttl}s",
+                    display_name="dw-system-prompt",
+                ),
+            )
+        except Exception as e:
+            print(f"⚠️ Caché de contexto no disponible ({e}). Usando system_instruction.")
+            with self._lock:
+                self._cache_name = None
+                self._cache_disabled_until = now + self.retry_after
+                self._cache_creating = False
+            return None
+
+        with self._lock:
+            self._cache_name = cache.name
+            self._cache_expires = now + self.cache_ttl
+            self._cache_creating = False
+            return self._cache_name
+
+    # --- HISTORIAL ---
+    def compact_history(self, history):
+        """Devuelve el historial dentro del presupuesto, resumiendo los turnos antiguos."""
+        total = sum(estimate_tokens(m["content"]) for m in history)
+        if total <= self.token_budget or len(history) <= self.keep_recent:
+            return history
+
+        older, recent = history[:-self.keep_recent], history[-self.keep_recent:]
+        requests = [m["content"][:SUMMARY_ITEM_CHARS] for m in older if m["role"] == "user"]
+        summary = "RESUMEN DE PETICIONES ANTERIORES:\n" + "\n".join(f"- {r}" for r in requests)
+        self.usage["compactions"] += 1
+        return [
+            {"role": "user", "content": summary},
+            {"role": "assistant", "content": "Entendido, lo tengo en cuenta."},
+        ] + recent
+
+    # --- ENSAMBLADO ---
+    def build(self, user_message, current_json, history, temperature=0.7, **config_options):
+        from google.genai import types  # SDK pesado: se importa en la primera llamada
+
+        gemini_history = []
+        for msg in self.compact_history(history):
+            role = "model" if msg["role"] == "assistant" else "user"
+            gemini_history.append(types.Content(role=role, parts=[types.Part.from_text(text=msg["content"])]))
+
+        last_turn = types.Content(role="user", parts=[
+            types.Part.from_text(text=f"JSON ACTUAL:\n{compact_json(current_json)}"),
+            types.Part.from_text(text=user_message),
+        ])
+
+        cache_name = self.system_cache_name()
+        if cache_name:
+            config = types.GenerateContentConfig(cached_content=cache_name, temperature=temperature, **config_options)
+        else:
+            config = types.GenerateContentConfig(system_instruction=self.system_prompt, temperature=temperature, **config_options)
+        return gemini_history + [last_turn], config
+
+    # --- CONTABILIDAD DE TOKENS ---
+    def record_usage(self, usage_metadata):
+        """Acumula el usage_metadata de una respuesta y lo devuelve como dict."""
+        if usage_metadata is None:
+            return None
+        usage = {
+            "prompt_tokens": usage_metadata.prompt_token_count or 0,
+            "cached_tokens": usage_metadata.cached_content_token_count or 0,
+            "output_tokens": usage_metadata.candidates_token_count or 0,
+        }
+        with self._lock:
+            self.usage["requests"] += 1
+            for key, value in usage.items():
+                self.usage[key] += value
+        return usage
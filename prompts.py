@@ -1,4 +1,7 @@
 # prompts.py
+import hashlib
+
+from game_schema import ALLOWED_ICONS
 
 # --- BASE DEL SISTEMA (AI CREATIVE DIRECTOR) ---
 SYSTEM_BASE = """
@@ -13,7 +16,7 @@ FILOSOFÍA DE DISEÑO:
 REGLAS DE DISEÑO (VISUAL CONFIG):
 - Background: Colores oscuros (Dark Mode) con estética premium / glassmorphism.
 - Primary: Un color vibrante (Neon, Pastel brillante o Metalizado) que contraste.
-- Icons: FontAwesome 6 (ej: 'fa-brain', 'fa-compass', 'fa-vault', 'fa-microchip', 'fa-shuttle-space').
+- Icons: FontAwesome 6, SOLO uno de estos (los demás no se ven): """ + ", ".join(ALLOWED_ICONS) + """.
 - Fonts: 'Space Grotesk' (Moderno/Tech), 'Montserrat' (Clásico/Limpio), 'Lexend' (Lectura fácil), 'Playfair Display' (Lujo).
 
 LÓGICA DE ACTUALIZACIÓN (CRÍTICO):
@@ -41,7 +44,7 @@ ESQUEMA OBLIGATORIO DEL JSON:
     "primary_color": "Hex",
     "bg_color": "Hex oscuro",
     "font_family": "Nombre de la fuente",
-    "theme_icon": "Clase FontAwesome 6"
+    "theme_icon": "Uno de los iconos permitidos (ej: fa-brain)"
   },
   "title": "Un título elegante y breve",
   "steps": [
@@ -66,7 +69,45 @@ REGLAS DE ORO:
 - Respuestas: Evita caracteres especiales complejos para no frustrar la entrada en móvil.
 """
 
+# --- MODO AJUSTE (PARCHES SOBRE EL JSON ACTUAL) ---
+PATCH_PROMPT = MINI_ESCAPE_PROMPT + """
+MODO AJUSTE (PRIORITARIO SOBRE 'ESTRUCTURA DE RESPUESTA'):
+- Recibirás el JSON ACTUAL y una petición de ajuste. NO reescribas el juego entero.
+- Devuelve SOLO un objeto JSON con:
+  - "comment": comentario breve y agudo sobre el cambio (Markdown).
+  - "operations": lista mínima de operaciones JSON Patch (RFC 6902) sobre el JSON ACTUAL.
+- Cada operación: "op" ('add', 'remove' o 'replace'), "path" (JSON Pointer, ej: '/steps/3/question'
+  o '/visual_config/primary_color') y "value_json" (el nuevo valor serializado como JSON, ej: '"Hola"', '{"type": "level", ...}').
+- Cambia solo lo necesario: un nivel, un texto o un color suelen ser una o dos operaciones.
+- El resultado debe seguir cumpliendo el ESQUEMA OBLIGATORIO DEL JSON.
+"""
+
+# Esquema de respuesta del modo ajuste (response_schema de Gemini)
+PATCH_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "comment": {"type": "STRING"},
+        "operations": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "op": {"type": "STRING", "enum": ["add", "remove", "replace"]},
+                    "path": {"type": "STRING"},
+                    "value_json": {"type": "STRING"}
+                },
+                "required": ["op", "path"]
+            }
+        }
+    },
+    "required": ["comment", "operations"]
+}
+
+# --- VERSIÓN (invalida las generaciones cacheadas al editar cualquier prompt) ---
+PROMPT_VERSION = hashlib.sha256((MINI_ESCAPE_PROMPT + PATCH_PROMPT).encode("utf-8")).hexdigest()[:12]
+
 # --- MAPEO PARA EL APP.PY ---
 PRODUCT_PROMPTS = {
-    "mini_escape": MINI_ESCAPE_PROMPT
+    "mini_escape": MINI_ESCAPE_PROMPT,
+    "mini_escape_patch": PATCH_PROMPT
 }
\ No newline at end of file
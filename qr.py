@@ -0,0 +1,93 @@
+# qr.py
+# ==========================================================================
+# CÓDIGOS QR: RENDER ÚNICO, ALMACENADO Y DIRECCIONADO POR CONTENIDO
+# ==========================================================================
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+from sqlalchemy.exc import IntegrityError
+
+# Subir la versión invalida todos los QR guardados (cambio de estilo, bordes...)
+QR_VERSION = 1
+
+# Tamaño -> box_size (px por módulo). 'md' es el que siempre ha ido en el email.
+SIZES = {"sm": 4, "md": 10, "lg": 20}
+FORMATS = {"png": "image/png", "svg": "image/svg+xml"}
+
+
+def render_qr(url, fmt="png", size="md"):
+    """Dibuja el QR de 'url' y devuelve los bytes en el formato pedido."""
+    # qrcode (y PIL para PNG) solo se cargan la primera vez que hace falta un QR
+    import qrcode
+    import qrcode.image.svg
+
+    qr = qrcode.QRCode(version=1, box_size=SIZES[size], border=4)
+    qr.add_data(url)
+    qr.make(fit=True)
+
+    buffered = BytesIO()
+    if fmt == "svg":
+        qr.make_image(image_factory=qrcode.image.svg.SvgPathImage).save(buffered)
+    else:
+        qr.make_image(fill_color="black", back_color="white").save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def qr_key(url, fmt, size):
+    """Misma URL + formato + tamaño (+ versión de estilo) => mismo QR."""
+    raw = f"{QR_VERSION}|{fmt}|{size}|{url}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class QRStore:
+    """
+    Renderiza cada QR una sola vez y lo guarda en la tabla 'qr_codes'
+    (con una LRU pequeña en memoria delante). El ETag es el hash de los bytes.
+    """
+
+    def __init__(self, db, model, memory_entries=256):
+        self.db = db
+        self.model = model
+        self.memory_entries = memory_entries
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.renders = 0
+        self.hits = 0
+
+    def get(self, game_id, url, fmt="png", size="md"):
+        """Devuelve (bytes, etag), renderizando y guardando solo la primera vez."""
+        key = qr_key(url, fmt, size)
+        with self._lock:
+            item = self._items.get(key)
+            if item:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return item
+
+        row = self.model.query.get(key)
+        if row is None:
+            content = render_qr(url, fmt, size)
+            row = self.model(key=key, game_id=game_id, fmt=fmt, size=size, content=content,
+                             etag=hashlib.sha256(content).hexdigest()[:32])
+            self.db.session.add(row)
+            try:
+                self.db.session.commit()
+                self.renders += 1
+            except IntegrityError:
+                # Otra petición lo guardó a la vez: nos quedamos con el suyo
+                self.db.session.rollback()
+                row = self.model.query.get(key)
+        else:
+            self.hits += 1
+
+        item = (row.content, row.etag)
+        with self._lock:
+            self._items[key] = item
+            while len(self._items) > self.memory_entries:
+                self._items.popitem(last=False)
+        return item
+
+    def stats(self):
+        return {"renders": self.renders, "hits": self.hits, "memory": len(self._items)}
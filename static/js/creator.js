@@ -27,6 +27,7 @@ window.addEventListener('pageshow', (event) => {
 
 document.addEventListener('DOMContentLoaded', () => {
     setupEventListeners();
+    prefetchTemplates();
 });
 
 function setupEventListeners() {
@@ -58,20 +59,46 @@ window.showLocalLoader = function() {
                     <i class="fa-solid fa-circle-notch animate-spin text-4xl text-purple-500 relative z-10"></i>
                 </div>
                 <p class="text-[10px] font-black uppercase tracking-[0.3em] opacity-40">Ajustando la experiencia...</p>
+                <p id="stream-text" class="mt-6 text-sm opacity-70 leading-relaxed whitespace-pre-line"></p>
             </div>`;
     }
 };
 
 // --- LOGICA DE CARGA DE PLANTILLAS LOCALES ---
-async function loadLocalTemplate(filename) {
+// Todas las plantillas llegan en una sola petición al abrir el creador
+// (/api/plantillas?include=data, con ETag): el clic ya no toca la red.
+const templateCache = new Map();
+let templatePrefetch = null;
+
+function prefetchTemplates() {
+    templatePrefetch = fetch('/api/plantillas?include=data')
+        .then(response => response.ok ? response.json() : null)
+        .then(bundle => {
+            if (!bundle) return;
+            Object.entries(bundle.templates).forEach(([name, entry]) => templateCache.set(name, entry));
+        })
+        .catch(e => console.warn("Precarga de plantillas fallida:", e));
+    return templatePrefetch;
+}
+
+async function getTemplate(name) {
+    if (!templateCache.has(name) && templatePrefetch) await templatePrefetch;
+    const cached = templateCache.get(name);
+    if (cached) return structuredClone(cached.data); // Copia: el creador la edita
+
+    // Sin precarga (red lenta o fallida): la plantilla sola, cacheable por ETag
+    const response = await fetch(`/api/plantillas/${encodeURIComponent(name)}`);
+    if (!response.ok) throw new Error("No se pudo cargar la plantilla local");
+    return response.json();
+}
+
+async function loadLocalTemplate(name) {
     window.hideModal('initial-modal');
-    window.showLocalLoader(); // Loader local mientras carga el JSON
+    const cached = templateCache.has(name);
+    if (!cached) window.showLocalLoader(); // Loader solo si hay que esperar a la red
 
     try {
-        const response = await fetch(`/static/plantillas/${filename}`);
-        if (!response.ok) throw new Error("No se pudo cargar la plantilla local");
-        
-        const data = await response.json();
+        const data = await getTemplate(name);
         window.gamedata = data;
         
         // Ejecución inmediata
@@ -86,72 +113,204 @@ async function loadLocalTemplate(filename) {
 }
 
 // 3. GENERACIÓN POR IA / PRESETS
-async function executeGeneration(prompt) {
-    window.hideModal('initial-modal');
-    window.showLocalLoader(); // Loader local para IA
+// Consume /chat/stream (Server-Sent Events): la prosa aparece según llega
+// y el nuevo JSON se aplica en cuanto el servidor lo valida.
+// Lector genérico de Server-Sent Events sobre fetch (POST), evento a evento
+async function readSSE(response, onEvent) {
+    if (!response.ok || !response.body) throw new Error(`HTTP ${response.status}`);
 
-    try {
-        const response = await fetch('/chat', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ message: prompt, current_json: window.gamedata })
-        });
-        const data = await response.json();
-        if (data.new_json) {
-            window.gamedata = data.new_json;
-            window.initPlaytest();
-            window.saveSilent();
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let sep;
+        while ((sep = buffer.indexOf('\n\n')) !== -1) {
+            const raw = buffer.slice(0, sep);
+            buffer = buffer.slice(sep + 2);
+
+            let event = 'message', data = '';
+            raw.split('\n').forEach(line => {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) data += line.slice(5).trim();
+            });
+            if (onEvent(event, data ? JSON.parse(data) : {}) === false) {
+                reader.cancel();
+                return;
+            }
+        }
+    }
+}
+
+async function streamChat(message, onText, mode, retries = 2) {
+    const response = await fetch('/chat/stream', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ message: message, current_json: window.gamedata, mode: mode || 'full' })
+    });
+
+    // Servidor saturado (429): esperamos lo que indique Retry-After y reintentamos
+    if (response.status === 429 && retries > 0) {
+        const wait = parseInt(response.headers.get('Retry-After') || '2', 10);
+        onText("Mucha demanda ahora mismo, reintentando...");
+        await new Promise(resolve => setTimeout(resolve, wait * 1000));
+        return streamChat(message, onText, mode, retries - 1);
+    }
+
+    let prose = "";
+    let newJson = null;
+    await readSSE(response, (event, payload) => {
+        if (event === 'delta') {
+            prose += payload.text;
+            onText(prose);
+        } else if (event === 'json') {
+            newJson = payload.new_json;
+            markSaved(newJson, payload.version); // El servidor ya lo ha guardado
+        } else if (event === 'error') {
+            throw new Error(payload.reply);
         }
+    });
+    return newJson;
+}
+
+window.showStreamingText = function(text) {
+    const el = document.getElementById('stream-text');
+    if (el) el.textContent = text;
+};
+
+async function runChat(message, mode) {
+    try {
+        const newJson = await streamChat(message, window.showStreamingText, mode);
+        if (newJson) window.gamedata = newJson;
     } catch (e) {
         console.error("AI Error:", e);
-        window.initPlaytest(); // Revertir a estado estable si falla
     }
+    window.initPlaytest(); // Estado nuevo o, si falla, el último estable
+}
+
+async function executeGeneration(prompt) {
+    window.hideModal('initial-modal');
+    window.showLocalLoader(); // Loader local para IA
+    await runChat(prompt);
 }
 
 window.generatePreset = function(presetKey) { 
-    const templateMap = {
-        'adivinanzas': 'adivinanzas.json',
-        'logica': 'logica.json',
-        'escape': 'escape.json',
-        'detective': 'detective.json'
-    };
+    const localTemplates = ['adivinanzas', 'logica', 'escape', 'detective'];
 
-    if (templateMap[presetKey]) {
-        loadLocalTemplate(templateMap[presetKey]);
+    if (localTemplates.includes(presetKey)) {
+        loadLocalTemplate(presetKey);
     } else {
         executeGeneration(presetKey); 
     }
 };
 
-window.generateInitialGame = function() {
+// --- VARIANTES EN PARALELO (CANDIDATOS LADO A LADO) ---
+window.variantBatchId = null;
+
+window.generateVariants = async function() {
     const idea = document.getElementById('user-idea')?.value.trim();
-    if (idea) executeGeneration(idea);
+    if (!idea) return;
+
+    window.hideModal('initial-modal');
+    window.showModal('variants-panel');
+    const grid = document.getElementById('variants-grid');
+    grid.innerHTML = [0, 1, 2].map(i => `
+        <div id="variant-${i}" class="glass-card p-6 rounded-3xl flex flex-col items-center justify-center min-h-[220px] text-center">
+            <i class="fa-solid fa-circle-notch animate-spin text-2xl text-purple-500"></i>
+        </div>`).join('');
+
+    try {
+        const response = await fetch('/chat/variants', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ message: idea, current_json: window.gamedata, n: 3 })
+        });
+        await readSSE(response, (event, payload) => {
+            if (event === 'batch') {
+                window.variantBatchId = payload.batch_id;
+            } else if (event === 'variant') {
+                renderVariantCard(payload.index, payload.new_json);
+            } else if (event === 'variant_error') {
+                const card = document.getElementById(`variant-${payload.index}`);
+                if (card) card.innerHTML = '<p class="text-[10px] uppercase opacity-50">No disponible</p>';
+            }
+            // Si ya se eligió una variante dejamos de escuchar
+            return window.variantBatchId !== null;
+        });
+    } catch (e) {
+        console.error("Error en variantes:", e);
+        window.hideModal('variants-panel');
+        window.showModal('initial-modal');
+    }
 };
 
-// --- LOGICA DE REFINAMIENTO (AJUSTES) ---
-window.refine = async function(adjustment) {
-    window.hideModal('refinement-panel');
-    window.showLocalLoader(); // Loader local activado para ajustes
+// El texto viene del modelo: se pone con textContent, nunca como HTML
+function renderVariantCard(index, game) {
+    const card = document.getElementById(`variant-${index}`);
+    if (!card) return;
+    const config = game.visual_config || {};
+    const firstLevel = (game.steps || []).find(s => s.type !== 'intro');
+    const color = /^#[0-9A-Fa-f]{6}$/.test(config.primary_color || '') ? config.primary_color : '';
+    const element = (tag, className, text) => {
+        const node = document.createElement(tag);
+        node.className = className;
+        if (text) node.textContent = text;
+        return node;
+    };
+
+    const icon = element('i', `fa-solid ${/^fa-[a-z0-9-]+$/.test(config.theme_icon || '') ? config.theme_icon : 'fa-star'} text-2xl mb-3`);
+    icon.style.color = color;
+    const button = element('button', 'mt-auto w-full py-3 rounded-2xl text-[10px] font-black uppercase tracking-widest text-white', 'Elegir esta');
+    button.style.backgroundColor = color;
+    button.addEventListener('click', () => window.chooseVariant(index));
+
+    card.style.borderColor = color;
+    card.replaceChildren(
+        icon,
+        element('h3', 'font-black text-white mb-2', game.title || ''),
+        element('p', 'text-xs opacity-60 mb-5', firstLevel ? String(firstLevel.question || '') : ''),
+        button,
+    );
+}
+
+window.chooseVariant = async function(index) {
+    const batchId = window.variantBatchId;
+    window.variantBatchId = null; // Corta la escucha del stream
+    window.hideModal('variants-panel');
+    window.showLocalLoader();
 
     try {
-        const response = await fetch('/chat', {
+        const response = await fetch(`/chat/variants/${batchId}/choose`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ 
-                message: `AJUSTE: ${adjustment}`, 
-                current_json: window.gamedata 
-            })
+            body: JSON.stringify({ index: index })
         });
         const data = await response.json();
         if (data.new_json) {
             window.gamedata = data.new_json;
-            window.initPlaytest();
-            window.saveSilent();
+            markSaved(data.new_json, data.version);
         }
     } catch (e) {
-        console.error("Error en refinamiento:", e);
-        window.initPlaytest();
+        console.error("Error eligiendo variante:", e);
     }
+    window.initPlaytest();
+};
+
+window.generateInitialGame = function() {
+    const idea = document.getElementById('user-idea')?.value.trim();
+    if (idea) executeGeneration(idea);
+};
+
+// --- LOGICA DE REFINAMIENTO (AJUSTES) ---
+window.refine = async function(adjustment) {
+    window.hideModal('refinement-panel');
+    window.showLocalLoader(); // Loader local activado para ajustes
+    // Modo 'patch': el servidor solo pide al modelo los cambios sobre el JSON actual
+    await runChat(`AJUSTE: ${adjustment}`, 'patch');
 };
 
 window.refineCustom = function() {
@@ -249,14 +408,105 @@ function hexToRgb(hex) {
 }
 
 // 6. PERSISTENCIA
-window.saveSilent = function() {
-    fetch('/save_experience', {
+// Autosave agrupado: los cambios se acumulan unos instantes y se envían como
+// JSON Patch (solo los pasos / claves que cambiaron) sobre la última versión
+// confirmada por el servidor. Sin diferencias no hay petición.
+const SAVE_DELAY_MS = 800;
+window.gameVersion = window.serverVersion ?? null;
+let savedState = clone(window.gamedata);
+let saveTimer = null;
+let saveChain = Promise.resolve();
+
+function clone(value) { return JSON.parse(JSON.stringify(value ?? {})); }
+function same(a, b) { return JSON.stringify(a) === JSON.stringify(b); }
+function pointer(key) { return '/' + String(key).replace(/~/g, '~0').replace(/\//g, '~1'); }
+
+function markSaved(data, version) {
+    savedState = clone(data);
+    if (version != null) window.gameVersion = version;
+}
+
+function diffGameData(base, current) {
+    const ops = [];
+    const stepLists = Array.isArray(base.steps) && Array.isArray(current.steps);
+    new Set([...Object.keys(base), ...Object.keys(current)]).forEach(key => {
+        if (key === 'steps' && stepLists) return;
+        if (!(key in current)) ops.push({ op: 'remove', path: pointer(key) });
+        else if (!(key in base)) ops.push({ op: 'add', path: pointer(key), value: current[key] });
+        else if (!same(base[key], current[key])) ops.push({ op: 'replace', path: pointer(key), value: current[key] });
+    });
+    if (stepLists) {
+        const before = base.steps, after = current.steps;
+        for (let i = 0; i < Math.min(before.length, after.length); i++) {
+            if (!same(before[i], after[i])) ops.push({ op: 'replace', path: `/steps/${i}`, value: after[i] });
+        }
+        for (let i = before.length; i < after.length; i++) ops.push({ op: 'add', path: '/steps/-', value: after[i] });
+        for (let i = before.length - 1; i >= after.length; i--) ops.push({ op: 'remove', path: `/steps/${i}` });
+    }
+    return ops;
+}
+
+// Solo entiende las rutas que genera diffGameData ('/clave', '/steps/i', '/steps/-')
+function applyOps(doc, ops) {
+    ops.forEach(({ op, path, value }) => {
+        const parts = path.slice(1).split('/').map(p => p.replace(/~1/g, '/').replace(/~0/g, '~'));
+        const parent = parts.length === 2 ? (doc.steps = doc.steps || []) : doc;
+        const key = parts[parts.length - 1];
+        if (op === 'remove') Array.isArray(parent) ? parent.splice(Number(key), 1) : delete parent[key];
+        else if (key === '-') parent.push(value);
+        else parent[key] = value;
+    });
+    return doc;
+}
+
+async function sendSave(extra, keepalive, retried = false) {
+    const ops = diffGameData(savedState, window.gamedata);
+    if (!ops.length && !Object.keys(extra).length) return;
+
+    const snapshot = clone(window.gamedata);
+    const response = await fetch('/save_experience', {
         method: 'POST',
+        keepalive: keepalive,
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ game_data: window.gamedata })
+        body: JSON.stringify({ patch: ops, base_version: window.gameVersion, ...extra })
     });
+    const data = await response.json();
+
+    if (response.status === 409 && data.conflict) {
+        // Alguien escribió antes (otra pestaña, una generación): reaplicamos nuestros
+        // cambios sobre su versión si los índices de los pasos siguen valiendo
+        const server = data.game_data || {};
+        const compatible = (server.steps || []).length === (savedState.steps || []).length;
+        window.gamedata = compatible ? applyOps(clone(server), ops) : server;
+        markSaved(server, data.version);
+        window.initPlaytest();
+        if (!retried) return sendSave(extra, keepalive, true);
+        return;
+    }
+    if (!response.ok) throw new Error(`HTTP ${response.status}`);
+    markSaved(snapshot, data.version);
+}
+
+// Una escritura a la vez; 'extra' viaja junto al parche (p. ej. real_gift)
+window.flushSave = function(extra = {}, keepalive = false) {
+    clearTimeout(saveTimer);
+    saveTimer = null;
+    const run = saveChain.then(() => sendSave(extra, keepalive));
+    saveChain = run.catch(e => console.error("Error guardando:", e));
+    return run;
 };
 
+window.saveSilent = function() {
+    clearTimeout(saveTimer);
+    saveTimer = setTimeout(() => window.flushSave(), SAVE_DELAY_MS);
+};
+
+// Si se cierra la pestaña con un guardado pendiente, se envía ya (keepalive)
+window.addEventListener('pagehide', () => { if (saveTimer) window.flushSave({}, true); });
+document.addEventListener('visibilitychange', () => {
+    if (document.visibilityState === 'hidden' && saveTimer) window.flushSave({}, true);
+});
+
 window.openRefinement = () => window.showModal('refinement-panel');
 window.closeRefinement = () => window.hideModal('refinement-panel');
 window.openGiftModal = () => window.showModal('gift-modal');
@@ -269,11 +519,7 @@ window.confirmFinalize = async function() {
 
     window.showLocalLoader(); // Loader local también para el guardado final
     try {
-        await fetch('/save_experience', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ game_data: window.gamedata, real_gift: gift })
-        });
+        await window.flushSave({ real_gift: gift });
         window.location.href = `/demo/${window.currentGameId}`;
     } catch (e) {
         console.error("Error al finalizar");
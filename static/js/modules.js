@@ -2,12 +2,13 @@
  * Lógica de Módulos y Minijuegos para Digital Wrap
  */
 
+// 'template': plantilla del registro (/api/plantillas) de la que sale el nivel de ejemplo
 const MODULE_CONFIG = {
-    'quiz': { name: 'Quiz Rápido', plan: 'quiz', icon: 'fa-question-circle', desc: 'Preguntas de respuesta directa.' },
-    'adivinanza': { name: 'Adivinanza', plan: 'quiz', icon: 'fa-brain', desc: 'Acertijos clásicos con pista.' },
+    'quiz': { name: 'Quiz Rápido', plan: 'quiz', icon: 'fa-question-circle', desc: 'Preguntas de respuesta directa.', template: 'logica' },
+    'adivinanza': { name: 'Adivinanza', plan: 'quiz', icon: 'fa-brain', desc: 'Acertijos clásicos con pista.', template: 'adivinanzas' },
     'sudoku': { name: 'Mini Sudoku', plan: 'gymkhana', icon: 'fa-table-cells', desc: 'Tablero 4x4 interactivo.' },
     'queens': { name: 'Reinas Ajedrez', plan: 'gymkhana', icon: 'fa-chess-queen', desc: 'Reto de lógica en tablero.' },
-    'escape': { name: 'Mini Escape', plan: 'escape', icon: 'fa-key', desc: 'Desafío de códigos y pistas.' }
+    'escape': { name: 'Mini Escape', plan: 'escape', icon: 'fa-key', desc: 'Desafío de códigos y pistas.', template: 'escape' }
 };
 
 const PLAN_RANK = { 'quiz': 1, 'gymkhana': 2, 'escape': 3 };
@@ -74,10 +75,13 @@ async function applyModule(moduleType) {
     }
 
     try {
-        const response = await fetch(`/static/js/plantillas/${moduleType}.json`);
+        if (!config.template) throw new Error("Módulo sin plantilla");
+        const response = await fetch(`/api/plantillas/${config.template}`);
         if (!response.ok) throw new Error("Plantilla no encontrada");
-        
-        const templateData = await response.json();
+
+        // Las plantillas son juegos completos: el módulo toma su primer nivel
+        const plantilla = await response.json();
+        const templateData = plantilla.steps.find(step => step.type !== 'intro');
         
         // Inyectar en el estado global (que vive en creator.js)
         currentGamedata.steps[activeLevel] = {
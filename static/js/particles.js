@@ -1,18 +1,299 @@
 /**
  * DIGITAL WRAP - PARTICLE ENGINE
  * Genera efectos visuales dinámicos según el tema.
+ *
+ * Pensado para el móvil del destinatario (batería):
+ * - Color y fuente del tema se leen una vez por cambio de tema, nunca por frame.
+ * - Cada glifo se pre-renderiza en un atlas de sprites: el frame solo hace drawImage.
+ * - Partículas en arrays tipados: el bucle de frame no crea objetos.
+ * - El nº de partículas se adapta al tiempo de frame medido y al devicePixelRatio.
+ * - Se pausa con la pestaña oculta y respeta prefers-reduced-motion.
+ * - Opcional: todo corre en un Worker con OffscreenCanvas (new ParticleEngine({ worker: true })).
+ *
+ * Banco de pruebas: bench/particles.html
  */
 
-class ParticleEngine {
+const PARTICLE_THEMES = {
+    'theme-default': { glyphs: ['•'], font: 'serif', count: 40 },
+    'theme-navidad': { glyphs: ['❄'], font: 'serif', count: 40 },
+    'theme-san-valentin': { glyphs: ['❤'], font: 'serif', count: 40 },
+    'theme-cumpleanos': { glyphs: ['✨'], font: 'serif', count: 40 },
+    // El tema hacker usa un tamaño fijo de 14px
+    'theme-hacker': { glyphs: ['0', '1'], font: 'monospace', count: 50, fixedSize: 14 },
+};
+
+const PARTICLE_LIMITS = {
+    capacity: 160,      // Tope absoluto (tamaño de los arrays tipados)
+    minCount: 8,        // Nunca por debajo (el efecto deja de verse)
+    maxDpr: 2,          // Más resolución no se aprecia y cuadruplica el relleno
+    targetFrameMs: 1000 / 60,
+    sizeBuckets: 4,     // Tamaños distintos de sprite por glifo
+    statsEveryMs: 500,
+};
+
+/**
+ * Atlas de sprites: cada (glifo, tamaño) se dibuja una vez con el color y la
+ * fuente del tema. Se rehace solo al cambiar tema, color o dpr.
+ */
+class GlyphAtlas {
     constructor() {
+        this.canvas = null;
+        this.sprites = [];  // [glifo][bucket] -> { sx, sy, w, h }
+    }
+
+    build(glyphs, sizes, font, color, dpr) {
+        const pad = 2;
+        let width = 0;
+        let height = 0;
+        sizes.forEach(size => {
+            const cell = Math.ceil(size * 1.4 * dpr) + pad * 2;
+            width += cell;
+            height = Math.max(height, cell);
+        });
+        this.canvas = createCanvas(Math.max(1, width), Math.max(1, height * glyphs.length));
+        const ctx = this.canvas.getContext('2d');
+        ctx.fillStyle = color;
+        ctx.textBaseline = 'middle';
+        ctx.textAlign = 'center';
+
+        this.sprites = glyphs.map((glyph, row) => {
+            let x = 0;
+            return sizes.map(size => {
+                const cell = Math.ceil(size * 1.4 * dpr) + pad * 2;
+                ctx.font = `${Math.round(size * dpr)}px ${font}`;
+                ctx.fillText(glyph, x + cell / 2, row * height + cell / 2);
+                const sprite = { sx: x, sy: row * height, w: cell, h: cell };
+                x += cell;
+                return sprite;
+            });
+        });
+    }
+}
+
+/**
+ * Simulación sin DOM (sirve igual en el hilo principal y en el Worker).
+ */
+class ParticleSystem {
+    constructor(capacity = PARTICLE_LIMITS.capacity) {
+        this.capacity = capacity;
+        this.x = new Float32Array(capacity);
+        this.y = new Float32Array(capacity);
+        this.vx = new Float32Array(capacity);
+        this.vy = new Float32Array(capacity);
+        this.alpha = new Float32Array(capacity);
+        this.glyph = new Uint8Array(capacity);
+        this.bucket = new Uint8Array(capacity);
+        this.active = 0;
+        this.width = 0;
+        this.height = 0;
+    }
+
+    resize(width, height) {
+        this.width = width;
+        this.height = height;
+    }
+
+    // Se inicializa toda la capacidad: crecer después es solo subir 'active'
+    seed(glyphCount) {
+        for (let i = 0; i < this.capacity; i++) {
+            this.x[i] = Math.random() * this.width;
+            this.y[i] = Math.random() * this.height;
+            this.vy[i] = Math.random() * 1 + 0.5;
+            this.vx[i] = (Math.random() - 0.5) * 0.5;
+            this.alpha[i] = Math.random() * 0.5 + 0.2;
+            this.glyph[i] = Math.floor(Math.random() * glyphCount);
+            this.bucket[i] = Math.floor(Math.random() * PARTICLE_LIMITS.sizeBuckets);
+        }
+    }
+
+    // 'k' = frames de 60 Hz transcurridos: misma velocidad en pantallas de 120 Hz
+    step(k) {
+        const { x, y, vx, vy, width, height } = this;
+        for (let i = 0; i < this.active; i++) {
+            y[i] += vy[i] * k;
+            x[i] += vx[i] * k;
+            if (y[i] > height) y[i] = -20;
+            if (x[i] > width) x[i] = 0;
+            else if (x[i] < 0) x[i] = width;
+        }
+    }
+
+    render(ctx, atlas, dpr) {
+        const { x, y, alpha, glyph, bucket } = this;
+        const image = atlas.canvas;
+        const sprites = atlas.sprites;
+        for (let i = 0; i < this.active; i++) {
+            const s = sprites[glyph[i]][bucket[i]];
+            ctx.globalAlpha = alpha[i];
+            ctx.drawImage(image, s.sx, s.sy, s.w, s.h, x[i] * dpr - s.w / 2, y[i] * dpr - s.h / 2, s.w, s.h);
+        }
+        ctx.globalAlpha = 1;
+    }
+}
+
+/**
+ * Bucle de dibujo + control adaptativo. No toca el DOM: recibe un canvas
+ * (normal u OffscreenCanvas) y los datos del tema ya resueltos.
+ */
+class ParticleRenderer {
+    constructor(canvas, onStats) {
+        this.canvas = canvas;
+        this.ctx = canvas.getContext('2d');
+        this.system = new ParticleSystem();
+        this.atlas = new GlyphAtlas();
+        this.onStats = onStats || (() => {});
+        this.style = { theme: null, color: '#ffffff' };  // Sin tema no hay partículas
+        this.dpr = 1;
+        this.scale = 1;           // Multiplicador de cantidad (banco de pruebas)
+        this.target = 0;          // Partículas que pide el tema (ajustado a pantalla)
+        this.running = false;
+        this.reducedMotion = false;
+        this.frameMs = PARTICLE_LIMITS.targetFrameMs;   // Media móvil entre frames
+        this.workMs = 0;          // Media móvil del coste de step + render
+        this.last = 0;
+        this.lastStats = 0;
+        this.handle = null;
+        this.tick = this.tick.bind(this);
+    }
+
+    configure({ width, height, dpr, theme, color, reducedMotion, scale }) {
+        if (reducedMotion !== undefined) this.reducedMotion = reducedMotion;
+        if (scale && scale !== this.scale) {
+            this.scale = scale;
+            const { width: w, height: h } = this.system;
+            this.system = new ParticleSystem(Math.ceil(PARTICLE_LIMITS.capacity * Math.max(1, scale)));
+            this.system.resize(w, h);
+            this.target = 0;  // Fuerza la siembra de los nuevos arrays
+        }
+        const themeChanged = theme && theme !== this.style.theme;
+        const restyle = themeChanged || (color && color !== this.style.color) || (dpr && dpr !== this.dpr);
+        if (theme) this.style.theme = theme;
+        if (color) this.style.color = color;
+        if (dpr) this.dpr = Math.min(dpr, PARTICLE_LIMITS.maxDpr);
+        if (width && height) {
+            this.canvas.width = Math.round(width * this.dpr);
+            this.canvas.height = Math.round(height * this.dpr);
+            this.system.resize(width, height);
+        }
+
+        if (!this.style.theme) return;
+        const config = PARTICLE_THEMES[this.style.theme] || PARTICLE_THEMES['theme-default'];
+        if (restyle || !this.atlas.canvas) {
+            this.atlas.build(config.glyphs, this.sizesFor(config), config.font, this.style.color, this.dpr);
+        }
+        const reseed = themeChanged || !this.target;
+        if (reseed) {
+            this.system.seed(config.glyphs.length);
+        }
+        this.target = this.initialCount(config);
+        this.system.active = reseed ? this.target : Math.min(this.system.active, this.target);
+        if (this.reducedMotion) this.drawStatic();
+    }
+
+    sizesFor(config) {
+        // Original: tamaño 2..7 dibujado a x3. Se cuantiza en pocos sprites
+        const buckets = PARTICLE_LIMITS.sizeBuckets;
+        return Array.from({ length: buckets }, (_, i) =>
+            config.fixedSize || Math.round((2 + (5 * (i + 0.5)) / buckets) * 3));
+    }
+
+    // Más píxeles por partícula cuesta más: menos partículas en pantallas densas o pequeñas
+    initialCount(config) {
+        const area = (this.system.width * this.system.height) / (1280 * 800);
+        const densityFactor = this.dpr > 1.5 ? 0.75 : 1;
+        const count = Math.round(config.count * this.scale * Math.min(1.5, Math.max(0.5, area)) * densityFactor);
+        return Math.max(PARTICLE_LIMITS.minCount, Math.min(this.system.capacity, count));
+    }
+
+    start() {
+        if (this.running || this.reducedMotion || !this.target) return;
+        this.running = true;
+        this.last = 0;
+        this.handle = requestFrame(this.tick);
+    }
+
+    stop() {
+        this.running = false;
+        if (this.handle !== null) cancelFrame(this.handle);
+        this.handle = null;
+    }
+
+    tick(now) {
+        if (!this.running) return;
+        const started = nowMs();
+        if (this.last) {
+            const interval = now - this.last;
+            this.frameMs += (interval - this.frameMs) * 0.1;
+            this.adapt();
+            const k = Math.min(interval / PARTICLE_LIMITS.targetFrameMs, 3);
+            this.system.step(k);
+        }
+        this.last = now;
+        this.draw();
+        this.workMs += (nowMs() - started - this.workMs) * 0.1;
+
+        if (now - this.lastStats > PARTICLE_LIMITS.statsEveryMs) {
+            this.lastStats = now;
+            this.onStats(this.stats());
+        }
+        this.handle = requestFrame(this.tick);
+    }
+
+    // Frames lentos -> fuera un 15%. Holgura clara -> vuelta gradual hasta 'target'
+    adapt() {
+        const budget = PARTICLE_LIMITS.targetFrameMs;
+        const system = this.system;
+        if (this.frameMs > budget * 1.25 && system.active > PARTICLE_LIMITS.minCount) {
+            system.active = Math.max(PARTICLE_LIMITS.minCount, Math.floor(system.active * 0.85));
+            this.frameMs = budget; // Se mide de nuevo antes de volver a recortar
+        } else if (this.frameMs < budget * 1.1 && this.workMs < budget * 0.25 && system.active < this.target) {
+            system.active = Math.min(this.target, system.active + 1);
+        }
+    }
+
+    draw() {
+        this.ctx.clearRect(0, 0, this.canvas.width, this.canvas.height);
+        this.system.render(this.ctx, this.atlas, this.dpr);
+    }
+
+    // Movimiento reducido: un único frame quieto, sin bucle
+    drawStatic() {
+        this.stop();
+        this.system.active = Math.min(this.target, PARTICLE_LIMITS.minCount * 2);
+        this.draw();
+    }
+
+    stats() {
+        return {
+            fps: Math.round(1000 / this.frameMs),
+            frameMs: +this.frameMs.toFixed(2),
+            workMs: +this.workMs.toFixed(3),
+            active: this.system.active,
+            target: this.target,
+            dpr: this.dpr,
+        };
+    }
+}
+
+/**
+ * Fachada para las páginas: crea el canvas, lee el tema del DOM y decide
+ * si el render va en el hilo principal o en un Worker.
+ */
+class ParticleEngine {
+    constructor(options = {}) {
         this.canvas = document.createElement('canvas');
-        this.ctx = this.canvas.getContext('2d');
-        this.particles = [];
-        this.theme = 'theme-default';
-        this.init();
+        this.theme = null;
+        this.mode = 'main';
+        this.worker = null;
+        this.renderer = null;
+        this.onStats = options.onStats || null;
+        this.scale = options.scale || 1;
+        this.lastStats = null;
+        this.reducedMotionQuery = window.matchMedia ? window.matchMedia('(prefers-reduced-motion: reduce)') : null;
+        this.init(options);
     }
 
-    init() {
+    init(options) {
         this.canvas.style.position = 'fixed';
         this.canvas.style.top = '0';
         this.canvas.style.left = '0';
@@ -20,77 +301,127 @@ class ParticleEngine {
         this.canvas.style.height = '100%';
         this.canvas.style.pointerEvents = 'none';
         this.canvas.style.zIndex = '1';
-        document.body.appendChild(this.canvas);
+        (options.parent || document.body).appendChild(this.canvas);
 
-        window.addEventListener('resize', () => this.resize());
-        this.resize();
-        this.loop();
-    }
+        const handleStats = stats => {
+            this.lastStats = { ...stats, mode: this.mode };
+            if (this.onStats) this.onStats(this.lastStats);
+        };
+        if (options.worker && PARTICLE_SCRIPT_URL && this.canvas.transferControlToOffscreen && window.Worker) {
+            try {
+                const offscreen = this.canvas.transferControlToOffscreen();
+                this.worker = new Worker(PARTICLE_SCRIPT_URL);
+                this.worker.onmessage = e => handleStats(e.data);
+                this.worker.postMessage({ type: 'init', canvas: offscreen }, [offscreen]);
+                this.mode = 'worker';
+            } catch (e) {
+                console.warn('Partículas: sin OffscreenCanvas en Worker, se usa el hilo principal', e);
+                this.worker = null;
+            }
+        }
+        if (!this.worker) {
+            this.renderer = new ParticleRenderer(this.canvas, handleStats);
+        }
 
-    resize() {
-        this.canvas.width = window.innerWidth;
-        this.canvas.height = window.innerHeight;
+        let resizeTimer = null;
+        window.addEventListener('resize', () => {
+            clearTimeout(resizeTimer);
+            resizeTimer = setTimeout(() => this.resize(), 150);
+        });
+        document.addEventListener('visibilitychange', () => this.syncRunning());
+        if (this.reducedMotionQuery) {
+            const onChange = () => { this.send({ reducedMotion: this.reducedMotionQuery.matches }); this.syncRunning(); };
+            if (this.reducedMotionQuery.addEventListener) this.reducedMotionQuery.addEventListener('change', onChange);
+            else this.reducedMotionQuery.addListener(onChange);
+        }
+        // player.js/creator.js fijan --primary en <html>: se relee solo cuando cambia
+        new MutationObserver(() => this.refreshStyle()).observe(document.documentElement, {
+            attributes: true, attributeFilter: ['style'],
+        });
+
+        this.send({
+            width: window.innerWidth, height: window.innerHeight, dpr: window.devicePixelRatio || 1,
+            theme: this.theme, color: this.readColor(), scale: this.scale,
+            reducedMotion: !!(this.reducedMotionQuery && this.reducedMotionQuery.matches),
+        });
+        this.syncRunning();
     }
 
-    updateTheme(newTheme) {
-        this.theme = newTheme;
-        this.particles = []; // Limpiar al cambiar tema
-        const count = this.theme === 'theme-hacker' ? 50 : 40;
-        
-        for (let i = 0; i < count; i++) {
-            this.particles.push(this.createParticle());
-        }
+    readColor() {
+        return getComputedStyle(document.documentElement).getPropertyValue('--primary').trim() || '#ffffff';
     }
 
-    createParticle() {
-        return {
-            x: Math.random() * this.canvas.width,
-            y: Math.random() * this.canvas.height,
-            size: Math.random() * 5 + 2,
-            speedY: Math.random() * 1 + 0.5,
-            speedX: (Math.random() - 0.5) * 0.5,
-            char: this.getThemeChar(),
-            opacity: Math.random() * 0.5 + 0.2
-        };
+    send(config) {
+        if (this.worker) this.worker.postMessage({ type: 'configure', config });
+        else this.renderer.configure(config);
     }
 
-    getThemeChar() {
-        if (this.theme === 'theme-navidad') return '❄';
-        if (this.theme === 'theme-san-valentin') return '❤';
-        if (this.theme === 'theme-hacker') return Math.random() > 0.5 ? '1' : '0';
-        if (this.theme === 'theme-cumpleanos') return '✨';
-        return '•';
+    syncRunning() {
+        const running = !document.hidden && !(this.reducedMotionQuery && this.reducedMotionQuery.matches);
+        if (this.worker) this.worker.postMessage({ type: running ? 'start' : 'stop' });
+        else if (running) this.renderer.start();
+        else this.renderer.stop();
     }
 
-    draw() {
-        this.ctx.clearRect(0, 0, this.canvas.width, this.canvas.height);
-        
-        this.particles.forEach(p => {
-            this.ctx.globalAlpha = p.opacity;
-            this.ctx.fillStyle = getComputedStyle(document.documentElement).getPropertyValue('--primary').trim() || '#ffffff';
-            
-            if (this.theme === 'theme-hacker') {
-                this.ctx.font = '14px monospace';
-                this.ctx.fillText(p.char, p.x, p.y);
-            } else {
-                this.ctx.font = `${p.size * 3}px serif`;
-                this.ctx.fillText(p.char, p.x, p.y);
-            }
+    resize() {
+        this.send({ width: window.innerWidth, height: window.innerHeight, dpr: window.devicePixelRatio || 1 });
+    }
 
-            p.y += p.speedY;
-            p.x += p.speedX;
+    refreshStyle() {
+        this.send({ color: this.readColor() });
+    }
 
-            if (p.y > this.canvas.height) p.y = -20;
-            if (p.x > this.canvas.width) p.x = 0;
-            if (p.x < 0) p.x = this.canvas.width;
-        });
+    updateTheme(newTheme) {
+        this.theme = newTheme;
+        this.send({ theme: newTheme, color: this.readColor() });
+        this.syncRunning();
     }
 
-    loop() {
-        this.draw();
-        requestAnimationFrame(() => this.loop());
+    stats() {
+        return this.lastStats || (this.renderer && { ...this.renderer.stats(), mode: this.mode });
     }
 }
 
-// Inicializar globalmente
-window.particles = new ParticleEngine();
\ No newline at end of file
+// --- Utilidades comunes (ventana y Worker) ---
+function createCanvas(width, height) {
+    if (typeof OffscreenCanvas !== 'undefined') return new OffscreenCanvas(width, height);
+    const canvas = document.createElement('canvas');
+    canvas.width = width;
+    canvas.height = height;
+    return canvas;
+}
+
+function nowMs() {
+    return performance.now();
+}
+
+// Los Worker sin requestAnimationFrame (Safari antiguo) van a 60 Hz con setTimeout
+function requestFrame(callback) {
+    if (typeof requestAnimationFrame !== 'undefined') return requestAnimationFrame(callback);
+    return setTimeout(() => callback(nowMs()), PARTICLE_LIMITS.targetFrameMs);
+}
+
+function cancelFrame(handle) {
+    if (typeof cancelAnimationFrame !== 'undefined') cancelAnimationFrame(handle);
+    else clearTimeout(handle);
+}
+
+const IS_PARTICLE_WORKER = typeof document === 'undefined' && typeof self !== 'undefined' && typeof importScripts === 'function';
+// URL de este mismo fichero (la versión con hash de /assets) para arrancar el Worker
+const PARTICLE_SCRIPT_URL = !IS_PARTICLE_WORKER && document.currentScript ? document.currentScript.src : null;
+
+if (IS_PARTICLE_WORKER) {
+    // Dentro del Worker: el hilo principal manda el canvas y la configuración ya resuelta
+    let renderer = null;
+    self.onmessage = e => {
+        const message = e.data;
+        if (message.type === 'init') renderer = new ParticleRenderer(message.canvas, stats => self.postMessage(stats));
+        else if (!renderer) return;
+        else if (message.type === 'configure') renderer.configure(message.config);
+        else if (message.type === 'start') renderer.start();
+        else if (message.type === 'stop') renderer.stop();
+    };
+} else if (!window.PARTICLES_MANUAL) {
+    // Inicializar globalmente (PARTICLES_MANUAL = true para crearlo a mano, p.ej. el banco de pruebas)
+    window.particles = new ParticleEngine();
+}
@@ -7,14 +7,51 @@ let gamedata = null;
 let realGift = "";
 let currentStepIdx = 0;
 let isDemoMode = false;
+let gameId = null;
+
+/**
+ * TELEMETRÍA: dónde se atasca el destinatario (no se envía en la preview).
+ * Los eventos se acumulan en memoria y salen en lote con sendBeacon: al
+ * terminar, al ocultar la pestaña o al juntar TELEMETRY_BATCH. Nunca uno por tecla.
+ */
+const TELEMETRY_URL = '/api/telemetry';
+const TELEMETRY_BATCH = 20;
+const telemetry = { session: null, queue: [], startedAt: 0, levelShownAt: 0 };
+
+function track(kind, level, extra) {
+    if (isDemoMode || !gameId) return;
+    telemetry.queue.push({ k: kind, l: level, ...extra });
+    if (telemetry.queue.length >= TELEMETRY_BATCH) flushTelemetry();
+}
+
+function flushTelemetry() {
+    if (!telemetry.queue.length) return;
+    const body = JSON.stringify({ g: gameId, s: telemetry.session, e: telemetry.queue.splice(0) });
+    const sent = navigator.sendBeacon && navigator.sendBeacon(TELEMETRY_URL, body);
+    if (!sent) fetch(TELEMETRY_URL, { method: 'POST', body, keepalive: true }).catch(() => {});
+}
+
+// Nivel 1..N contando solo los pasos que no son intro (el 0 es la partida entera)
+function levelNumber() {
+    return gamedata.steps.slice(0, currentStepIdx + 1).filter(step => step.type !== 'intro').length;
+}
 
 /**
  * 1. INICIALIZACIÓN (Bootstrapping)
  */
-function initPlayer(data, gift, isDemo) {
+function initPlayer(data, gift, isDemo, id) {
     gamedata = data;
     realGift = gift;
     isDemoMode = isDemo;
+    gameId = id || null;
+
+    telemetry.session = window.crypto?.randomUUID?.() || Date.now().toString(36) + Math.random().toString(36).slice(2);
+    telemetry.startedAt = performance.now();
+    document.addEventListener('visibilitychange', () => {
+        if (document.visibilityState === 'hidden') flushTelemetry();
+    });
+    window.addEventListener('pagehide', flushTelemetry);
+    track('start', 0);
 
     // APLICAR DIRECCIÓN DE ARTE DINÁMICA
     applyAIDesign();
@@ -95,6 +132,8 @@ function renderCurrentStep() {
             renderIntro(step, quizArea);
         } else {
             renderLevel(step, quizArea);
+            telemetry.levelShownAt = performance.now();
+            track('view', levelNumber());
         }
         
         quizArea.style.opacity = '1';
@@ -166,6 +205,7 @@ function renderLevel(step, container) {
  */
 function checkAnswer() {
     const input = document.getElementById('player-answer');
+    if (input.disabled) return; // Ya acertado: doble clic en "Verificar"
     const errorMsg = document.getElementById('error-msg');
     const userAns = input.value.trim().toLowerCase();
     const correctAns = gamedata.steps[currentStepIdx].answer.toLowerCase().trim();
@@ -173,6 +213,7 @@ function checkAnswer() {
     const normalize = (str) => str.normalize("NFD").replace(/[\u0300-\u036f]/g, "");
 
     if (normalize(userAns) === normalize(correctAns)) {
+        track('attempt', levelNumber(), { ok: true, ms: Math.round(performance.now() - telemetry.levelShownAt) });
         input.classList.remove('border-white/5');
         input.classList.add('border-green-500', 'bg-green-500/10');
         input.disabled = true;
@@ -189,6 +230,7 @@ function checkAnswer() {
             }
         }, 600);
     } else {
+        if (userAns) track('attempt', levelNumber(), { ok: false });
         input.classList.add('animate-shake', 'border-red-500');
         errorMsg.classList.replace('opacity-0', 'opacity-100');
         
@@ -215,6 +257,9 @@ function showFinalReward() {
     quizArea.classList.add('hidden');
     rewardArea.classList.remove('hidden');
 
+    track('finish', 0, { ms: Math.round(performance.now() - telemetry.startedAt) });
+    flushTelemetry();
+
     if (isDemoMode) {
         rewardArea.innerHTML = `
             <div class="text-center space-y-8 py-4 animate-fade-in">
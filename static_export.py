@@ -0,0 +1,232 @@
+# static_export.py
+# ==========================================================================
+# EXPORTACIÓN ESTÁTICA DE EXPERIENCIAS PAGADAS (HTML AUTOCONTENIDO)
+# ==========================================================================
+# Una experiencia pagada no cambia: se renderiza una vez a un único HTML con
+# CSS/JS locales y datos en línea, minificado y precomprimido (.gz y, si está
+# instalado 'brotli', .br). Ese directorio se puede servir desde Flask sin BD
+# o subir tal cual a cualquier hosting estático.
+#
+# Necesita los assets compilados (python assets.py): Tailwind y Font Awesome
+# se incrustan (las fuentes como data: URI). Sin build la página dependería de
+# los CDN y la exportación falla con ExportError.
+#
+#   python static_export.py --all            # todas las pagadas
+#   python static_export.py a1b2c3d4 e5f6... # solo esas
+#   python static_export.py --all --dir /var/www/experiences
+import base64
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+from datetime import datetime, timezone
+
+from flask import render_template
+
+try:
+    import brotli
+except ImportError:  # opcional: sin brotli solo se genera .gz
+    brotli = None
+
+# /static/... (sin build) o /assets/... (python assets.py, sale de static/dist). La hoja de
+# Font Awesome lleva sus fuentes con URL relativa a /assets/webfonts/: se incrustan aparte
+LOCAL_CSS_RE = re.compile(r'<link rel="stylesheet" href="/(static|assets)/((?!webfonts/)[^"?]+\.css)[^"]*">')
+LOCAL_JS_RE = re.compile(r'<script src="/(static|assets)/([^"?]+\.js)[^"]*"></script>')
+FONTAWESOME_CSS_RE = re.compile(r'<link rel="stylesheet" href="/assets/(webfonts/[^"?]+\.css)[^"]*">')
+FONT_PRELOAD_RE = re.compile(r'<link rel="preload" href="/assets/[^"]*" as="font"[^>]*>')
+FONT_URL_RE = re.compile(r'url\(["\']?([^"\')]+\.(woff2|woff))["\']?\)')
+# Lo que quede cargándose de otro origen (CDN de Tailwind o de Font Awesome sin build)
+EXTERNAL_RE = re.compile(r'<(?:script|link)\b[^>]*\b(?:src|href)="((?:https?:)?//[^"]+)"', re.I)
+CSS_COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+PRESERVE_RE = re.compile(r'(<(pre|textarea)\b.*?</\2>)', re.S | re.I)
+# Variantes precomprimidas junto a cada fichero, por orden de preferencia del servidor
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+
+class ExportError(Exception):
+    """La página no queda autocontenida (normalmente, falta 'python assets.py')."""
+
+
+def export_path(export_dir, game_id):
+    return os.path.join(export_dir, game_id, "index.html")
+
+
+def _read_static(static_folder, prefix, relative):
+    folder = os.path.join(static_folder, "dist") if prefix == "assets" else static_folder
+    with open(os.path.join(folder, relative), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def inline_assets(html, static_folder):
+    """Sustituye <link>/<script> a /static/ y /assets/ por su contenido en línea."""
+
+    def css(match):
+        content = CSS_COMMENT_RE.sub("", _read_static(static_folder, *match.groups()))
+        return f"<style>{content}</style>"
+
+    def js(match):
+        # '</script' dentro del JS cerraría la etiqueta en línea
+        content = _read_static(static_folder, *match.groups()).replace("</script", "<\\/script")
+        return f"<script>{content}</script>"
+
+    def fontawesome(match):
+        relative = match.group(1)
+        folder = os.path.join(static_folder, "dist", os.path.dirname(relative))
+
+        def data_uri(font):
+            with open(os.path.join(folder, font.group(1)), "rb") as f:
+                encoded = base64.b64encode(f.read()).decode("ascii")
+            return f"url(data:font/{font.group(2)};base64,{encoded})"
+
+        content = FONT_URL_RE.sub(data_uri, _read_static(static_folder, "assets", relative))
+        return f"<style>{content}</style>"
+
+    html = FONT_PRELOAD_RE.sub("", html)  # La fuente va dentro de la hoja
+    html = FONTAWESOME_CSS_RE.sub(fontawesome, html)
+    html = LOCAL_CSS_RE.sub(css, html)
+    return LOCAL_JS_RE.sub(js, html)
+
+
+def check_self_contained(html):
+    """ExportError si la página aún carga CSS/JS de otro origen."""
+    external = EXTERNAL_RE.findall(html)
+    if external:
+        raise ExportError(f"La página carga recursos externos ({', '.join(external)}): "
+                          "compila los assets con 'python assets.py' antes de exportar")
+
+
+def minify_html(html):
+    """
+    Minificado conservador: quita la indentación y las líneas vacías (también
+    dentro de <style>/<script>), sin tocar <pre>/<textarea>. No reescribe JS.
+    """
+    out = []
+    for i, part in enumerate(PRESERVE_RE.split(html)):
+        if i % 3 == 2:  # grupo interno del patrón (nombre de la etiqueta)
+            continue
+        if i % 3 == 1:
+            out.append(part)
+            continue
+        lines = (line.strip() for line in part.splitlines())
+        out.append("\n".join(line for line in lines if line))
+    return "".join(out)
+
+
+def _write_atomic(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def write_bundle(export_dir, game_id, html):
+    """Escribe index.html + variantes comprimidas. Devuelve el ETag (hash del HTML)."""
+    path = export_path(export_dir, game_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    raw = html.encode("utf-8")
+    # Primero las comprimidas: index.html es la señal de 'exportado'
+    _write_atomic(path + ".gz", gzip.compress(raw, compresslevel=9, mtime=0))
+    if brotli is not None:
+        _write_atomic(path + ".br", brotli.compress(raw, quality=11))
+    _write_atomic(path, raw)
+    return hashlib.sha256(raw).hexdigest()[:32]
+
+
+def remove_export(export_dir, game_id):
+    path = export_path(export_dir, game_id)
+    for suffix in ("", ".gz", ".br"):
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+def accepted_encodings(accept_encoding, offered=PRECOMPRESSED):
+    """
+    Pares (encoding, sufijo) de 'offered' que admite la cabecera Accept-Encoding,
+    de mayor a menor q (a igual q, en el orden de 'offered'). q=0 excluye y
+    '*' vale para lo que la cabecera no cita. Sin cabecera no hay compresión.
+    """
+    weights = {}
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights["gzip" if coding == "x-gzip" else coding] = q
+    ranked = []
+    for index, (encoding, suffix) in enumerate(offered):
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > 0:
+            ranked.append((-q, index, encoding, suffix))
+    return [(encoding, suffix) for _, _, encoding, suffix in sorted(ranked)]
+
+
+def find_export(export_dir, game_id, accept_encoding=""):
+    """
+    Elige la mejor variante para el cliente: (ruta, content-encoding o None,
+    ETag, última modificación) o None si no está exportada.
+    """
+    if not game_id.isalnum():  # ids de 8 hex: nada de '..' en rutas
+        return None
+    path = export_path(export_dir, game_id)
+    try:
+        stat = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    etag = f"{int(stat.st_mtime_ns):x}-{stat.st_size:x}"
+    modified = datetime.fromtimestamp(int(stat.st_mtime), timezone.utc)
+    for encoding, suffix in accepted_encodings(accept_encoding):
+        if os.path.exists(path + suffix):
+            return path + suffix, encoding, etag, modified
+    return path, None, etag, modified
+
+
+def render_experience(app, exp):
+    """HTML final del jugador para una experiencia pagada (mismo template que Flask)."""
+    with app.test_request_context():
+        return render_template("player.html",
+                               game_data=json.dumps(exp.game_data),
+                               real_gift=exp.real_gift,
+                               is_demo=False,
+                               game_id=exp.id)
+
+
+def export_experience(app, exp, export_dir):
+    html = inline_assets(render_experience(app, exp), app.static_folder)
+    check_self_contained(html)
+    return write_bundle(export_dir, exp.id, minify_html(html))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    os.environ.setdefault("JOB_INLINE_WORKER", "0")
+    from app import app, Experience, STATIC_EXPORT_DIR
+
+    parser = argparse.ArgumentParser(description="Exporta experiencias pagadas a HTML estático")
+    parser.add_argument("game_ids", nargs="*")
+    parser.add_argument("--all", action="store_true", help="Todas las experiencias pagadas")
+    parser.add_argument("--dir", default=STATIC_EXPORT_DIR or "exports")
+    args = parser.parse_args()
+
+    with app.app_context():
+        query = Experience.query.filter_by(is_paid=True)
+        if not args.all:
+            query = query.filter(Experience.id.in_(args.game_ids))
+        total = 0
+        for exp in query.yield_per(100):
+            export_experience(app, exp, args.dir)
+            total += 1
+            print(f"📦 {exp.id} -> {export_path(args.dir, exp.id)}")
+        print(f"✅ {total} experiencias exportadas en {args.dir}")
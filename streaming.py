@@ -0,0 +1,137 @@
+# streaming.py
+# ==========================================================================
+# STREAMING DE RESPUESTAS DE LA IA (SSE + EXTRACCIÓN INCREMENTAL DE JSON)
+# ==========================================================================
+import json
+import re
+
+JSON_DELIMITER = "###JSON_DATA###"
+
+_FENCE_RE = re.compile(r'```[a-z]*\n?|```')
+
+
+def strip_fences(text):
+    """Elimina los backticks de markdown que a veces envuelven el JSON."""
+    return _FENCE_RE.sub('', text).strip()
+
+
+def sse(event, data):
+    """Serializa un evento Server-Sent Events."""
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+class ReplyStreamParser:
+    """
+    Parser incremental de la respuesta 'Texto + ###JSON_DATA### + JSON'.
+
+    - La prosa se emite en cuanto llega (reteniendo solo lo justo para no
+      partir el delimitador entre dos chunks).
+    - Tras el delimitador se escanean las llaves del JSON carácter a carácter
+      y se intenta parsear en el momento en que el objeto raíz se cierra.
+    - 'validate' decide si el JSON vale; 'normalize' lo corrige antes de emitirlo.
+    """
+
+    def __init__(self, validate=None, normalize=None):
+        self.validate = validate
+        self.normalize = normalize
+        self.prose = ""
+        self.new_json = None
+        self._pending = ""
+        self._in_json = False
+        self._json_buf = ""
+        self._scan_pos = 0
+        self._depth = 0
+        self._start = None
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def done(self):
+        return self.new_json is not None
+
+    def feed(self, chunk):
+        """Procesa un fragmento de texto y devuelve la lista de eventos (nombre, datos)."""
+        events = []
+        if not chunk or self.done:
+            return events
+
+        if not self._in_json:
+            self._pending += chunk
+            idx = self._pending.find(JSON_DELIMITER)
+            if idx == -1:
+                # Retenemos la cola por si el delimitador llega partido
+                safe = len(self._pending) - (len(JSON_DELIMITER) - 1)
+                if safe > 0:
+                    events.extend(self._emit_prose(self._pending[:safe]))
+                    self._pending = self._pending[safe:]
+                return events
+
+            events.extend(self._emit_prose(self._pending[:idx]))
+            chunk = self._pending[idx + len(JSON_DELIMITER):]
+            self._pending = ""
+            self._in_json = True
+
+        self._json_buf += chunk
+        parsed = self._scan_json()
+        if parsed is not None:
+            self.new_json = parsed
+            events.append(("json", parsed))
+        return events
+
+    def finish(self):
+        """Vacía lo pendiente al cerrar el stream. Último intento de parseo completo."""
+        events = []
+        if not self._in_json:
+            events.extend(self._emit_prose(self._pending))
+            self._pending = ""
+        elif not self.done and self._json_buf.strip():
+            parsed = self._try_parse(strip_fences(self._json_buf))
+            if parsed is not None:
+                self.new_json = parsed
+                events.append(("json", parsed))
+        return events
+
+    def _emit_prose(self, text):
+        if not text:
+            return []
+        self.prose += text
+        return [("delta", text)]
+
+    def _scan_json(self):
+        buf = self._json_buf
+        for i in range(self._scan_pos, len(buf)):
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"' and self._start is not None:
+                self._in_string = True
+            elif ch == '{':
+                if self._start is None:
+                    self._start = i
+                self._depth += 1
+            elif ch == '}' and self._start is not None:
+                self._depth -= 1
+                if self._depth == 0:
+                    parsed = self._try_parse(buf[self._start:i + 1])
+                    if parsed is not None:
+                        self._scan_pos = i + 1
+                        return parsed
+                    # Objeto cerrado pero inválido: se descarta y se busca el siguiente
+                    self._start = None
+        self._scan_pos = len(buf)
+        return None
+
+    def _try_parse(self, text):
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError:
+            return None
+        if self.validate and not self.validate(data):
+            return None
+        return self.normalize(data) if self.normalize else data
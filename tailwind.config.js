@@ -0,0 +1,10 @@
+// tailwind.config.js
+// Lo usa 'python assets.py' (Tailwind CLI v3): solo se generan las clases que
+// aparecen en estos ficheros. Las clases montadas por concatenación no se ven.
+module.exports = {
+  content: ["./templates/**/*.html", "./static/js/**/*.js"],
+  theme: {
+    extend: {},
+  },
+  plugins: [],
+};
@@ -0,0 +1,221 @@
+# telemetry.py
+# ==========================================================================
+# TELEMETRÍA DEL PLAYER: DÓNDE SE ATASCAN LOS DESTINATARIOS
+# ==========================================================================
+# player.js acumula eventos (inicio, nivel visto, intento, final) y los manda
+# en lote con navigator.sendBeacon. El endpoint solo valida y los añade a un
+# buffer en memoria (acotado: si se llena, se descartan y se cuentan); un
+# hilo los vuelca cada 'flush_interval' s o al llegar a 'batch_size', con un
+# INSERT masivo en 'player_events' y, en la misma transacción, sumando a
+# 'player_level_stats' (una fila por experiencia y nivel). Los informes leen
+# solo esa tabla resumen: no dependen de cuántos millones de eventos haya.
+#
+# Nivel 0 = la partida entera: views = partidas empezadas, completions =
+# partidas terminadas (showFinalReward) y total_ms su duración.
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+EVENT_KINDS = ("start", "view", "attempt", "finish")
+MAX_LEVEL = 50
+MAX_MS = 6 * 3600 * 1000  # Más de 6 h en un nivel: la pestaña se quedó abierta
+ROLLUP_COUNTERS = ("views", "attempts", "failures", "completions", "total_ms")
+
+
+def normalize_event(raw, game_id, session_id):
+    """Evento del beacon -> fila de player_events, o None si no es válido."""
+    if not isinstance(raw, dict) or raw.get("k") not in EVENT_KINDS:
+        return None
+    level = raw.get("l", 0)
+    if not isinstance(level, int) or isinstance(level, bool) or not 0 <= level <= MAX_LEVEL:
+        return None
+    ms = raw.get("ms")
+    ms = min(int(ms), MAX_MS) if isinstance(ms, (int, float)) and not isinstance(ms, bool) and ms >= 0 else None
+    ok = raw.get("ok") if raw["k"] == "attempt" else None
+    return {"game_id": game_id, "session_id": session_id, "kind": raw["k"], "level": level,
+            "ok": bool(ok) if ok is not None else None, "ms": ms}
+
+
+def rollup_deltas(rows):
+    """Suma un lote de eventos por (game_id, level) con los contadores de ROLLUP_COUNTERS."""
+    deltas = {}
+    for row in rows:
+        kind = row["kind"]
+        level = 0 if kind in ("start", "finish") else row["level"]
+        delta = deltas.setdefault((row["game_id"], level), dict.fromkeys(ROLLUP_COUNTERS, 0))
+        if kind in ("start", "view"):
+            delta["views"] += 1
+            continue
+        if kind == "attempt":
+            delta["attempts"] += 1
+            if not row["ok"]:
+                delta["failures"] += 1
+                continue
+        delta["completions"] += 1  # Intento correcto o partida terminada
+        delta["total_ms"] += row["ms"] or 0
+    return deltas
+
+
+class TelemetryBuffer:
+    """
+    Buffer acotado + volcador en segundo plano.
+
+    - add() nunca toca la BD: el beacon responde en microsegundos.
+    - max_events acota la memoria; lo que no cabe se descarta (dropped_full).
+    - Un lote que falla al volcarse vuelve a la cola si hay sitio; si no, se
+      descarta (dropped_flush). Eventos y resumen van en la misma transacción.
+    """
+
+    def __init__(self, db, event_model, rollup_model, max_events=50000, batch_size=500, flush_interval=2.0):
+        self.db = db
+        self.event_model = event_model
+        self.rollup_model = rollup_model
+        self.max_events = max_events
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._events = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._stop = None
+        self.counters = {"accepted": 0, "rejected": 0, "dropped_full": 0, "dropped_flush": 0,
+                         "flushed": 0, "batches": 0, "flush_failures": 0}
+        self.last_flush_seconds = 0.0
+
+    def add(self, rows):
+        """Encola filas ya normalizadas. Devuelve cuántas entraron."""
+        with self._lock:
+            room = max(self.max_events - len(self._events), 0)
+            accepted = rows[:room]
+            self._events.extend(accepted)
+            self.counters["accepted"] += len(accepted)
+            self.counters["dropped_full"] += len(rows) - len(accepted)
+            pending = len(self._events)
+        if pending >= self.batch_size:
+            self._wake.set()
+        return len(accepted)
+
+    def reject(self, count=1):
+        with self._lock:
+            self.counters["rejected"] += count
+
+    def _take(self):
+        with self._lock:
+            size = min(self.batch_size, len(self._events))
+            return [self._events.popleft() for _ in range(size)]
+
+    def _requeue(self, rows):
+        with self._lock:
+            room = max(self.max_events - len(self._events), 0)
+            kept = rows[:room]
+            self._events.extendleft(reversed(kept))
+            self.counters["dropped_flush"] += len(rows) - len(kept)
+
+    def flush(self):
+        """Vuelca todo lo pendiente por lotes. Devuelve los eventos escritos."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                rows = self._take()
+                if not rows:
+                    return written
+                started = time.perf_counter()
+                try:
+                    self._write(rows)
+                except Exception as e:
+                    self.db.session.rollback()
+                    self.counters["flush_failures"] += 1
+                    self._requeue(rows)
+                    print(f"⚠️ Telemetría: volcado de {len(rows)} eventos fallido: {e}")
+                    return written
+                self.last_flush_seconds = time.perf_counter() - started
+                self.counters["flushed"] += len(rows)
+                self.counters["batches"] += 1
+                written += len(rows)
+
+    def _write(self, rows):
+        session = self.db.session
+        session.execute(self.event_model.__table__.insert(), rows)  # executemany: un viaje por lote
+        for (game_id, level), delta in rollup_deltas(rows).items():
+            self._add_to_rollup(game_id, level, delta)
+        session.commit()
+
+    def _add_to_rollup(self, game_id, level, delta):
+        """UPDATE x = x + delta; si la fila no existe, INSERT (otro worker puede ganar la carrera)."""
+        model = self.rollup_model
+        key = (model.game_id == game_id) & (model.level == level)
+        increments = {getattr(model, name): getattr(model, name) + value for name, value in delta.items() if value}
+        if increments and model.query.filter(key).update(increments, synchronize_session=False):
+            return
+        try:
+            with self.db.session.begin_nested():
+                self.db.session.add(model(game_id=game_id, level=level, **delta))
+        except IntegrityError:
+            model.query.filter(key).update(increments, synchronize_session=False)
+
+    def run(self, app, stop):
+        while not stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                with app.app_context():
+                    self.flush()
+            except Exception as e:
+                print(f"⚠️ Telemetría: {e}")
+        with app.app_context():
+            self.flush()
+
+    def start_thread(self, app):
+        """Volcador dentro del proceso web. Devuelve el Event que lo detiene (con volcado final)."""
+        if self._thread is None:
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self.run, args=(app, self._stop),
+                                            name="telemetry-flusher", daemon=True)
+            self._thread.start()
+        return self._stop
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._events)
+        return dict(self.counters, pending=pending, max_events=self.max_events,
+                    last_flush_ms=round(self.last_flush_seconds * 1000, 1))
+
+
+def level_report(rollup_model, game_id):
+    """Informe por nivel de una experiencia (lee solo la tabla resumen)."""
+    rows = (rollup_model.query
+            .filter(rollup_model.game_id == game_id)
+            .order_by(rollup_model.level)
+            .all())
+    return [_report_row(row.level, row.views, row.attempts, row.failures, row.completions, row.total_ms)
+            for row in rows]
+
+
+def difficulty_report(db, rollup_model):
+    """Todas las experiencias sumadas por nivel: qué posición del juego atasca más (prompts.py)."""
+    model = rollup_model
+    rows = (db.session.query(model.level, func.sum(model.views), func.sum(model.attempts),
+                             func.sum(model.failures), func.sum(model.completions), func.sum(model.total_ms),
+                             func.count(model.game_id))
+            .group_by(model.level)
+            .order_by(model.level)
+            .all())
+    return [dict(_report_row(*row[:6]), experiences=row[6]) for row in rows]
+
+
+def _report_row(level, views, attempts, failures, completions, total_ms):
+    views, attempts, failures, completions, total_ms = (int(value or 0) for value in
+                                                        (views, attempts, failures, completions, total_ms))
+    return {
+        "level": level,
+        "views": views,
+        "completions": completions,
+        "dropoff": round(1 - completions / views, 3) if views else None,
+        "attempts_per_completion": round(attempts / completions, 2) if completions and attempts else None,
+        "failure_rate": round(failures / attempts, 3) if attempts else None,
+        "avg_ms": round(total_ms / completions) if completions else None,
+    }
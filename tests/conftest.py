@@ -0,0 +1,51 @@
+# Los módulos del proyecto viven en la raíz del repo (sin paquete)
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tempfile
+
+import pytest
+
+# app.py se configura con variables de entorno al importarse: BD SQLite temporal,
+# Gemini falso y nada en segundo plano que dependa del reloj.
+TEST_DB = os.path.join(tempfile.mkdtemp(prefix="dw-tests-"), "app.db")
+os.environ.update(DATABASE_URL=f"sqlite:///{TEST_DB}", GEMINI_API_KEY="test", GEMINI_FAKE="1",
+                  JOB_INLINE_WORKER="0", WARM_POOL_DEPTH="0", PREWARM_ON_BOOT="0", WEB_CONCURRENCY="1")
+
+
+@pytest.fixture(scope="session")
+def web():
+    """El módulo app.py con el esquema creado."""
+    import app as web
+    from migrations import upgrade_schema
+
+    with web.app.app_context():
+        upgrade_schema(web.db)
+    return web
+
+
+@pytest.fixture
+def client(web):
+    client = web.app.test_client()
+    with client.session_transaction() as session:
+        session["autorizado"] = True
+    return client
+
+
+@pytest.fixture
+def make_experience(web):
+    """Crea una experiencia con id único y devuelve el id."""
+    created = []
+
+    def make(**fields):
+        game_id = f"t{len(created):03d}{os.urandom(2).hex()}"
+        fields.setdefault("game_data", web.new_game_data())
+        with web.app.app_context():
+            web.db.session.add(web.Experience(id=game_id, **fields))
+            web.db.session.commit()
+        created.append(game_id)
+        return game_id
+
+    return make
@@ -0,0 +1,167 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, Overloaded, SingleFlight, flight_key
+
+
+# --- AdmissionController ---
+def test_ticket_release_is_idempotent_and_frees_the_slot():
+    admission = AdmissionController(max_concurrent=1, max_queue=0, max_wait=0.01)
+    ticket = admission.acquire()
+    assert admission.stats()["in_flight"] == 1
+    ticket.release()
+    ticket.release()
+    assert admission.stats()["in_flight"] == 0
+    with admission.acquire():
+        pass
+    assert admission.stats()["admitted"] == 2
+
+
+def test_same_game_is_rejected_while_busy():
+    admission = AdmissionController(per_game=1)
+    ticket = admission.acquire("g1")
+    with pytest.raises(Overloaded) as e:
+        admission.acquire("g1")
+    assert e.value.reason == "game_busy"
+    admission.acquire("g2").release()  # Otro juego sí entra
+    ticket.release()
+    admission.acquire("g1").release()
+
+
+def test_full_queue_rejects_at_once():
+    admission = AdmissionController(max_concurrent=1, max_queue=0, max_wait=5, retry_after=7)
+    ticket = admission.acquire()
+    with pytest.raises(Overloaded) as e:
+        admission.acquire("g1")
+    assert (e.value.reason, e.value.retry_after) == ("queue_full", 7)
+    ticket.release()
+    admission.acquire("g1").release()  # El rechazo no dejó el juego marcado
+
+
+def test_queued_request_times_out():
+    admission = AdmissionController(max_concurrent=1, max_queue=1, max_wait=0.05)
+    ticket = admission.acquire()
+    with pytest.raises(Overloaded) as e:
+        admission.acquire("g1")
+    assert e.value.reason == "timeout"
+    stats = admission.stats()
+    assert stats["waiting"] == 0 and stats["rejected"]["timeout"] == 1
+    ticket.release()
+
+
+def test_queued_request_gets_the_released_slot():
+    admission = AdmissionController(max_concurrent=1, max_queue=1, max_wait=2)
+    ticket = admission.acquire()
+    threading.Timer(0.05, ticket.release).start()
+    admission.acquire().release()
+    assert admission.stats()["admitted"] == 2
+
+
+def test_cancelled_async_waiter_returns_its_late_slot():
+    admission = AdmissionController(max_concurrent=1, max_queue=1, max_wait=0.3)
+
+    async def scenario():
+        ticket = admission.acquire()
+        waiter = asyncio.ensure_future(admission.acquire_async("g1"))
+        await asyncio.sleep(0.05)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        ticket.release()
+        await asyncio.sleep(0.4)  # El hilo que esperaba la plaza termina y la devuelve
+
+    asyncio.run(scenario())
+    stats = admission.stats()
+    assert stats["in_flight"] == 0 and stats["waiting"] == 0
+    admission.acquire("g1").release()
+
+
+# --- SingleFlight ---
+def test_flight_key_needs_a_game():
+    assert flight_key(None, "hola") is None
+    assert flight_key("g1", "hola", False, {}) == flight_key("g1", "hola", False, {})
+    assert flight_key("g1", "hola", False, {}) != flight_key("g1", "hola", True, {})
+
+
+def test_follower_gets_the_leader_result():
+    flights = SingleFlight()
+    future, leader = flights.begin("k")
+    follower, is_leader = flights.begin("k")
+    assert leader and not is_leader and follower is future
+    flights.finish("k", future, result="respuesta")
+    assert flights.wait(follower) == "respuesta"
+    assert flights.stats() == {"in_flight": 0, "coalesced": 1, "follower_timeouts": 0}
+
+
+def test_leader_error_reaches_followers_and_finish_is_idempotent():
+    flights = SingleFlight()
+    future, _ = flights.begin("k")
+    follower, _ = flights.begin("k")
+    flights.finish("k", future, error=RuntimeError("Cliente desconectado"))
+    flights.finish("k", future, result="tarde")
+    with pytest.raises(RuntimeError):
+        flights.wait(follower)
+    assert flights.begin("k")[1]  # La clave quedó libre: la siguiente petición lidera
+
+
+def test_no_key_means_no_coalescing():
+    flights = SingleFlight()
+    assert flights.begin(None) == (None, True)
+    flights.finish(None, None, result=1)
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_follower_times_out_with_overloaded():
+    flights = SingleFlight(follower_timeout=0.05, retry_after=3)
+    future, _ = flights.begin("k")
+    follower, _ = flights.begin("k")
+    with pytest.raises(Overloaded) as e:
+        flights.wait(follower)
+    assert (e.value.reason, e.value.retry_after) == ("flight_timeout", 3)
+    with pytest.raises(Overloaded):
+        asyncio.run(flights.wait_async(follower))
+    assert flights.stats()["follower_timeouts"] == 2
+    # La espera vencida no cancela el vuelo del líder
+    flights.finish("k", future, result="ok")
+    assert asyncio.run(flights.wait_async(follower)) == "ok"
+
+
+def test_run_shares_one_call_between_threads():
+    flights = SingleFlight()
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(2)
+        return "hecho"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flights.run("k", slow)))
+    leader.start()
+    started.wait(2)
+    follower = threading.Thread(target=lambda: results.append(flights.run("k", slow)))
+    follower.start()
+    deadline = time.monotonic() + 2
+    while flights.stats()["coalesced"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release.set()
+    leader.join()
+    follower.join()
+    assert results == ["hecho", "hecho"] and len(calls) == 1
+
+
+def test_run_propagates_the_leader_exception():
+    flights = SingleFlight()
+
+    def boom():
+        raise ValueError("fallo")
+
+    with pytest.raises(ValueError):
+        flights.run("k", boom)
+    assert flights.stats()["in_flight"] == 0
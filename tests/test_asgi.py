@@ -0,0 +1,69 @@
+import asyncio
+import json
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("asgiref")
+
+
+@pytest.fixture(scope="module")
+def asgi(web):
+    import asgi
+
+    return asgi
+
+
+def cookie(web, **session):
+    serializer = web.app.session_interface.get_signing_serializer(web.app)
+    return {web.app.config["SESSION_COOKIE_NAME"]: serializer.dumps(session)}
+
+
+def request(asgi, method, path, cookies=None, **kwargs):
+    async def go():
+        transport = httpx.ASGITransport(app=asgi.application, client=("127.0.0.1", 5000))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", cookies=cookies) as client:
+            return await client.request(method, path, **kwargs)
+
+    return asyncio.run(go())
+
+
+def events(response):
+    parsed = []
+    for block in response.text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        parsed.append((lines["event"], json.loads(lines["data"])))
+    return parsed
+
+
+def test_variants_run_on_the_event_loop_and_choose_goes_through_flask(web, asgi, make_experience):
+    game_id = make_experience()
+    cookies = cookie(web, autorizado=True, current_game_id=game_id)
+    calls = len(web.client.aio.models.owner.calls)
+
+    r = request(asgi, "POST", "/chat/variants", cookies, json={"message": "Un cumpleaños pirata", "n": 2})
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "text/event-stream"
+    stream = events(r)
+    assert stream[0][0] == "batch" and stream[-1][0] == "done"
+    variants = [data for event, data in stream if event == "variant"]
+    assert sorted(v["index"] for v in variants) == [0, 1]
+    assert len(web.client.aio.models.owner.calls) == calls + 2  # client.aio, no hilos
+
+    batch_id = stream[0][1]["batch_id"]
+    r = request(asgi, "POST", f"/chat/variants/{batch_id}/choose", cookies, json={"index": 1})
+    assert r.status_code == 200
+    assert r.json()["new_json"] == variants[[v["index"] for v in variants].index(1)]["new_json"]
+
+
+def test_asgi_variants_validate_like_flask(web, asgi):
+    assert request(asgi, "POST", "/chat/variants", json={"message": "hola"}).status_code == 403
+    r = request(asgi, "POST", "/chat/variants", cookie(web, autorizado=True), json={"message": "hola", "n": "x"})
+    assert r.status_code == 400
+
+
+def test_other_routes_pass_through_to_flask(asgi, make_experience):
+    game_id = make_experience(is_paid=True)
+    r = request(asgi, "GET", f"/experience/{game_id}")
+    assert r.status_code == 200
+    assert "<!DOCTYPE html>" in r.text
@@ -0,0 +1,39 @@
+import json
+
+from assets import AssetManifest
+
+
+def test_manifest_maps_logical_names_to_hashed_urls(tmp_path):
+    dist = tmp_path / "dist"
+    (dist / "js").mkdir(parents=True)
+    (dist / "js" / "player.0123456789.js").write_text("x")
+    (dist / "js" / "player.0123456789.js.gz").write_bytes(b"gz")
+    (dist / "manifest.json").write_text(json.dumps({"files": {"js/player.js": "js/player.0123456789.js"}}))
+
+    manifest = AssetManifest(str(tmp_path), "https://cdn.example.com/assets/")
+    assert manifest.built
+    assert manifest.url("js/player.js") == "https://cdn.example.com/assets/js/player.0123456789.js"
+    assert manifest.url("js/otro.js") is None
+
+    path, encoding, immutable = manifest.find("js/player.0123456789.js", "gzip, br")
+    assert path.endswith(".js.gz") and encoding == "gzip" and immutable
+    # Un hash antiguo (HTML ya exportado) recibe la versión actual, sin caché inmutable
+    path, encoding, immutable = manifest.find("js/player.aaaaaaaaaa.js")
+    assert path.endswith("player.0123456789.js") and encoding is None and not immutable
+    assert manifest.find("js/otro.aaaaaaaaaa.js") is None
+
+
+def test_missing_manifest_means_not_built(tmp_path):
+    manifest = AssetManifest(str(tmp_path))
+    assert not manifest.built
+    assert manifest.url("tailwind.css") is None
+
+
+def test_asset_url_falls_back_to_static_without_build(web, monkeypatch):
+    monkeypatch.setattr(web.asset_manifest, "files", {})
+    with web.app.test_request_context():
+        assert web.asset_url("js/player.js") == "/static/js/player.js"
+        assert web.asset_url("tailwind.css") is None  # Solo existe tras el build
+    monkeypatch.setattr(web.asset_manifest, "files", {"js/player.js": "js/player.0123456789.js"})
+    with web.app.test_request_context():
+        assert web.asset_url("js/player.js").endswith("/js/player.0123456789.js")
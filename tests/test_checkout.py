@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from checkout import CheckoutSessions, checkout_key
+
+PARAMS = {"line_items": [{"price_data": {"unit_amount": 499}, "quantity": 1}], "metadata": {"game_id": "g1"}}
+KEY = checkout_key(PARAMS)
+
+
+class NoStripe:
+    """Cualquier llamada a Stripe hace fallar el test: la sesión debía reutilizarse."""
+
+    def __getattr__(self, name):
+        raise AssertionError(f"llamada inesperada a stripe.{name}")
+
+
+def sessions(reuse_margin=900):
+    return CheckoutSessions(db=None, model=None, stripe=NoStripe(), build_params=lambda exp: PARAMS,
+                            reuse_margin=reuse_margin)
+
+
+def experience(**overrides):
+    fields = {"id": "g1", "checkout_session_id": "cs_1", "checkout_url": "https://pay/cs_1",
+              "checkout_expires_at": datetime.utcnow() + timedelta(hours=2), "checkout_key": KEY}
+    fields.update(overrides)
+    return SimpleNamespace(**fields)
+
+
+def test_checkout_key_ignores_expiry_but_not_price():
+    assert checkout_key(dict(PARAMS, expires_at=1)) == KEY
+    cheaper = {"line_items": [{"price_data": {"unit_amount": 399}, "quantity": 1}], "metadata": {"game_id": "g1"}}
+    assert checkout_key(cheaper) != KEY
+
+
+def test_open_session_with_same_key_is_reusable():
+    assert sessions().reusable(experience(), KEY)
+
+
+@pytest.mark.parametrize("overrides", [
+    {"checkout_session_id": None},
+    {"checkout_url": None},
+    {"checkout_expires_at": None},
+    {"checkout_key": "otra"},
+    {"checkout_expires_at": datetime.utcnow() + timedelta(minutes=10)},  # Dentro del margen
+    {"checkout_expires_at": datetime.utcnow() - timedelta(minutes=1)},
+])
+def test_missing_changed_or_expiring_session_is_not_reusable(overrides):
+    assert not sessions().reusable(experience(**overrides), KEY)
+
+
+def test_reuse_margin_is_configurable():
+    exp = experience(checkout_expires_at=datetime.utcnow() + timedelta(minutes=10))
+    assert sessions(reuse_margin=60).reusable(exp, KEY)
+
+
+def test_checkout_url_reuses_without_calling_stripe():
+    manager = sessions()
+    assert manager.checkout_url(experience()) == "https://pay/cs_1"
+    assert manager.stats["reused"] == 1 and manager.stats["created"] == 0
@@ -0,0 +1,44 @@
+import threading
+
+from sqlalchemy import event, text
+
+from conversation_store import MemoryConversationStore
+
+
+def test_memory_append_is_atomic():
+    store = MemoryConversationStore(max_turns=1000, max_bytes=10 ** 6)
+    threads = [threading.Thread(target=lambda i=i: [store.append("g", {"n": i, "k": k}) for k in range(50)])
+               for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(store.load("g")) == 400
+
+
+def test_db_append_retries_when_another_turn_slips_in(web, make_experience):
+    game_id = make_experience()
+    store = web.conversations
+    with web.app.app_context():
+        store.append(game_id, {"role": "user", "content": "uno"})
+        raced = []
+
+        @event.listens_for(web.db.session, "before_flush")
+        def concurrent_turn(session, flush_context, instances):
+            # Otro worker añade su turno entre nuestra lectura y nuestro UPDATE
+            if raced:
+                return
+            raced.append(True)
+            with web.db.engine.begin() as conn:
+                conn.execute(text("UPDATE conversations SET history = :h, version = version + 1 "
+                                  "WHERE game_id = :g"),
+                             {"h": '[{"role": "user", "content": "uno"}, {"role": "user", "content": "otro"}]',
+                              "g": game_id})
+
+        try:
+            history = store.append(game_id, {"role": "user", "content": "dos"})
+        finally:
+            event.remove(web.db.session, "before_flush", concurrent_turn)
+        assert raced
+        assert [m["content"] for m in history] == ["uno", "otro", "dos"]
+        assert [m["content"] for m in store.load(game_id)] == ["uno", "otro", "dos"]
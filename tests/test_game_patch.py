@@ -0,0 +1,109 @@
+import pytest
+
+from game_patch import PatchError, apply_patch, decode_operations
+
+DOC = {
+    "title": "Viejo",
+    "visual_config": {"primary_color": "#000000"},
+    "steps": [{"title": "intro"}, {"question": "q1"}, {"question": "q2"}],
+    "a/b": 1,
+    "m~n": 2,
+}
+
+
+def test_add_replace_remove():
+    result = apply_patch(DOC, [
+        {"op": "replace", "path": "/title", "value": "Nuevo"},
+        {"op": "add", "path": "/steps/-", "value": {"question": "q3"}},
+        {"op": "add", "path": "/steps/1", "value": {"question": "q0"}},
+        {"op": "remove", "path": "/visual_config/primary_color"},
+    ])
+    assert result["title"] == "Nuevo"
+    assert [s.get("question") for s in result["steps"]] == [None, "q0", "q1", "q2", "q3"]
+    assert result["visual_config"] == {}
+
+
+def test_original_document_is_not_modified():
+    before = repr(DOC)
+    apply_patch(DOC, [{"op": "replace", "path": "/steps/0/title", "value": "x"},
+                      {"op": "remove", "path": "/steps/2"}])
+    assert repr(DOC) == before
+
+
+def test_move_copy_and_test():
+    result = apply_patch(DOC, [
+        {"op": "test", "path": "/steps/1/question", "value": "q1"},
+        {"op": "move", "from": "/steps/2", "path": "/steps/1"},
+        {"op": "copy", "from": "/title", "path": "/subtitle"},
+    ])
+    assert [s.get("question") for s in result["steps"]] == [None, "q2", "q1"]
+    assert result["subtitle"] == "Viejo"
+
+
+def test_escaped_pointer_segments():
+    result = apply_patch(DOC, [{"op": "replace", "path": "/a~1b", "value": 10},
+                               {"op": "remove", "path": "/m~0n"}])
+    assert result["a/b"] == 10 and "m~n" not in result
+
+
+def test_replace_root():
+    assert apply_patch(DOC, [{"op": "replace", "path": "", "value": {"x": 1}}]) == {"x": 1}
+
+
+@pytest.mark.parametrize("operations", [
+    [{"op": "replace", "path": "/nope", "value": 1}],
+    [{"op": "remove", "path": "/steps/3"}],
+    [{"op": "add", "path": "/steps/9", "value": 1}],
+    [{"op": "add", "path": "/steps/x", "value": 1}],
+    [{"op": "add", "path": "/title/sub", "value": 1}],
+    [{"op": "remove", "path": ""}],
+    [{"op": "test", "path": "/title", "value": "Otro"}],
+    [{"op": "explode", "path": "/title"}],
+    [{"op": "replace", "path": "title", "value": 1}],
+    [{"op": "replace", "path": 3, "value": 1}],
+    [{"op": "move", "path": "/title"}],
+    [{"op": "copy", "path": "/title"}],
+    [{"path": "/title", "value": 1}],
+    ["replace /title"],
+    [{"op": "replace", "path": "/steps/-1/question", "value": "x"}],
+    [{"op": "replace", "path": "/steps/+1/question", "value": "x"}],
+    [{"op": "replace", "path": "/steps/01/question", "value": "x"}],
+    [{"op": "replace", "path": "/steps/ 1/question", "value": "x"}],
+    [{"op": "remove", "path": "/steps/-1"}],
+    [{"op": "add", "path": "/steps/-1", "value": {}}],
+    [{"op": "test", "path": "/steps/-1", "value": {}}],
+    [{"op": "copy", "from": "/steps/-1", "path": "/x"}],
+    [{"op": "replace", "path": "/steps/-", "value": {}}],
+    [{"op": "add", "path": "/subtitle"}],
+    [{"op": "replace", "path": "/title"}],
+    [{"op": "test", "path": "/title"}],
+])
+def test_malformed_or_inapplicable_operations_raise_patch_error(operations):
+    with pytest.raises(PatchError):
+        apply_patch(DOC, operations)
+
+
+def test_explicit_null_value_is_kept():
+    assert apply_patch(DOC, [{"op": "replace", "path": "/title", "value": None}])["title"] is None
+
+
+def test_failed_patch_leaves_document_untouched():
+    before = repr(DOC)
+    with pytest.raises(PatchError):
+        apply_patch(DOC, [{"op": "remove", "path": "/title"}, {"op": "remove", "path": "/nope"}])
+    assert repr(DOC) == before
+
+
+def test_decode_operations_from_model_schema():
+    operations = decode_operations([
+        {"op": "replace", "path": "/title", "value_json": '"Hola"'},
+        {"op": "add", "path": "/steps/-", "value_json": '{"question": "q"}'},
+        {"op": "replace", "path": "/title", "value_json": "texto sin comillas"},
+        {"op": "move", "path": "/a", "from": "/b", "value_json": ""},
+    ])
+    assert operations == [
+        {"op": "replace", "path": "/title", "value": "Hola"},
+        {"op": "add", "path": "/steps/-", "value": {"question": "q"}},
+        {"op": "replace", "path": "/title", "value": "texto sin comillas"},
+        {"op": "move", "path": "/a", "from": "/b"},
+    ]
@@ -0,0 +1,40 @@
+import time
+
+from generation_cache import GenerationCache, generation_key
+
+GAME = {"title": "", "steps": []}
+
+
+def test_hit_after_set_and_equivalent_prompts_share_key():
+    cache = GenerationCache(max_entries=10, ttl=60)
+    key = generation_key("¡Cumpleaños de mi NOVIA!", GAME, "v1")
+    assert cache.get(key) is None
+    cache.set(key, {"reply": "ok"})
+    assert cache.get(generation_key("cumpleanos de mi novia", GAME, "v1")) == {"reply": "ok"}
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    cache = GenerationCache(max_entries=10, ttl=60)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    cache.set("k", {"reply": "ok"})
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert cache.get("k") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_new_prompt_version_or_game_changes_the_key():
+    key = generation_key("navidad", GAME, "v1")
+    assert generation_key("navidad", GAME, "v2") != key
+    assert generation_key("navidad", dict(GAME, title="Otro"), "v1") != key
+
+
+def test_lru_bound_and_disabled_cache():
+    cache = GenerationCache(max_entries=2, ttl=60)
+    for key in ("a", "b", "c"):
+        cache.set(key, key)
+    assert cache.get("a") is None and cache.get("c") == "c"
+    disabled = GenerationCache(max_entries=0)
+    disabled.set("a", "a")
+    assert disabled.get("a") is None
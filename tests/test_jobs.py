@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+
+from jobs import DEAD, DONE, PENDING, RUNNING, JobQueue, backoff_seconds
+
+app = Flask(__name__)
+app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+db = SQLAlchemy(app)
+
+
+class Job(db.Model):
+    """Mismas columnas que app.Job."""
+    __tablename__ = "jobs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.JSON, nullable=False, default=dict)
+    idempotency_key = db.Column(db.String(120), unique=True, nullable=True)
+    status = db.Column(db.String(20), nullable=False, default="pending")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(120), nullable=True)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+
+@pytest.fixture
+def queue():
+    with app.app_context():
+        db.create_all()
+        yield JobQueue(db, Job, max_attempts=3, lease=60)
+        db.session.remove()
+        db.drop_all()
+
+
+def test_enqueue_is_idempotent_by_key(queue):
+    first, created = queue.enqueue("deliver", {"game_id": "g1"}, key="evt_1")
+    again, created_again = queue.enqueue("deliver", {"game_id": "g1"}, key="evt_1")
+    assert created and not created_again and again.id == first.id
+    queue.enqueue("deliver", {"game_id": "g1"})
+    queue.enqueue("deliver", {"game_id": "g1"})
+    assert Job.query.count() == 3
+
+
+def test_claim_reserves_each_job_once(queue):
+    queue.enqueue("deliver", {})
+    claimed = queue.claim("w1", limit=5)
+    assert len(claimed) == 1
+    job = claimed[0]
+    assert (job.status, job.locked_by, job.attempts) == (RUNNING, "w1", 1)
+    assert queue.claim("w2", limit=5) == []
+
+
+def test_claim_skips_future_jobs_and_recovers_expired_leases(queue):
+    later, _ = queue.enqueue("deliver", {})
+    later.run_at = datetime.utcnow() + timedelta(minutes=5)
+    abandoned, _ = queue.enqueue("deliver", {})
+    abandoned.status, abandoned.attempts = RUNNING, 1
+    abandoned.locked_by, abandoned.locked_at = "muerto", datetime.utcnow() - timedelta(seconds=120)
+    db.session.commit()
+
+    claimed = queue.claim("w1", limit=5)
+    assert [job.id for job in claimed] == [abandoned.id]
+    assert (claimed[0].locked_by, claimed[0].attempts) == ("w1", 2)
+
+
+def test_successful_job_is_done(queue):
+    seen = []
+    queue.handler("deliver")(seen.append)
+    queue.enqueue("deliver", {"game_id": "g1"})
+    assert queue.run_pending("w1") == 1
+    job = Job.query.one()
+    assert seen == [{"game_id": "g1"}]
+    assert (job.status, job.locked_by, job.last_error) == (DONE, None, None)
+    assert job.finished_at is not None
+
+
+def test_failure_is_rescheduled_with_backoff(queue):
+    @queue.handler("deliver")
+    def deliver(payload):
+        raise RuntimeError("SMTP caído")
+
+    queue.enqueue("deliver", {})
+    before = datetime.utcnow()
+    queue.run_pending("w1")
+    job = Job.query.one()
+    assert (job.status, job.attempts) == (PENDING, 1)
+    assert job.last_error == "RuntimeError: SMTP caído"
+    assert job.run_at >= before + timedelta(seconds=25)
+    assert queue.claim("w1") == []  # Hasta run_at no se reintenta
+
+
+def test_max_attempts_sends_to_dead_letter_and_retry_dead_revives(queue):
+    queue.enqueue("sin_handler", {})
+    for attempt in range(3):
+        job = Job.query.one()
+        job.run_at = datetime.utcnow() - timedelta(seconds=1)  # Saltamos el backoff
+        db.session.commit()
+        assert queue.run_pending("w1") == 1
+    job = Job.query.one()
+    assert (job.status, job.attempts) == (DEAD, 3)
+    assert "LookupError" in job.last_error
+    assert queue.stats()["dead"] == 1
+
+    assert queue.retry_dead(job.id)
+    assert not queue.retry_dead(job.id)
+    job = Job.query.one()
+    assert (job.status, job.attempts, job.finished_at) == (PENDING, 0, None)
+
+
+@pytest.mark.parametrize("attempts, low, high", [(1, 27, 33), (2, 54, 66), (3, 108, 132), (20, 3240, 3960)])
+def test_backoff_grows_exponentially_with_cap(attempts, low, high):
+    for _ in range(20):
+        assert low <= backoff_seconds(attempts) <= high
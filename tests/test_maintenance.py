@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+
+from maintenance import purge_stale_drafts
+
+
+def age(web, game_id, created_days, updated_days):
+    """Envejece la fila con UPDATE directo (el listener pondría updated_at = ahora)."""
+    now = datetime.utcnow()
+    web.db.session.execute(
+        web.db.text("UPDATE experiences SET created_at = :c, updated_at = :u WHERE id = :id"),
+        {"c": now - timedelta(days=created_days),
+         "u": now - timedelta(days=updated_days) if updated_days is not None else None, "id": game_id})
+    web.db.session.commit()
+
+
+def test_purge_goes_by_inactivity_not_age(web, make_experience):
+    abandoned = make_experience()
+    edited_yesterday = make_experience()
+    legacy_row = make_experience()  # Anterior a la columna updated_at
+    chatting = make_experience()
+    paid = make_experience(is_paid=True)
+    with web.app.app_context():
+        age(web, abandoned, 40, 40)
+        age(web, edited_yesterday, 40, 40)
+        age(web, legacy_row, 40, None)
+        age(web, chatting, 40, 40)
+        age(web, paid, 40, 40)
+
+        # Un autosave de hoy sobre el borrador de hace 40 días
+        exp = web.db.session.get(web.Experience, edited_yesterday)
+        exp.game_data = dict(exp.game_data, title="Editado")
+        web.db.session.commit()
+        web.conversations.append(chatting, {"role": "user", "content": "hola"})
+
+        summary = purge_stale_drafts(web.db, web.draft_models, days=30)
+        remaining = {row.id for row in web.Experience.query.filter(
+            web.Experience.id.in_([abandoned, edited_yesterday, legacy_row, chatting, paid]))}
+
+    assert remaining == {edited_yesterday, chatting, paid}
+    assert summary["deleted"] >= 2
+
+
+def test_writes_refresh_updated_at(web, make_experience):
+    game_id = make_experience()
+    with web.app.app_context():
+        age(web, game_id, 10, 10)
+        exp = web.db.session.get(web.Experience, game_id)
+        exp.real_gift = "Cena"
+        web.db.session.commit()
+        assert datetime.utcnow() - exp.updated_at < timedelta(minutes=1)
@@ -0,0 +1,20 @@
+from metrics import Registry
+
+
+def test_collected_metric_reads_its_source_on_render():
+    registry = Registry()
+    depth = {"navidad": 2}
+    registry.collected("dw_depth", "Profundidad", lambda: [({"theme": t}, n) for t, n in depth.items()],
+                       labels=("theme",))
+    assert 'dw_depth{theme="navidad"} 2' in registry.render()
+    depth["navidad"] = 0
+    text = registry.render()
+    assert "# TYPE dw_depth gauge" in text
+    assert 'dw_depth{theme="navidad"} 0' in text
+
+
+def test_warm_pool_counters_are_exposed_in_metrics(web, client):
+    text = client.get("/metrics").get_data(as_text=True)
+    assert "# TYPE dw_warm_pool_hits_total counter" in text
+    assert f"dw_warm_pool_misses_total {web.warm_pool.misses}" in text
+    assert 'dw_warm_pool_depth{theme="navidad"} 0' in text
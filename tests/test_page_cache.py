@@ -0,0 +1,38 @@
+from page_cache import DiskPageBackend, PageCache
+
+
+def test_paid_page_is_cached_and_answers_304(web, client, make_experience):
+    game_id = make_experience(is_paid=True)
+    first = client.get(f"/experience/{game_id}")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert web.page_cache.get(game_id) is not None
+
+    again = client.get(f"/experience/{game_id}", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert not again.data
+
+
+def test_experience_changed_invalidates_the_page(web, client, make_experience):
+    game_id = make_experience(is_paid=True)
+    etag = client.get(f"/experience/{game_id}").headers["ETag"]
+    with web.app.app_context():
+        exp = web.Experience.query.get(game_id)
+        exp.game_data = dict(exp.game_data, title="Nuevo titulo")
+        web.db.session.commit()
+        web.experience_changed(exp)
+    assert web.page_cache.get(game_id) is None
+
+    r = client.get(f"/experience/{game_id}", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["ETag"] != etag
+    assert "Nuevo titulo" in r.get_data(as_text=True)
+
+
+def test_disk_backend_is_shared_and_invalidated(tmp_path):
+    backend = DiskPageBackend(str(tmp_path))
+    writer, reader = PageCache(backend=backend), PageCache(backend=backend)
+    page = writer.set("g1", "<html>hola</html>", 0.2)
+    assert reader.get("g1").etag == page.etag
+    writer.invalidate("g1")
+    assert PageCache(backend=backend).get("g1") is None
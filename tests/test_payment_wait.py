@@ -0,0 +1,51 @@
+import threading
+
+import pytest
+
+MULTITHREAD = {"wsgi.multithread": True}
+
+
+@pytest.fixture
+def db_reads(web, monkeypatch):
+    """Cuenta las consultas de payment_paid() (lo que cuesta cada cliente esperando)."""
+    calls = []
+    original = web.payment_paid
+
+    def counted(game_id):
+        calls.append(game_id)
+        return original(game_id)
+
+    monkeypatch.setattr(web, "payment_paid", counted)
+    return calls
+
+
+def test_already_paid_answers_at_once(web, client, make_experience, db_reads):
+    game_id = make_experience(is_paid=True)
+    response = client.get(f"/payment_status/{game_id}/wait", environ_overrides=MULTITHREAD)
+    assert response.get_json() == {"paid": True}
+    assert response.headers["Cache-Control"] == "no-store"
+    assert db_reads == [game_id]
+
+
+def test_waiter_wakes_on_publish_with_a_single_db_read(web, client, make_experience, db_reads):
+    game_id = make_experience()
+    timer = threading.Timer(0.1, web.payment_events.publish, (web.payment_channel(game_id), {"paid": True}))
+    timer.start()
+    response = client.get(f"/payment_status/{game_id}/wait", environ_overrides=MULTITHREAD)
+    timer.join()
+    assert response.get_json() == {"paid": True}
+    assert db_reads == [game_id]
+
+
+def test_timeout_without_polling_the_db(web, client, make_experience, db_reads, monkeypatch):
+    monkeypatch.setattr(web, "PAYMENT_WAIT_TIMEOUT", 0.3)
+    game_id = make_experience()
+    response = client.get(f"/payment_status/{game_id}/wait", environ_overrides=MULTITHREAD)
+    assert response.get_json() == {"paid": False, "timeout": True}
+    assert db_reads == [game_id]
+
+
+def test_sync_worker_does_not_block(web, client, make_experience):
+    game_id = make_experience()
+    response = client.get(f"/payment_status/{game_id}/wait", environ_overrides={"wsgi.multithread": False})
+    assert response.get_json() == {"paid": False, "retry_ms": web.PAYMENT_WAIT_TIMEOUT * 1000}
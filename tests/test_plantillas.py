@@ -0,0 +1,52 @@
+import json
+import os
+
+from plantillas import TemplateRegistry
+
+
+def game(title):
+    return {"title": title, "steps": [{"type": "intro", "title": title, "text": "hola"},
+                                      {"type": "question", "question": "¿2+2?", "answer": "4"}]}
+
+
+def write(path, data, mtime):
+    path.write_text(json.dumps(data), encoding="utf-8")
+    os.utime(path, ns=(mtime, mtime))
+
+
+def test_registry_reloads_on_mtime_change(tmp_path):
+    path = tmp_path / "navidad.json"
+    write(path, game("Uno"), 1_000_000_000)
+    registry = TemplateRegistry(str(tmp_path), check_interval=0)
+
+    first = registry.get("navidad")
+    version = registry.manifest()["version"]
+    assert first.data["title"] == "Uno"
+    assert registry.get("navidad") is first  # Sin cambios en disco no se relee
+
+    write(path, game("Dos"), 2_000_000_000)
+    second = registry.get("navidad")
+    assert second.data["title"] == "Dos"
+    assert second.etag != first.etag
+    assert registry.manifest()["version"] != version
+    assert registry.stats()["reloads"] == 1
+
+
+def test_invalid_edit_keeps_previous_version(tmp_path):
+    path = tmp_path / "navidad.json"
+    write(path, game("Uno"), 1_000_000_000)
+    registry = TemplateRegistry(str(tmp_path), check_interval=0)
+    assert registry.get("navidad").data["title"] == "Uno"
+
+    path.write_text("{roto", encoding="utf-8")
+    os.utime(path, ns=(2_000_000_000, 2_000_000_000))
+    assert registry.get("navidad").data["title"] == "Uno"
+    assert registry.stats()["invalid"] == 1
+
+
+def test_check_interval_throttles_disk_checks(tmp_path):
+    write(tmp_path / "navidad.json", game("Uno"), 1_000_000_000)
+    registry = TemplateRegistry(str(tmp_path), check_interval=3600)
+    registry.get("navidad")
+    registry.get("navidad")
+    assert registry.stats()["checks"] == 1
@@ -0,0 +1,85 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("google.genai")
+
+from prompt_builder import PromptAssembler, compact_json  # noqa: E402
+
+
+class SlowCaches:
+    """caches.create de mentira: tarda y cuenta las llamadas."""
+
+    def __init__(self, delay=0.2, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("cuota")
+        return SimpleNamespace(name=f"cachedContents/{self.calls}")
+
+
+def assembler(caches, **options):
+    return PromptAssembler(SimpleNamespace(caches=caches), "modelo", "sistema", **options)
+
+
+def test_cache_is_created_once_and_other_threads_do_not_wait():
+    caches = SlowCaches()
+    prompts = assembler(caches)
+    names = []
+    threads = [threading.Thread(target=lambda: names.append(prompts.system_cache_name())) for _ in range(6)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    # Mientras se crea la caché el lock está libre: record_usage no se bloquea
+    prompts.record_usage(SimpleNamespace(prompt_token_count=10, cached_content_token_count=0,
+                                         candidates_token_count=5))
+    assert time.monotonic() - started < caches.delay
+    for thread in threads:
+        thread.join()
+
+    assert caches.calls == 1
+    assert names.count("cachedContents/1") == 1 and names.count(None) == 5
+    assert prompts.system_cache_name() == "cachedContents/1"
+    assert prompts.usage["prompt_tokens"] == 10
+
+
+def test_failed_creation_disables_cache_until_retry_after():
+    caches = SlowCaches(delay=0, fail=True)
+    prompts = assembler(caches, retry_after=600)
+    assert prompts.system_cache_name() is None
+    assert prompts.system_cache_name() is None
+    assert caches.calls == 1
+
+
+def test_expiring_cache_is_refreshed_while_old_name_keeps_serving():
+    caches = SlowCaches(delay=0.2)
+    prompts = assembler(caches, cache_ttl=3600)
+    assert prompts.system_cache_name() == "cachedContents/1"
+    prompts._cache_expires = time.time() + 30  # Dentro del margen de 60 s: toca renovar
+    refresher = threading.Thread(target=prompts.system_cache_name)
+    refresher.start()
+    time.sleep(0.05)
+    assert prompts.system_cache_name() == "cachedContents/1"
+    refresher.join()
+    assert prompts.system_cache_name() == "cachedContents/2"
+
+
+def test_compact_history_summarizes_old_turns():
+    prompts = assembler(SlowCaches(), token_budget=10, keep_recent=2, use_cache=False)
+    history = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"mensaje {i} " * 20} for i in range(6)]
+    compacted = prompts.compact_history(history)
+    assert len(compacted) == 4 and compacted[2:] == history[-2:]
+    assert compacted[0]["content"].startswith("RESUMEN DE PETICIONES ANTERIORES")
+    assert prompts.usage["compactions"] == 1
+
+
+def test_compact_json_has_no_spaces():
+    assert compact_json({"a": [1, 2], "b": "ñ"}) == '{"a":[1,2],"b":"ñ"}'
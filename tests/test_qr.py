@@ -0,0 +1,32 @@
+import pytest
+
+pytest.importorskip("qrcode")
+
+
+def test_qr_is_rendered_once_and_answers_304_to_its_etag(web, client, make_experience):
+    game_id = make_experience(is_paid=True)
+    renders = web.qr_store.renders
+
+    first = client.get(f"/qr/{game_id}.svg")
+    assert first.status_code == 200
+    assert first.mimetype == "image/svg+xml"
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "public, max-age=86400"
+
+    again = client.get(f"/qr/{game_id}.svg", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["ETag"] == etag
+    assert not again.data
+    assert web.qr_store.renders == renders + 1
+
+
+def test_versioned_qr_url_is_immutable(client, make_experience):
+    game_id = make_experience(is_paid=True)
+    etag = client.get(f"/qr/{game_id}.png").headers["ETag"].strip('"')
+    r = client.get(f"/qr/{game_id}.png?v={etag[:12]}")
+    assert "immutable" in r.headers["Cache-Control"]
+
+
+def test_qr_of_unpaid_experience_or_unknown_format_is_404(client, make_experience):
+    assert client.get(f"/qr/{make_experience()}.png").status_code == 404
+    assert client.get(f"/qr/{make_experience(is_paid=True)}.gif").status_code == 404
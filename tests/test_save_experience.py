@@ -0,0 +1,74 @@
+import json
+
+import pytest
+from sqlalchemy import event
+
+
+@pytest.fixture
+def creator(client, make_experience):
+    """Cliente con un borrador propio en la sesión; devuelve (cliente, game_id)."""
+    game_id = make_experience()
+    with client.session_transaction() as session:
+        session["current_game_id"] = game_id
+    return client, game_id
+
+
+def save(client, **body):
+    return client.post("/save_experience", json=body)
+
+
+def test_stale_base_version_is_a_conflict(web, creator):
+    client, game_id = creator
+    data = web.new_game_data()
+    first = save(client, base_version=1, game_data=dict(data, title="Uno")).get_json()
+    assert first["version"] == 2
+
+    r = save(client, base_version=1, game_data=dict(data, title="Dos"))
+    assert r.status_code == 409
+    body = r.get_json()
+    assert body["conflict"] and body["version"] == 2
+    assert body["game_data"]["title"] == "Uno"
+
+
+def test_unchanged_payload_skips_the_write(web, creator):
+    client, game_id = creator
+    with web.app.app_context():
+        game_data = web.Experience.query.get(game_id).game_data
+    writes = web.save_stats["writes"]
+
+    body = save(client, base_version=1, game_data=game_data).get_json()
+    assert body == {"success": True, "skipped": True, "version": 1}
+    assert web.save_stats["writes"] == writes
+    with web.app.app_context():
+        assert web.Experience.query.get(game_id).version == 1
+
+
+def test_webhook_racing_an_autosave_still_marks_paid(web, client, make_experience, monkeypatch):
+    game_id = make_experience()
+    monkeypatch.setattr(web.stripe.Webhook, "construct_event", lambda *args: None)
+    raced = []
+
+    def autosave(session, flush_context, instances):
+        # Un autosave sube la versión justo antes del UPDATE del webhook
+        if not raced:
+            raced.append(True)
+            session.connection().execute(
+                web.db.text("UPDATE experiences SET version = version + 1 WHERE id = :id"), {"id": game_id})
+
+    event_body = {"id": f"evt_{game_id}", "type": "checkout.session.completed",
+                  "data": {"object": {"metadata": {"game_id": game_id},
+                                      "customer_details": {"email": "comprador@example.com"}}}}
+    with web.app.app_context():
+        event.listen(web.db.session, "before_flush", autosave)
+    try:
+        r = client.post("/webhook", data=json.dumps(event_body))
+    finally:
+        with web.app.app_context():
+            event.remove(web.db.session, "before_flush", autosave)
+
+    assert r.status_code == 200
+    assert raced
+    with web.app.app_context():
+        exp = web.Experience.query.get(game_id)
+        assert exp.is_paid and exp.customer_email == "comprador@example.com"
+        assert web.Job.query.filter_by(idempotency_key=f"evt_{game_id}").count() == 1
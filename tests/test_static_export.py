@@ -0,0 +1,55 @@
+import base64
+
+import pytest
+
+from static_export import ExportError, check_self_contained, inline_assets, minify_html
+
+
+def test_minifier_keeps_double_slashes_in_strings_and_urls():
+    html = """<script>
+        const api = "https://example.com/api"; // comentario al final
+        const proto = '//cdn.example.com/x.js';
+        const re = /a\\/\\/b/;
+    </script>
+    <a href="https://example.com/a//b">enlace</a>"""
+    out = minify_html(html)
+    assert 'const api = "https://example.com/api"; // comentario al final\n' in out
+    assert "const proto = '//cdn.example.com/x.js';" in out
+    assert "const re = /a\\/\\/b/;" in out
+    assert 'href="https://example.com/a//b"' in out
+
+
+def test_minifier_leaves_pre_untouched():
+    html = "<div>\n    <pre>  uno\n\n  dos</pre>\n</div>"
+    assert "<pre>  uno\n\n  dos</pre>" in minify_html(html)
+
+
+@pytest.fixture
+def static_folder(tmp_path):
+    dist = tmp_path / "dist"
+    (dist / "webfonts").mkdir(parents=True)
+    (dist / "tailwind.abc.css").write_text(".p-4{padding:1rem}")
+    (dist / "webfonts" / "fa-solid-900.abc.woff2").write_bytes(b"FUENTE")
+    (dist / "webfonts" / "fontawesome.abc.css").write_text(
+        '@font-face{src:url(fa-solid-900.abc.woff2) format("woff2")}.fa-star:before{content:"\\f005"}')
+    return str(tmp_path)
+
+
+def test_built_assets_and_fonts_are_inlined(static_folder):
+    html = ('<link rel="stylesheet" href="/assets/tailwind.abc.css">'
+            '<link rel="preload" href="/assets/webfonts/fa-solid-900.abc.woff2" as="font" type="font/woff2" crossorigin>'
+            '<link rel="stylesheet" href="/assets/webfonts/fontawesome.abc.css">')
+    out = inline_assets(html, static_folder)
+    assert "<link" not in out
+    assert ".p-4{padding:1rem}" in out
+    assert f"url(data:font/woff2;base64,{base64.b64encode(b'FUENTE').decode()})" in out
+    check_self_contained(out)
+
+
+def test_export_without_built_assets_fails():
+    html = ('<script src="https://cdn.tailwindcss.com"></script>'
+            '<link href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css" rel="stylesheet">')
+    with pytest.raises(ExportError) as e:
+        check_self_contained(html)
+    assert "cdn.tailwindcss.com" in str(e.value)
+    assert "cdnjs.cloudflare.com" in str(e.value)
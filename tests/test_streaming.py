@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+from game_schema import is_valid_game, normalize_game
+from streaming import JSON_DELIMITER, ReplyStreamParser
+
+GAME = {
+    "title": "Escape {de} \"prueba\"",
+    "visual_config": {"primary_color": "#112233", "bg_color": "#000000",
+                      "font_family": "Montserrat", "theme_icon": "fa-solid fa-banana"},
+    "steps": [
+        {"type": "intro", "title": "Hola }", "subtitle": "Llaves { dentro de texto"},
+        {"type": "level", "level_title": "Uno", "question": "¿2+2?", "answer": "4"},
+    ],
+}
+REPLY = f"Aquí tienes tu juego.{JSON_DELIMITER}```json\n{json.dumps(GAME, ensure_ascii=False)}\n```"
+
+
+def feed_in_chunks(parser, text, size):
+    events = []
+    for i in range(0, len(text), size):
+        events.extend(parser.feed(text[i:i + size]))
+    events.extend(parser.finish())
+    return events
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 15, 16, 64, len(REPLY)])
+def test_any_chunk_boundary_gives_same_prose_and_json(size):
+    parser = ReplyStreamParser(validate=is_valid_game)
+    events = feed_in_chunks(parser, REPLY, size)
+
+    prose = "".join(data for event, data in events if event == "delta")
+    assert prose == "Aquí tienes tu juego."
+    assert JSON_DELIMITER not in prose
+    assert [data for event, data in events if event == "json"] == [GAME]
+    assert parser.new_json == GAME
+
+
+def test_delimiter_split_across_chunks_is_not_emitted_as_prose():
+    parser = ReplyStreamParser()
+    head, tail = JSON_DELIMITER[:5], JSON_DELIMITER[5:]
+    events = parser.feed("Texto" + head) + parser.feed(tail + "{}")
+    assert events == [("delta", "Texto"), ("json", {})]
+
+
+def test_text_after_the_json_is_ignored():
+    parser = ReplyStreamParser()
+    parser.feed(f"a{JSON_DELIMITER}" + '{"x": 1}')
+    assert parser.done
+    assert parser.feed("más texto") == []
+    assert parser.finish() == []
+
+
+def test_invalid_game_is_not_emitted():
+    parser = ReplyStreamParser(validate=is_valid_game)
+    events = feed_in_chunks(parser, f"a{JSON_DELIMITER}" + '{"steps": []}', 4)
+    assert [event for event, _ in events] == ["delta"]
+    assert parser.new_json is None
+
+
+def test_finish_parses_unbalanced_fenced_json():
+    # Sin la llave de cierre el escáner no parsea; finish() lo intenta con el búfer entero
+    parser = ReplyStreamParser()
+    parser.feed(f"a{JSON_DELIMITER}```json\n" + '{"x": "}"')
+    assert not parser.done
+    assert parser.finish() == []
+
+
+def test_normalize_runs_on_accepted_json():
+    parser = ReplyStreamParser(validate=is_valid_game, normalize=normalize_game)
+    feed_in_chunks(parser, REPLY.replace("fa-solid fa-banana", "fa-solid fa-brain"), 5)
+    assert parser.new_json["visual_config"]["theme_icon"] == "fa-brain"
+
+    parser = ReplyStreamParser(validate=is_valid_game, normalize=normalize_game)
+    feed_in_chunks(parser, REPLY, 5)
+    assert parser.new_json["visual_config"]["theme_icon"] == "fa-puzzle-piece"
+
+
+def test_prose_without_delimiter_is_flushed_on_finish():
+    parser = ReplyStreamParser()
+    events = feed_in_chunks(parser, "Solo prosa, sin JSON", 3)
+    assert "".join(data for _, data in events) == "Solo prosa, sin JSON"
+    assert parser.new_json is None
+
+
+@pytest.mark.parametrize("bad", ['{"steps": [}', '{"steps": []}', "{'comillas': 'simples'}"])
+@pytest.mark.parametrize("size", [1, 5, 4096])
+def test_bad_object_is_skipped_and_next_one_is_parsed(bad, size):
+    # Un objeto cerrado que no parsea o no valida no debe bloquear el siguiente
+    text = f"Va.{JSON_DELIMITER}{bad}\n{json.dumps(GAME, ensure_ascii=False)}"
+    parser = ReplyStreamParser(validate=is_valid_game)
+    chunks = [text[i:i + size] for i in range(0, len(text), size)]
+    streamed = [event for chunk in chunks for event, _ in parser.feed(chunk)]
+    assert "json" in streamed  # Antes de finish(): sin esperar al final del stream
+    assert parser.new_json == GAME
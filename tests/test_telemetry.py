@@ -0,0 +1,62 @@
+import pytest
+
+from telemetry import MAX_MS, ROLLUP_COUNTERS, normalize_event, rollup_deltas
+
+
+def event(kind, level=0, ok=None, ms=None, game_id="g1"):
+    return {"game_id": game_id, "session_id": "s1", "kind": kind, "level": level, "ok": ok, "ms": ms}
+
+
+def zeros(**counters):
+    return dict(dict.fromkeys(ROLLUP_COUNTERS, 0), **counters)
+
+
+def test_rollup_of_a_full_play():
+    rows = [
+        event("start"),
+        event("view", 1), event("attempt", 1, ok=False), event("attempt", 1, ok=True, ms=3000),
+        event("view", 2), event("attempt", 2, ok=True, ms=1000),
+        event("finish", ms=9000),
+    ]
+    assert rollup_deltas(rows) == {
+        ("g1", 0): zeros(views=1, completions=1, total_ms=9000),
+        ("g1", 1): zeros(views=1, attempts=2, failures=1, completions=1, total_ms=3000),
+        ("g1", 2): zeros(views=1, attempts=1, completions=1, total_ms=1000),
+    }
+
+
+def test_start_and_finish_always_count_on_level_zero():
+    deltas = rollup_deltas([event("start", 3), event("finish", 3, ms=10)])
+    assert list(deltas) == [("g1", 0)]
+    assert deltas[("g1", 0)] == zeros(views=1, completions=1, total_ms=10)
+
+
+def test_failures_add_no_time_and_missing_ms_counts_as_zero():
+    deltas = rollup_deltas([event("attempt", 1, ok=False, ms=500), event("attempt", 1, ok=True)])
+    assert deltas[("g1", 1)] == zeros(attempts=2, failures=1, completions=1)
+
+
+def test_rollup_groups_by_game_and_level():
+    deltas = rollup_deltas([event("view", 1), event("view", 1), event("view", 1, game_id="g2")])
+    assert deltas[("g1", 1)]["views"] == 2 and deltas[("g2", 1)]["views"] == 1
+    assert rollup_deltas([]) == {}
+
+
+def test_normalize_event_accepts_beacon_fields():
+    assert normalize_event({"k": "attempt", "l": 2, "ok": 1, "ms": 1500.7}, "g1", "s1") == \
+        {"game_id": "g1", "session_id": "s1", "kind": "attempt", "level": 2, "ok": True, "ms": 1500}
+    assert normalize_event({"k": "view", "l": 1, "ok": True}, "g1", "s1")["ok"] is None
+    assert normalize_event({"k": "finish", "ms": 10 ** 12}, "g1", "s1")["ms"] == MAX_MS
+
+
+@pytest.mark.parametrize("raw", [
+    None, "view", {}, {"k": "hack"}, {"k": "view", "l": -1}, {"k": "view", "l": 51},
+    {"k": "view", "l": True}, {"k": "view", "l": "1"},
+])
+def test_normalize_event_rejects_garbage(raw):
+    assert normalize_event(raw, "g1", "s1") is None
+
+
+def test_normalize_event_drops_invalid_ms():
+    for ms in (-5, "10", True):
+        assert normalize_event({"k": "finish", "ms": ms}, "g1", "s1")["ms"] is None
@@ -0,0 +1,79 @@
+import asyncio
+import threading
+
+import pytest
+
+from variants import TooManyVariants, VariantRunner
+
+
+def _blocking(release):
+    def task():
+        release.wait(5)
+        return {"title": "x"}
+    return task
+
+
+def test_cancelled_batch_counts_until_its_calls_finish():
+    runner = VariantRunner(max_workers=2, max_per_user=2)
+    release = threading.Event()
+    batch = runner.start("u1", [_blocking(release), _blocking(release)])
+    batch.cancel()  # Ya están en ejecución: no se pueden cancelar
+    with pytest.raises(TooManyVariants):
+        runner.start("u1", [_blocking(release)])
+    release.set()
+    for future in batch.futures:
+        future.exception(timeout=5)
+    runner.start("u1", [lambda: None, lambda: None])
+
+
+def test_discarded_batch_is_not_returned_but_still_counts():
+    runner = VariantRunner(max_workers=1, max_per_user=1)
+    release = threading.Event()
+    batch = runner.start("u1", [_blocking(release)])
+    runner.discard(batch.id)
+    assert runner.get(batch.id, "u1") is None
+    with pytest.raises(TooManyVariants):
+        runner.start("u1", [lambda: None])
+    release.set()
+    next(iter(batch.futures)).result(timeout=5)
+    runner.start("u1", [lambda: None])
+    assert batch.id not in runner._batches
+
+
+def test_queued_variants_are_cancelled():
+    runner = VariantRunner(max_workers=1, max_per_user=3)
+    release = threading.Event()
+    batch = runner.start("u1", [_blocking(release), _blocking(release)])
+    batch.cancel()
+    queued = [f for f, i in batch.futures.items() if i == 1][0]
+    assert queued.cancelled()
+    release.set()
+
+
+def test_non_numeric_n_and_index_are_rejected(web, client):
+    r = client.post("/chat/variants", json={"message": "hola", "n": "muchas"})
+    assert r.status_code == 400
+
+    batch = web.variant_runner.start("127.0.0.1", [lambda: ("ok", {})])
+    r = client.post(f"/chat/variants/{batch.id}/choose", json={"index": "primera"})
+    assert r.status_code == 400
+    web.variant_runner.discard(batch.id)
+
+
+def test_async_batch_shares_the_limit_and_is_cancelled_from_another_thread():
+    async def scenario():
+        runner = VariantRunner(max_per_user=2)
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+
+        batch = runner.start_async("u1", [slow, slow])
+        with pytest.raises(TooManyVariants):
+            runner.start("u1", [lambda: None])
+        await asyncio.to_thread(runner.discard, batch.id)  # Como /choose desde un hilo de Flask
+        results = [outcome async for outcome in batch.iter_results_async()]
+        assert results == [] and batch.finished()
+        runner.start("u1", [lambda: None, lambda: None])
+
+    asyncio.run(scenario())
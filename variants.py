@@ -0,0 +1,151 @@
+# variants.py
+# ==========================================================================
+# GENERACIÓN DE VARIANTES EN PARALELO (CANDIDATOS LADO A LADO)
+# ==========================================================================
+import asyncio
+import threading
+import time
+import uuid
+from concurrent.futures import CancelledError, ThreadPoolExecutor, as_completed
+
+
+class TooManyVariants(Exception):
+    """El usuario ya tiene demasiadas generaciones de variantes en curso."""
+
+
+class VariantBatch:
+    def __init__(self, owner, futures, loop=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.owner = owner
+        self.futures = futures  # {future: índice} (concurrent.futures o tareas asyncio de 'loop')
+        self.loop = loop
+        self.results = {}
+        self.cancelled = threading.Event()
+        self.discarded = False
+        self.created_at = time.time()
+
+    def cancel(self):
+        """
+        Cancela solo las variantes que aún esperan en la cola del pool. Las que ya
+        se están ejecutando no se pueden interrumpir (un hilo no se para desde
+        fuera): terminan su llamada, su resultado se descarta y hasta entonces
+        siguen contando para el límite del usuario.
+        """
+        self.cancelled.set()
+        if self.loop is None:
+            self._cancel_futures()
+            return
+        try:
+            # Las tareas asyncio solo se tocan desde su event loop (discard() llega desde un hilo de Flask)
+            self.loop.call_soon_threadsafe(self._cancel_futures)
+        except RuntimeError:  # Loop ya cerrado: sus tareas no siguen
+            pass
+
+    def _cancel_futures(self):
+        for future in self.futures:
+            future.cancel()
+
+    def finished(self):
+        return all(future.done() for future in self.futures)
+
+    def iter_results(self):
+        """Itera (índice, resultado o excepción) según van terminando, hasta que se cancele."""
+        for future in as_completed(self.futures):
+            if self.cancelled.is_set():
+                return
+            outcome = self._outcome(future)
+            if outcome:
+                yield outcome
+
+    async def iter_results_async(self):
+        """Igual que iter_results() para un lote de tareas asyncio (asgi.py)."""
+        pending = set(self.futures)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in sorted(done, key=self.futures.get):
+                if self.cancelled.is_set():
+                    return
+                outcome = self._outcome(future)
+                if outcome:
+                    yield outcome
+
+    def _outcome(self, future):
+        """(índice, resultado o excepción) de un future terminado; None si se canceló."""
+        index = self.futures[future]
+        try:
+            result = future.result()
+        except (CancelledError, asyncio.CancelledError):
+            return None
+        except Exception as e:
+            return index, e
+        self.results[index] = result
+        return index, result
+
+
+class VariantRunner:
+    """
+    Reparte las variantes en un pool de hilos acotado y limita cuántas
+    llamadas concurrentes puede tener en vuelo cada usuario. Un lote
+    cancelado o descartado cuenta mientras le quede alguna llamada sin
+    terminar: cancelar y relanzar no sirve para saltarse el límite.
+    """
+
+    def __init__(self, max_workers=6, max_per_user=3, ttl=600):
+        self.max_per_user = max_per_user
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="variants")
+        self._batches = {}
+        self._lock = threading.Lock()
+
+    def _in_flight(self, owner):
+        return sum(
+            1 for batch in self._batches.values() if batch.owner == owner
+            for future in batch.futures if not future.done()
+        )
+
+    def start(self, owner, tasks):
+        """tasks: lista de callables sin argumentos, una por variante."""
+        with self._lock:
+            self._expire()
+            if self._in_flight(owner) + len(tasks) > self.max_per_user:
+                raise TooManyVariants()
+            futures = {self._executor.submit(task): i for i, task in enumerate(tasks)}
+            batch = VariantBatch(owner, futures)
+            self._batches[batch.id] = batch
+            return batch
+
+    def start_async(self, owner, tasks):
+        """
+        Como start() pero con funciones async sin argumentos, lanzadas como tareas
+        del event loop en curso (asgi.py). Comparte límite y registro con start():
+        la elección posterior pasa por Flask y busca el lote con get().
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._expire()
+            if self._in_flight(owner) + len(tasks) > self.max_per_user:
+                raise TooManyVariants()
+            futures = {loop.create_task(task()): i for i, task in enumerate(tasks)}
+            batch = VariantBatch(owner, futures, loop=loop)
+            self._batches[batch.id] = batch
+            return batch
+
+    def get(self, batch_id, owner):
+        with self._lock:
+            batch = self._batches.get(batch_id)
+            return batch if batch and batch.owner == owner and not batch.discarded else None
+
+    def discard(self, batch_id):
+        """Ya no se puede elegir; se queda registrado hasta que terminen sus llamadas en curso."""
+        with self._lock:
+            batch = self._batches.get(batch_id)
+            if batch:
+                batch.discarded = True
+        if batch:
+            batch.cancel()
+
+    def _expire(self):
+        now = time.time()
+        for batch_id, batch in list(self._batches.items()):
+            if (batch.discarded or now - batch.created_at > self.ttl) and batch.finished():
+                del self._batches[batch_id]
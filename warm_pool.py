@@ -0,0 +1,150 @@
+# warm_pool.py
+# ==========================================================================
+# POOL CALIENTE DE EXPERIENCIAS PRE-GENERADAS POR TEMÁTICA
+# ==========================================================================
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from generation_cache import normalize_prompt
+
+# Temáticas de static/plantillas: palabras clave (normalizadas) + prompt de apertura
+THEMES = {
+    "navidad": (("navidad", "navideno", "navidena", "christmas", "reyes magos"),
+                "Una experiencia navideña elegante para regalar en Navidad"),
+    "cumpleanos": (("cumpleanos", "cumple", "birthday"),
+                   "Una experiencia de cumpleaños sorprendente y personal"),
+    "san_valentin": (("san valentin", "valentin", "aniversario", "novia", "novio", "pareja"),
+                     "Una experiencia romántica para San Valentín"),
+    "hacker": (("hacker", "hackers", "ciberseguridad", "matrix"),
+               "Una experiencia de estética hacker con códigos y criptografía"),
+    "detective": (("detective", "misterio", "crimen", "sherlock"),
+                  "Una experiencia de detective con un misterio por resolver"),
+    "escape": (("escape", "escape room"),
+               "Un mini escape room con códigos y pistas encadenadas"),
+}
+
+
+def match_theme(prompt, max_words=4):
+    """
+    Devuelve la temática si el prompt de apertura es genérico ('navidad familiar').
+    Las ideas largas y personalizadas merecen una generación a medida.
+    """
+    text = normalize_prompt(prompt)
+    if not text or len(text.split()) > max_words:
+        return None
+    padded = f" {text} "
+    for theme, (keywords, _) in THEMES.items():
+        if any(f" {keyword} " in padded for keyword in keywords):
+            return theme
+    return None
+
+
+class WarmPool:
+    """
+    Mantiene 'depth' juegos frescos por temática. Un hilo de fondo detecta
+    huecos y los rellena en un ThreadPoolExecutor de concurrencia acotada.
+
+    generate(prompt) debe devolver (reply, new_json) ya validado, o None.
+    """
+
+    def __init__(self, generate, themes=THEMES, depth=2, max_workers=2, max_age=6 * 3600, interval=30):
+        self.generate = generate
+        self.themes = themes
+        self.depth = depth
+        self.max_age = max_age
+        self.interval = interval
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="warm-pool")
+        self._pools = {theme: deque() for theme in themes}
+        self._inflight = {theme: 0 for theme in themes}
+        self._deficit_since = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+        self.last_refill_lag = 0.0
+        self.max_refill_lag = 0.0
+
+    @property
+    def enabled(self):
+        return self.depth > 0
+
+    def start(self):
+        if not self.enabled or self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name="warm-pool-refill", daemon=True)
+        self._thread.start()
+
+    def take(self, theme):
+        """Entrega un juego pre-generado de la temática (o None) y pide reponerlo."""
+        if not self.enabled or theme not in self._pools:
+            return None
+        now = time.time()
+        with self._lock:
+            pool = self._pools[theme]
+            while pool and now - pool[0][0] > self.max_age:
+                pool.popleft()
+            item = pool.popleft()[1] if pool else None
+            if item:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self._deficit_since.setdefault(theme, now)
+        self._wake.set()
+        return item
+
+    def _run(self):
+        while True:
+            self._schedule_refills()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def _schedule_refills(self):
+        now = time.time()
+        with self._lock:
+            for theme, pool in self._pools.items():
+                while pool and now - pool[0][0] > self.max_age:
+                    pool.popleft()
+                missing = self.depth - len(pool) - self._inflight[theme]
+                if missing > 0:
+                    self._deficit_since.setdefault(theme, now)
+                for _ in range(max(missing, 0)):
+                    self._inflight[theme] += 1
+                    self._executor.submit(self._refill, theme)
+
+    def _refill(self, theme):
+        try:
+            result = self.generate(self.themes[theme][1])
+        except Exception as e:
+            print(f"⚠️ Warm pool ({theme}): {e}")
+            result = None
+        now = time.time()
+        with self._lock:
+            self._inflight[theme] -= 1
+            if result is None:
+                self.failures += 1
+                return
+            self._pools[theme].append((now, result))
+            if len(self._pools[theme]) >= self.depth and theme in self._deficit_since:
+                self.last_refill_lag = now - self._deficit_since.pop(theme)
+                self.max_refill_lag = max(self.max_refill_lag, self.last_refill_lag)
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "depth": {theme: len(pool) for theme, pool in self._pools.items()},
+                "target_depth": self.depth,
+                "inflight": sum(self._inflight.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+                "failures": self.failures,
+                "refill_lag_s": round(self.last_refill_lag, 2),
+                "max_refill_lag_s": round(self.max_refill_lag, 2),
+                "oldest_deficit_s": round(max((now - t for t in self._deficit_since.values()), default=0), 2),
+            }
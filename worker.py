@@ -0,0 +1,72 @@
+# worker.py
+# ==========================================================================
+# WORKER DE LA COLA DE TRABAJOS (ENTREGAS TRAS EL PAGO)
+# ==========================================================================
+#   python worker.py                 # bucle (Ctrl+C para parar)
+#   python worker.py --threads 4     # varios workers en el mismo proceso
+#   python worker.py --once          # procesa lo pendiente y sale
+#   python worker.py --stats
+#   python worker.py --retry-dead 42 # devuelve un trabajo muerto a la cola
+#   python worker.py --maintenance-every 24  # además, encola la purga de borradores (y de telemetría antigua) cada 24h
+import argparse
+import json
+import os
+import threading
+
+# Este proceso ya es el worker: el servidor web no debe arrancar otro dentro
+os.environ["JOB_INLINE_WORKER"] = "0"
+
+from app import app, db, job_queue  # noqa: E402
+from migrations import upgrade_schema  # noqa: E402
+from maintenance import schedule_purge  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker de la cola de trabajos")
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--poll", type=float, default=2.0, help="Segundos de espera con la cola vacía")
+    parser.add_argument("--once", action="store_true")
+    parser.add_argument("--stats", action="store_true")
+    parser.add_argument("--retry-dead", type=int, metavar="JOB_ID")
+    parser.add_argument("--maintenance-every", type=float, metavar="HORAS",
+                        help="Programa la purga de borradores abandonados")
+    args = parser.parse_args()
+
+    with app.app_context():
+        upgrade_schema(db)
+        if args.stats:
+            print(json.dumps(job_queue.stats(), indent=2))
+            return
+        if args.retry_dead is not None:
+            ok = job_queue.retry_dead(args.retry_dead)
+            print("🔁 Trabajo reencolado" if ok else "⚠️ No existe o no está en dead-letter")
+            return
+        if args.once:
+            total = 0
+            while True:
+                processed = job_queue.run_pending()
+                if not processed:
+                    break
+                total += processed
+            print(f"✅ {total} trabajos procesados")
+            return
+
+    stop = threading.Event()
+    threads = [threading.Thread(target=job_queue.work, args=(app, stop, args.poll), daemon=True)
+               for _ in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    if args.maintenance_every:
+        schedule_purge(app, job_queue, args.maintenance_every, stop)
+    print(f"👷 Worker en marcha ({args.threads} hilos)")
+    try:
+        while any(thread.is_alive() for thread in threads):
+            stop.wait(1)
+    except KeyboardInterrupt:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+if __name__ == "__main__":
+    main()